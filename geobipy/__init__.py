@@ -15,6 +15,7 @@ from .src.base import interpolation
 
 from .src.base.HDF import hdfRead
 from .src.base.HDF import hdfWrite
+from .src.base.HDF.hdfLayout import HdfLayout
 # Classes within geobipy
 # Core
 from .src.classes.core.StatArray import StatArray
@@ -45,6 +46,8 @@ from .src.classes.mesh.RectilinearMesh2D_stitched import RectilinearMesh2D_stitc
 from .src.classes.mesh.RectilinearMesh3D import RectilinearMesh3D
 # Models
 from .src.classes.model.Model import Model
+# Forward modelling
+from .src.classes.forwardmodelling.HalfSpaceTable import HalfSpaceTable
 # Pointclouds
 from .src.classes.pointcloud.PointCloud3D import PointCloud3D
 from .src.classes.pointcloud.Point import Point
@@ -57,8 +60,11 @@ from .src.classes.statistics.mixNormal import mixNormal
 from .src.classes.statistics.mixPearson import mixPearson
 # McMC Inersion
 from .src.inversion.Inference1D import Inference1D
+from .src.inversion.LazyInference1D import LazyInference1D
+from .src.inversion.SurveyIndex import SurveyIndex
 from .src.inversion.Inference2D import Inference2D
 from .src.inversion.Inference3D import Inference3D
+from .src.inversion.MultiChainInference1D import MultiChainInference1D
 from .src.inversion.user_parameters import user_parameters
 
 # Set an MPI failed tag
@@ -85,13 +91,14 @@ def checkCommandArguments():
     Parser.add_argument('--index', dest='index', type=int, default=None, help='Invert this data point only. Only used in serial mode.')
     Parser.add_argument('--fiducial', dest='fiducial', type=float, default=None, help='Invert this fiducial only. Only used in serial mode.')
     Parser.add_argument('--line', dest='line_number', type=float, default=None, help='Invert the fiducial on this line. Only used in serial mode.')
+    Parser.add_argument('--restart', dest='restart', action='store_true', help='Restart a previous run using the HDF5 files in the output directory. Completed data points are skipped.')
 
     args = Parser.parse_args()
 
-    return args.inputFile, args.output_directory, args.skipHDF5, args.seed, args.index, args.fiducial, args.line_number
+    return args.inputFile, args.output_directory, args.skipHDF5, args.seed, args.index, args.fiducial, args.line_number, args.restart
 
 
-def serial_geobipy(inputFile, output_directory, seed=None, index=None, fiducial=None, line_number=None):
+def serial_geobipy(inputFile, output_directory, seed=None, index=None, fiducial=None, line_number=None, restart=False):
 
     print('Running GeoBIPy in serial mode')
     print('Using user input file {}'.format(inputFile))
@@ -117,7 +124,7 @@ def serial_geobipy(inputFile, output_directory, seed=None, index=None, fiducial=
     # if isinstance(Dataset, DataPoint):
     #     serial_datapoint(userParameters, output_directory, seed=seed)
     # else:
-    serial_dataset(output_directory, seed=seed, index=index, fiducial=fiducial, line_number=line_number, **options)
+    serial_dataset(output_directory, seed=seed, index=index, fiducial=fiducial, line_number=line_number, restart=restart, **options)
 
 
 # def serial_datapoint(options, output_directory, seed=None):
@@ -134,20 +141,23 @@ def serial_geobipy(inputFile, output_directory, seed=None, index=None, fiducial=
 #     infer(options, datapoint, prng=prng)
 
 
-def serial_dataset(output_directory, seed=None, index=None, fiducial=None, line_number=None, **kwargs):
+def serial_dataset(output_directory, seed=None, index=None, fiducial=None, line_number=None, restart=False, **kwargs):
 
     dataset = kwargs['data_type'](system=kwargs['system_filename'])
 
     inference3d = Inference3D(output_directory, kwargs['system_filename'])
-    inference3d.create_hdf5(dataset, **kwargs)
+
+    # Keep the existing results when restarting, so that completed data points are skipped.
+    if not (restart and inference3d.nLines > 0):
+        inference3d.create_hdf5(dataset, **kwargs)
 
     inference3d.infer(dataset, seed=seed, index=index, fiducial=fiducial, line_number=line_number, **kwargs)
 
-def parallel_geobipy(inputFile, outputDir, skipHDF5):
+def parallel_geobipy(inputFile, outputDir, skipHDF5, restart=False):
 
-    parallel_mpi(inputFile, outputDir, skipHDF5)
+    parallel_mpi(inputFile, outputDir, skipHDF5, restart)
 
-def parallel_mpi(inputFile, output_directory, skipHDF5):
+def parallel_mpi(inputFile, output_directory, skipHDF5, restart=False):
 
     from mpi4py import MPI
     from .src.base import MPI as myMPI
@@ -187,26 +197,28 @@ def parallel_mpi(inputFile, output_directory, skipHDF5):
     t0 = MPI.Wtime()
 
     inference3d = Inference3D(output_directory, kwargs['system_filename'], mpi_enabled=True)
-    inference3d.create_hdf5(dataset, **kwargs)
 
-    myMPI.rankPrint(world, "Created hdf5 files in {} h:m:s".format(str(timedelta(seconds=MPI.Wtime()-t0))))
+    # Keep the existing results when restarting, so that completed data points are skipped.
+    if not ((skipHDF5 or restart) and inference3d.nLines > 0):
+        inference3d.create_hdf5(dataset, **kwargs)
+        myMPI.rankPrint(world, "Created hdf5 files in {} h:m:s".format(str(timedelta(seconds=MPI.Wtime()-t0))))
 
     inference3d.infer(dataset, **kwargs)
 
 def geobipy():
     """Run the serial implementation of GeoBIPy. """
 
-    inputFile, output_directory, _, seed, index, fiducial, line_number = checkCommandArguments()
+    inputFile, output_directory, _, seed, index, fiducial, line_number, restart = checkCommandArguments()
     sys.path.append(getcwd())
 
-    serial_geobipy(inputFile, output_directory, seed, index, line_number)
+    serial_geobipy(inputFile, output_directory, seed, index, fiducial, line_number, restart)
 
 
 def geobipy_mpi():
     """Run the parallel implementation of GeoBIPy. """
 
-    inputFile, output_directory, skipHDF5, _, _, _, _ = checkCommandArguments()
+    inputFile, output_directory, skipHDF5, _, _, _, _, restart = checkCommandArguments()
     sys.path.append(getcwd())
 
-    parallel_geobipy(inputFile, output_directory, skipHDF5)
+    parallel_geobipy(inputFile, output_directory, skipHDF5, restart)
 
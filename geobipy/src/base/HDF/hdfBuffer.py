@@ -0,0 +1,191 @@
+""" Module to buffer indexed writes to preallocated HDF5 datasets and flush them in contiguous blocks """
+from os import remove
+from os.path import isfile
+import h5py
+import numpy as np
+
+
+class WriteBuffer(object):
+    """Buffers writes indexed by data point, and flushes them with one write per dataset and run of consecutive points.
+
+    A single buffer is shared by every file a rank writes to, so the memory it holds is bounded by max_bytes
+    however many files are open. Writes whose first index is not a single integer are written straight through.
+    Consecutive points are written as a single block, so no point outside the buffer is ever written to,
+    and several ranks can buffer different points of the same file.
+
+    Datasets named 'completed' are flushed last, after every other dataset has been written and its file flushed,
+    so a point is never flagged as completed before its results are on disk.
+
+    Files opened with the mpio driver are never flushed, since H5Fflush is collective there and each rank flushes
+    its own buffer at its own time. Their datasets are allocated when they are created, so the writes of a point
+    do not touch the metadata, and each write has been handed to MPI-IO, in the same order, when it returns.
+
+    WriteBuffer(max_bytes=2**28)
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        Flush when the buffered values exceed this many bytes.
+
+    """
+
+    def __init__(self, max_bytes=2**28):
+        self.max_bytes = max_bytes
+        self._writes = {}
+        self._checkpoints = []
+        self.nbytes = 0
+
+    def group(self, hdfFile):
+        """Proxy of hdfFile to pass to writeHdf methods.
+
+        Parameters
+        ----------
+        hdfFile : h5py.File or h5py.Group
+            Preallocated results to write to.
+
+        """
+        return BufferedGroup(hdfFile, self)
+
+    def add(self, dataset, key, value):
+        """Buffer ds[key] = value. """
+        point = key[0] if isinstance(key, tuple) else key
+
+        # A point index found with searchsorted is a size one array.
+        if isinstance(point, np.ndarray) and (point.size == 1) and np.issubdtype(point.dtype, np.integer):
+            point = point.item()
+            key = (point,) + key[1:] if isinstance(key, tuple) else point
+
+        if not isinstance(point, (int, np.integer)):
+            dataset[key] = value
+            return
+
+        # Dicts preserve insertion order, so datasets are flushed in the order a point writes them.
+        writes = self._writes.setdefault((dataset.file.filename, dataset.name), (dataset, []))[1]
+        value = np.array(value, dtype=dataset.dtype)
+        writes.append((key, value))
+        self.nbytes += value.nbytes
+
+    def end_point(self, checkpoint_file=None):
+        """Flush if the buffer is over budget. Call once every write of a point has been added.
+
+        Parameters
+        ----------
+        checkpoint_file : str, optional
+            Checkpoint of the point, removed once the point has been flushed.
+
+        """
+        if not checkpoint_file is None:
+            self._checkpoints.append(checkpoint_file)
+
+        if self.nbytes > self.max_bytes:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered point to file, and then remove the checkpoints of the flushed points. """
+        completed = [key for key in self._writes if key[1].split('/')[-1] == 'completed']
+
+        files = {}
+        for key, (dataset, writes) in self._writes.items():
+            if not key in completed:
+                self._flush_dataset(dataset, writes)
+                files[key[0]] = dataset.file
+
+        for f in files.values():
+            self._flush_file(f)
+
+        for key in completed:
+            dataset, writes = self._writes[key]
+            self._flush_dataset(dataset, writes)
+            self._flush_file(dataset.file)
+
+        for checkpoint_file in self._checkpoints:
+            if isfile(checkpoint_file):
+                remove(checkpoint_file)
+
+        self._writes = {}
+        self._checkpoints = []
+        self.nbytes = 0
+
+    @staticmethod
+    def _flush_file(hdfFile):
+        if hdfFile.driver != 'mpio':
+            hdfFile.flush()
+
+    @staticmethod
+    def _flush_dataset(dataset, writes):
+        points = np.asarray([(key[0] if isinstance(key, tuple) else key) for key, _ in writes], dtype=np.int64)
+
+        order = np.argsort(points, kind='stable')
+        points = points[order]
+
+        # Split into runs of consecutive points
+        runs = np.split(np.arange(points.size), np.flatnonzero(np.diff(points) > 1) + 1)
+
+        for run in runs:
+            start = points[run[0]]
+            stop = points[run[-1]] + 1
+
+            # Writes to part of a point keep the rest of the point as it is on disk.
+            if any(isinstance(writes[j][0], tuple) for j in order[run]):
+                block = dataset[start:stop]
+            else:
+                block = np.empty((stop - start,) + dataset.shape[1:], dtype=dataset.dtype)
+
+            for j in order[run]:
+                key, value = writes[j]
+                if isinstance(key, tuple):
+                    block[(key[0] - start,) + key[1:]] = value
+                else:
+                    block[key - start] = value
+
+            dataset[start:stop] = block
+
+
+class BufferedGroup(object):
+    """Proxy of a h5py group whose datasets buffer their writes in a WriteBuffer. Everything else is passed through. """
+
+    def __init__(self, group, buffer):
+        self._group = group
+        self._buffer = buffer
+
+    def _wrap(self, item):
+        if isinstance(item, h5py.Dataset):
+            return BufferedDataset(item, self._buffer)
+        if isinstance(item, h5py.Group):
+            return BufferedGroup(item, self._buffer)
+        return item
+
+    def __getitem__(self, name):
+        return self._wrap(self._group[name])
+
+    def get(self, name, default=None):
+        return self._wrap(self._group.get(name, default))
+
+    def __contains__(self, name):
+        return name in self._group
+
+    def __getattr__(self, attr):
+        return getattr(self._group, attr)
+
+
+class BufferedDataset(object):
+    """Proxy of a h5py dataset whose writes are buffered. Reads come from the file. """
+
+    def __init__(self, dataset, buffer):
+        self._dataset = dataset
+        self._buffer = buffer
+
+    def __setitem__(self, key, value):
+        self._buffer.add(self._dataset, key, value)
+
+    def __getitem__(self, key):
+        return self._dataset[key]
+
+    def __array__(self, dtype=None, copy=None):
+        return np.asarray(self._dataset[()], dtype=dtype)
+
+    def __len__(self):
+        return len(self._dataset)
+
+    def __getattr__(self, attr):
+        return getattr(self._dataset, attr)
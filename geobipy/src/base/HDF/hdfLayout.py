@@ -0,0 +1,153 @@
+""" Module choosing the chunking and compression of the datasets in line results files """
+import h5py
+import numpy as np
+
+
+class HdfLayout(object):
+    """Chunking and compression policy for datasets that are stacked over the data points of a line.
+
+    The datasets whose first dimension has length nPoints are chunked, and every other dataset is left contiguous.
+    The choice is recorded in the 'layout' and 'compression' attributes of each chunked dataset.
+
+    HdfLayout(mode='write', compression=None, chunk_bytes=2**20)
+
+    Parameters
+    ----------
+    mode : str, optional
+        * 'write' chunks whole data points together, so that writing or reading one point touches one chunk.
+        * 'analysis' chunks all points together over a few entries of the second dimension,
+          so that a depth slice of a hitmap across the line is one chunk.
+    compression : str, optional
+        Lossless filter, 'gzip' or 'lzf', for integer datasets with two or more dimensions, i.e. histogram counts.
+        Filters cannot be used when the file is written independently by several MPI ranks.
+    chunk_bytes : int, optional
+        Upper bound on the size of a chunk.
+
+    """
+
+    def __init__(self, mode='write', compression=None, chunk_bytes=2**20):
+        assert mode in ('write', 'analysis'), ValueError("mode must be 'write' or 'analysis'")
+        assert compression in (None, 'gzip', 'lzf'), ValueError("compression must be None, 'gzip', or 'lzf'")
+        self.mode = mode
+        self.compression = compression
+        self.chunk_bytes = chunk_bytes
+
+    def group(self, h5obj, nPoints):
+        """Proxy of h5obj whose create_dataset applies the layout to datasets stacked over nPoints. """
+        h5obj.attrs['layout'] = self.mode
+        return LayoutGroup(h5obj, self, nPoints)
+
+    def chunks(self, shape, dtype, nPoints):
+        """Chunk shape of a dataset, or None if it is not stacked over the data points. """
+        shape = tuple(int(s) for s in np.atleast_1d(shape))
+        if (len(shape) == 0) or (shape[0] != nPoints) or (0 in shape):
+            return None
+
+        # Axes are halved in this order until the chunk fits. The analysis layout splits the points last.
+        order = list(range(len(shape)))
+        if self.mode == 'analysis':
+            order = order[1:] + order[:1]
+
+        itemsize = np.dtype(dtype).itemsize
+        chunks = list(shape)
+        for axis in order:
+            while (np.prod(chunks) * itemsize > self.chunk_bytes) and (chunks[axis] > 1):
+                chunks[axis] = (chunks[axis] + 1) // 2
+
+        return tuple(chunks)
+
+    def filters(self, shape, dtype):
+        """Compression keywords for h5py create_dataset. """
+        if (self.compression is None) or (np.size(shape) < 2) or (np.dtype(dtype).kind not in 'iu'):
+            return {}
+        out = {'compression': self.compression, 'shuffle': True}
+        if self.compression == 'gzip':
+            out['compression_opts'] = 4
+        return out
+
+    def copy(self, source, destination):
+        """Copy a line results file, applying this layout to the copy.
+
+        Used to convert a file written point by point into one laid out for analysis.
+
+        Parameters
+        ----------
+        source : str
+            Line results file to read.
+        destination : str
+            File to create.
+
+        """
+        with h5py.File(source, 'r') as f, h5py.File(destination, 'w') as g:
+            nPoints = f['data/fiducial/data'].shape[0]
+            for key, value in f.attrs.items():
+                g.attrs[key] = value
+            self._copy_group(f, self.group(g, nPoints))
+
+    def _copy_group(self, source, destination):
+        for name, item in source.items():
+            if isinstance(item, h5py.Group):
+                grp = destination.create_group(name)
+                for key, value in item.attrs.items():
+                    grp.attrs[key] = value
+                self._copy_group(item, grp)
+                continue
+
+            if item.shape == ():
+                ds = destination.create_dataset(name, data=item[()])
+            else:
+                ds = destination.create_dataset(name, item.shape, dtype=item.dtype, fillvalue=item.fillvalue)
+                # Copy in blocks of points to bound memory.
+                step = max(1, np.int64(2**26 // max(1, item.dtype.itemsize * np.prod(item.shape[1:]))))
+                for i in range(0, item.shape[0], step):
+                    ds[i:i+step] = item[i:i+step]
+
+            # The layout attributes describe the copy, not the source.
+            for key, value in item.attrs.items():
+                if not key in ('layout', 'compression'):
+                    ds.attrs[key] = value
+
+
+class LayoutGroup(object):
+    """Proxy of a h5py group that creates datasets with the chunking and compression of a HdfLayout. """
+
+    def __init__(self, group, layout, nPoints):
+        self._group = group
+        self._layout = layout
+        self._nPoints = nPoints
+
+    def _wrap(self, item):
+        if isinstance(item, h5py.Group):
+            return LayoutGroup(item, self._layout, self._nPoints)
+        return item
+
+    def create_group(self, name, *args, **kwargs):
+        return self._wrap(self._group.create_group(name, *args, **kwargs))
+
+    def create_dataset(self, name, shape=None, dtype=None, data=None, **kwargs):
+        if (data is None) and (not shape is None) and (not 'chunks' in kwargs):
+            dtype = np.float64 if dtype is None else dtype
+            chunks = self._layout.chunks(shape, dtype, self._nPoints)
+            if not chunks is None:
+                kwargs['chunks'] = chunks
+                kwargs.update(self._layout.filters(shape, dtype))
+
+                ds = self._group.create_dataset(name, shape=shape, dtype=dtype, **kwargs)
+                ds.attrs['layout'] = self._layout.mode
+                if 'compression' in kwargs:
+                    ds.attrs['compression'] = kwargs['compression']
+                return ds
+
+        return self._group.create_dataset(name, shape=shape, dtype=dtype, data=data, **kwargs)
+
+    def __getitem__(self, name):
+        return self._wrap(self._group[name])
+
+    def get(self, name, default=None):
+        return self._wrap(self._group.get(name, default))
+
+    def __contains__(self, name):
+        return name in self._group
+
+    def __getattr__(self, attr):
+        return getattr(self._group, attr)
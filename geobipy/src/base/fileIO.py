@@ -1,11 +1,15 @@
 """ @fileIO
 Module with custom file handling operations
 """
+from abc import ABC, abstractmethod
 import re
+import weakref
 from pandas import read_csv
 import numpy as np
 import os
 from subprocess import Popen, PIPE, STDOUT
+from concurrent.futures import ThreadPoolExecutor
+import h5py
 
 def filesExist(fNames):
     """Check if all files in fNames exist on disk
@@ -373,3 +377,341 @@ def int2str(i, N):
 
     """
     return ('{{0:0{0:d}d}}').format(N).format(i)
+
+
+class RowReader(ABC):
+    """Base class for readers that return the rows of a survey file as float64 arrays.
+
+    RowReader(channels)
+
+    Parameters
+    ----------
+    channels : list of str
+        The column names in each row.
+
+    """
+
+    def __init__(self, channels):
+        self.channels = list(channels)
+        self._indices = {}
+        self._position = 0
+
+    def index(self, channels):
+        """Positions of the channels in a row.
+
+        Parameters
+        ----------
+        channels : str or list of str
+            Column names.
+
+        Returns
+        -------
+        out : int or numpy.ndarray of ints
+            The positions, which are cached for subsequent calls.
+
+        """
+        if isinstance(channels, str):
+            return self.channels.index(channels)
+
+        key = tuple(channels)
+        if not key in self._indices:
+            self._indices[key] = np.asarray([self.channels.index(c) for c in channels], dtype=np.int64)
+        return self._indices[key]
+
+    @abstractmethod
+    def next_row(self):
+        """Return the row after the previous one.
+
+        Returns
+        -------
+        out : numpy.ndarray or None
+            The values of self.channels in the row, or None past the end of the file.
+
+        """
+        pass
+
+    def read_row(self, record=None):
+        """Return a row of the file.
+
+        Parameters
+        ----------
+        record : int, optional
+            Index of the row. If None, the row after the previous one.
+
+        Returns
+        -------
+        out : numpy.ndarray or None
+            The values of self.channels in the row, or None past the end of the file.
+
+        """
+        if record is None:
+            return self.next_row()
+
+        # Sequential readers can only skip forwards.
+        assert record >= self._position, ValueError("Cannot read record {} after record {} from a {}".format(record, self._position - 1, type(self).__name__))
+        while self._position < record:
+            if self.next_row() is None:
+                return None
+        return self.next_row()
+
+
+class CsvBlockReader(RowReader):
+    """Reads rows of a csv file in blocks, parsing the next block on a background thread.
+
+    Each block is parsed once into a float64 array, so reading a row is an index into that array
+    rather than a call to the pandas parser.
+
+    CsvBlockReader(filename, channels, block_size)
+
+    Parameters
+    ----------
+    filename : str
+        Path to the csv file. Comma and white space delimited files are supported.
+    channels : list of str
+        The column names to read.
+    block_size : int, optional
+        The number of rows to parse per block.
+
+    """
+
+    def __init__(self, filename, channels, block_size=10000):
+
+        super().__init__(channels)
+
+        try:
+            self._reader = read_csv(filename, index_col=False, usecols=self.channels, chunksize=block_size, skipinitialspace = True)
+        except:
+            self._reader = read_csv(filename, index_col=False, usecols=self.channels, chunksize=block_size, delim_whitespace=True, skipinitialspace = True)
+
+        self._block = np.empty((0, len(self.channels)))
+        self._row = 0
+
+        # Parse the first block while the caller gets on with other work.
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._submit()
+        # Stop the parsing thread if the reader is garbage collected before it is closed.
+        self._finalizer = weakref.finalize(self, self._shutdown, self._executor, self._reader)
+
+    @staticmethod
+    def _shutdown(executor, reader):
+        executor.shutdown(wait=True)
+        reader.close()
+
+    @staticmethod
+    def _parse_block(reader, channels):
+        # Static, so the thread never holds the last reference to self and its finalizer runs on the caller.
+        try:
+            df = next(reader)
+        except StopIteration:
+            return None
+        df = df.replace('NaN', np.nan)
+        return df[channels].values.astype(np.float64)
+
+    def _submit(self):
+        self._next_block = self._executor.submit(self._parse_block, self._reader, self.channels)
+
+    def blocks(self):
+        """Generator over the blocks of rows. Only valid before any rows have been read. """
+        assert self._position == 0, ValueError("Rows have already been read from this file")
+        while not self.closed:
+            block = self._next_block.result()
+            if (block is None) or (block.shape[0] == 0):
+                self.close()
+                return
+            self._submit()
+            self._position += block.shape[0]
+            yield block
+
+    @property
+    def closed(self):
+        return self._executor is None
+
+    def close(self):
+        """Join the parsing thread and close the file. """
+        if self.closed:
+            return
+        self._finalizer()
+        self._executor = None
+
+    def next_row(self):
+        """Return the next row of the file.
+
+        Returns
+        -------
+        out : numpy.ndarray or None
+            The values of self.channels in the next row, or None once the end of the file is reached.
+
+        """
+        if self._row == self._block.shape[0]:
+            if self.closed:
+                return None
+
+            self._block = self._next_block.result()
+            self._row = 0
+
+            if (self._block is None) or (self._block.shape[0] == 0):
+                self._block = np.empty((0, len(self.channels)))
+                self.close()
+                return None
+
+            # Start parsing the following block.
+            self._submit()
+
+        out = self._block[self._row, :]
+        self._row += 1
+        self._position += 1
+        return out
+
+
+class ColumnarReader(RowReader):
+    """Random access reader for a survey converted to the columnar HDF5 layout.
+
+    The rows are stored as one contiguous float64 dataset, which is memory mapped so that
+    reading any row is O(1) and opening the file does not parse anything.
+    Line and fiducial indices are stored sorted, so finding the row of a fiducial is a binary search.
+
+    See geobipy.Data.csv_to_columnar to create the file.
+
+    ColumnarReader(filename)
+
+    Parameters
+    ----------
+    filename : str
+        Path to the columnar survey file.
+
+    """
+
+    group = 'columnar_survey'
+
+    def __init__(self, filename):
+
+        self.filename = filename
+        self._file = h5py.File(filename, 'r')
+        grp = self._file[self.group]
+
+        super().__init__(grp['channels'].asstr()[()])
+
+        values = grp['values']
+        offset = values.id.get_offset()
+        if offset is None:
+            # The dataset is chunked or empty so cannot be mapped, read through h5py instead.
+            self.values = values
+        else:
+            self.values = np.memmap(filename, dtype=values.dtype, mode='r', offset=offset, shape=values.shape)
+
+        self.line = np.asarray(grp['line'])
+        self.fiducial = np.asarray(grp['fiducial'])
+        self._line_order = np.asarray(grp['line_order'])
+        self._fiducial_order = np.asarray(grp['fiducial_order'])
+
+        self.channel_groups = {key : list(value.asstr()[()]) for key, value in grp['channel_groups'].items()}
+
+    @classmethod
+    def is_columnar(cls, filename):
+        """Whether filename is a columnar survey file. """
+        if not (isinstance(filename, str) and h5py.is_hdf5(filename)):
+            return False
+        with h5py.File(filename, 'r') as f:
+            return cls.group in f
+
+    @property
+    def nPoints(self):
+        return self.values.shape[0]
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def close(self):
+        if self.closed:
+            return
+        self._file.close()
+        self._file = None
+
+    def next_row(self):
+        return self.read_row(self._position)
+
+    def read_row(self, record=None):
+        if record is None:
+            record = self._position
+        if record >= self.nPoints:
+            return None
+        self._position = record + 1
+        return np.asarray(self.values[record, :], dtype=np.float64)
+
+    def record(self, fiducial, line=None):
+        """Row index of a fiducial.
+
+        Parameters
+        ----------
+        fiducial : float
+            Fiducial to find.
+        line : float, optional
+            Line number of the fiducial. Required if the fiducial occurs on more than one line.
+
+        Returns
+        -------
+        out : int
+            Row index.
+
+        """
+        if line is None:
+            order = self._fiducial_order
+            f = self.fiducial[order]
+            i = np.searchsorted(f, fiducial, side='left')
+            j = np.searchsorted(f, fiducial, side='right')
+        else:
+            order = self._line_order
+            l = self.line[order]
+            i0 = np.searchsorted(l, line, side='left')
+            f = self.fiducial[order[i0:np.searchsorted(l, line, side='right')]]
+            i = i0 + np.searchsorted(f, fiducial, side='left')
+            j = i0 + np.searchsorted(f, fiducial, side='right')
+
+        assert j - i > 0, ValueError("Could not find fiducial {} in {}".format(fiducial, self.filename))
+        assert j - i == 1, ValueError("Fiducial {} occurs on more than one line, please specify the line".format(fiducial))
+        return np.int64(order[i])
+
+    @classmethod
+    def write(cls, filename, channels, blocks, nPoints, line_channel, fiducial_channel, channel_groups={}):
+        """Write rows to a columnar survey file.
+
+        Parameters
+        ----------
+        filename : str
+            Path to the output file.
+        channels : list of str
+            The column names in each row.
+        blocks : iterable of numpy.ndarray
+            Blocks of rows with len(channels) columns.
+        nPoints : int
+            Total number of rows in blocks.
+        line_channel, fiducial_channel : str
+            Names of the line and fiducial columns.
+        channel_groups : dict, optional
+            Named lists of channels that are stored with the file.
+
+        """
+        with h5py.File(filename, 'w') as f:
+            grp = f.create_group(cls.group)
+            grp.create_dataset('channels', data=np.asarray(channels, dtype=object), dtype=h5py.string_dtype())
+
+            # Contiguous, so that the reader can memory map it.
+            values = grp.create_dataset('values', shape=(nPoints, len(channels)), dtype=np.float64)
+            i = 0
+            for block in blocks:
+                values[i:i+block.shape[0], :] = block
+                i += block.shape[0]
+            assert i == nPoints, ValueError("Expected {} rows but got {}".format(nPoints, i))
+
+            line = values[:, channels.index(line_channel)]
+            fiducial = values[:, channels.index(fiducial_channel)]
+
+            grp.create_dataset('line', data=line)
+            grp.create_dataset('fiducial', data=fiducial)
+            grp.create_dataset('line_order', data=np.lexsort((fiducial, line)))
+            grp.create_dataset('fiducial_order', data=np.argsort(fiducial, kind='stable'))
+
+            groups = grp.create_group('channel_groups')
+            for key, value in channel_groups.items():
+                groups.create_dataset(key, data=np.asarray(value, dtype=object), dtype=h5py.string_dtype())
@@ -1,4 +1,5 @@
 import subprocess
+import warnings
 import numpy as np
 from .fileIO import deleteFile
 from ..classes.core import StatArray
@@ -8,6 +9,8 @@ from scipy.interpolate import CloughTocher2DInterpolator
 from scipy.interpolate.interpnd import _ndim_coords_from_arrays
 #from scipy.interpolate import Rbf
 from scipy.spatial import cKDTree
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
 try:
     from netCDF4 import Dataset
 except:
@@ -224,3 +227,167 @@ except:
 #     intPoints[:, 0] = np.tile(x, y.size)
 #     intPoints[:, 1] = y.repeat(x.size)
 #     return x_grid, y_grid, intPoints
+
+
+def minimum_curvature(x, y, values, x_nodes, y_nodes, tension=0.25, smoothing=1e-2, accuracy=1e-4, iterations=200, coarsest=64):
+    """Grid scattered values with a minimum curvature, tension spline surface.
+
+    The grid minimizes the misfit of the bilinearly interpolated grid to the values plus smoothing times
+    the energy (1 - tension) * (u_xx^2 + 2u_xy^2 + u_yy^2) + tension * (u_x^2 + u_y^2), measured in grid node units.
+    The sparse normal equations are solved on successively finer grids, halving the number of nodes each level
+    while keeping the end nodes. The coarsest grid is solved directly, and each finer grid with preconditioned
+    conjugate gradients starting from the interpolated coarser solution.
+    A RuntimeWarning is issued if the conjugate gradients do not reach the accuracy within the iterations on a grid.
+
+    Parameters
+    ----------
+    x : array_like
+        x co-ordinates of the values.
+    y : array_like
+        y co-ordinates of the values.
+    values : array_like
+        Values to grid. Values that are NaN, or outside the grid, are ignored.
+    x_nodes : array_like
+        Regularly spaced grid nodes in x, at least 3.
+    y_nodes : array_like
+        Regularly spaced grid nodes in y, at least 3.
+    tension : float, optional
+        Tension in [0, 1]. 0 gives a minimum curvature surface, 1 a harmonic surface.
+    smoothing : float, optional
+        Weight of the curvature and tension energy against the data misfit.
+    accuracy : float, optional
+        Relative residual at which the conjugate gradients stop.
+    iterations : int, optional
+        Maximum number of conjugate gradient iterations on each grid.
+    coarsest : int, optional
+        Grids with at most this many nodes along each axis are solved directly.
+
+    Returns
+    -------
+    out : numpy.ndarray
+        Gridded values with shape (x_nodes.size, y_nodes.size).
+
+    """
+    assert 0.0 <= tension <= 1.0, ValueError("tension must be in [0, 1]")
+
+    x_nodes = np.asarray(x_nodes, dtype=np.float64)
+    y_nodes = np.asarray(y_nodes, dtype=np.float64)
+    assert (x_nodes.size > 2) and (y_nodes.size > 2), ValueError("Must have at least 3 grid nodes along each axis")
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+
+    keep = np.isfinite(values) & (x >= x_nodes[0]) & (x <= x_nodes[-1]) & (y >= y_nodes[0]) & (y <= y_nodes[-1])
+    x, y, values = x[keep], y[keep], values[keep]
+    assert values.size > 0, ValueError("No finite values lie inside the grid")
+
+    # Grids from fine to coarse
+    grids = [(x_nodes, y_nodes)]
+    while max(grids[-1][0].size, grids[-1][1].size) > coarsest:
+        xg, yg = grids[-1]
+        grids.append((_coarsen(xg), _coarsen(yg)))
+
+    u = None
+    for level in reversed(range(len(grids))):
+        xg, yg = grids[level]
+
+        P = _bilinear_operator(xg, yg, x, y)
+        A = (P.T @ P + smoothing * _spline_energy(xg.size, yg.size, tension)).tocsr()
+        b = P.T @ values
+
+        if u is None:
+            u = spsolve(A.tocsc(), b)
+        else:
+            xc, yc = grids[level + 1]
+            u = sparse.kron(_linear_operator(xc, xg), _linear_operator(yc, yg)) @ u
+            u, residual = _conjugate_gradient(A, b, u, accuracy, iterations)
+            if residual > accuracy:
+                warnings.warn(("Minimum curvature did not converge on the {}x{} grid after {} iterations, "
+                               "relative residual {:.3g} > accuracy {:.3g}").format(xg.size, yg.size, iterations, residual, accuracy), RuntimeWarning)
+
+    return u.reshape(x_nodes.size, y_nodes.size)
+
+def _coarsen(nodes):
+    """Regularly spaced nodes, about half as many, spanning the same end nodes. """
+    if nodes.size <= 5:
+        return nodes
+    # Odd numbers of nodes give every other node, even numbers a slightly wider spacing so the last node is kept.
+    return np.linspace(nodes[0], nodes[-1], nodes.size // 2 + 1)
+
+def _conjugate_gradient(A, b, x, accuracy, iterations):
+    """Jacobi preconditioned conjugate gradients for the symmetric positive definite A.
+
+    Returns the solution and its residual norm relative to the norm of b.
+
+    """
+    # Nodes without data still have a positive diagonal from the spline energy.
+    d = 1.0 / A.diagonal()
+
+    r = b - A @ x
+    z = d * r
+    p = z.copy()
+    rz = np.dot(r, z)
+    norm_b = np.linalg.norm(b)
+    if norm_b == 0.0:
+        norm_b = 1.0
+    stop = accuracy * norm_b
+
+    for i in range(iterations):
+        if np.linalg.norm(r) <= stop:
+            break
+        Ap = A @ p
+        alpha = rz / np.dot(p, Ap)
+        x += alpha * p
+        r -= alpha * Ap
+        z = d * r
+        rz_new = np.dot(r, z)
+        p = z + (rz_new / rz) * p
+        rz = rz_new
+
+    return x, np.linalg.norm(r) / norm_b
+
+def _linear_weights(nodes, x):
+    """Left node index and fractional distance of x between regularly spaced nodes. """
+    f = np.clip((x - nodes[0]) / (nodes[1] - nodes[0]), 0.0, nodes.size - 1.0)
+    i = np.minimum(np.floor(f).astype(np.int64), nodes.size - 2)
+    return i, f - i
+
+def _linear_operator(nodes, x):
+    """Sparse matrix that linearly interpolates values at nodes to x. """
+    i, w = _linear_weights(nodes, x)
+    rows = np.repeat(np.arange(x.size), 2)
+    cols = np.column_stack([i, i + 1]).ravel()
+    return sparse.csr_matrix((np.column_stack([1.0 - w, w]).ravel(), (rows, cols)), shape=(x.size, nodes.size))
+
+def _bilinear_operator(x_nodes, y_nodes, x, y):
+    """Sparse matrix that bilinearly interpolates a raveled (x_nodes.size, y_nodes.size) grid to the points x, y. """
+    ny = y_nodes.size
+    ix, wx = _linear_weights(x_nodes, x)
+    iy, wy = _linear_weights(y_nodes, y)
+
+    i = ix * ny + iy
+    rows = np.repeat(np.arange(x.size), 4)
+    cols = np.column_stack([i, i + 1, i + ny, i + ny + 1]).ravel()
+    w = np.column_stack([(1.0 - wx) * (1.0 - wy), (1.0 - wx) * wy, wx * (1.0 - wy), wx * wy]).ravel()
+    return sparse.csr_matrix((w, (rows, cols)), shape=(x.size, x_nodes.size * ny))
+
+def _difference_operator(n, order):
+    """Sparse first or second order finite difference over n nodes with unit spacing. """
+    if order == 1:
+        return sparse.diags([-np.ones(n - 1), np.ones(n - 1)], [0, 1], shape=(n - 1, n))
+    return sparse.diags([np.ones(n - 2), -2.0 * np.ones(n - 2), np.ones(n - 2)], [0, 1, 2], shape=(n - 2, n))
+
+def _spline_energy(nx, ny, tension):
+    """Sparse quadratic form of the tension spline energy on a raveled (nx, ny) grid. """
+    Ix = sparse.identity(nx)
+    Iy = sparse.identity(ny)
+    Dx = sparse.kron(_difference_operator(nx, 1), Iy)
+    Dy = sparse.kron(Ix, _difference_operator(ny, 1))
+    Dxx = sparse.kron(_difference_operator(nx, 2), Iy)
+    Dyy = sparse.kron(Ix, _difference_operator(ny, 2))
+    Dxy = sparse.kron(_difference_operator(nx, 1), _difference_operator(ny, 1))
+
+    curvature = Dxx.T @ Dxx + 2.0 * (Dxy.T @ Dxy) + Dyy.T @ Dyy
+    gradient = Dx.T @ Dx + Dy.T @ Dy
+    return (1.0 - tension) * curvature + tension * gradient
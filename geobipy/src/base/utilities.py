@@ -549,6 +549,40 @@ def LogDet(A, N=1.0):
         d = np.linalg.slogdet(A)
         return d[0] * d[1]
 
+
+def gelman_rubin(chains):
+    """Potential scale reduction factor (R-hat) of Gelman and Rubin (1992).
+
+    Parameters
+    ----------
+    chains : array_like
+        Samples of a scalar quantity with shape (number of chains, number of samples).
+
+    Returns
+    -------
+    out : float
+        The potential scale reduction factor. Values close to 1 indicate the chains have converged.
+        NaN if there are fewer than two chains or samples.
+
+    """
+    chains = np.asarray(chains, dtype=np.float64)
+    m, n = chains.shape
+
+    if (m < 2) or (n < 2):
+        return np.nan
+
+    # Mean within chain variance
+    W = np.mean(np.var(chains, axis=1, ddof=1))
+    if (W == 0.0):
+        return np.nan
+
+    # Between chain variance
+    B = n * np.var(np.mean(chains, axis=1), ddof=1)
+
+    variance = ((n - 1.0) / n) * W + (B / n)
+
+    return np.sqrt(variance / W)
+
 @njit(**_njit_settings)
 def set_rows_at(values, indices, out):
     for i in range(len(indices)):
@@ -561,6 +595,25 @@ def set_columns_at(values, indices, out):
         out[:, indices[i]] = values[:, i]
     return out
 
+@njit(**_njit_settings)
+def accumulate_layered_hitmap(counts, layer_bins, edges, centres, n):
+    """Add one to counts[layer_bins[k], j] for the first n depth cells j, where k is the layer containing centres[j].
+
+    A centre on an edge belongs to the layer above it. Both edges and centres must be increasing.
+    """
+    k = 0
+    nLayers = layer_bins.size
+    for j in range(n):
+        while (k < nLayers - 1) and (centres[j] > edges[k+1]):
+            k += 1
+        counts[layer_bins[k], j] += 1
+
+@njit(**_njit_settings)
+def increment_bins(counts, bins):
+    """Add one to counts at each of the bins, repeated bins are added repeatedly. """
+    for i in range(bins.size):
+        counts[bins[i]] += 1
+
 def rolling_window(a, window):
     shape = a.shape[:-1] + (a.shape[-1] - window + 1, window)
     strides = a.strides + (a.strides[-1],)
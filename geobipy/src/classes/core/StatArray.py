@@ -177,6 +177,16 @@ class StatArray(np.ndarray, myObject):
     def __array_wrap__(self, out_arr, context=None):
         return np.ndarray.__array_wrap__(self, out_arr, context)
 
+    def __reduce__(self):
+        # Pickle the name, units, prior, proposal, and posterior along with the values.
+        reconstruct, arguments, state = super().__reduce__()
+        return reconstruct, arguments, (state, self.__dict__)
+
+    def __setstate__(self, state):
+        values, attributes = state
+        super().__setstate__(values)
+        self.__dict__.update(attributes)
+
     # Properties
 
     @property
@@ -350,6 +360,29 @@ class StatArray(np.ndarray, myObject):
         if other.hasPosterior:
             self._posterior = other._posterior
 
+    def __copy__(self):
+        """Copy the values but share any attached prior, proposal, and posterior by reference.
+
+        Used to create lightweight candidate states during Markov chain perturbations, where
+        only the values change and the attached distributions can be shared with the current state.
+
+        Returns
+        -------
+        out : StatArray
+            Copy of the values with the same statistical attributes attached.
+
+        """
+        other = np.ndarray.copy(self)
+
+        if (self.hasPrior):
+            other._prior = self._prior
+        if (self.hasProposal):
+            other._proposal = self._proposal
+        if (self.hasPosterior):
+            other._posterior = self._posterior
+
+        return other
+
     def __deepcopy__(self, memo={}):
 
         other = StatArray(self, dtype=self.dtype)
@@ -384,10 +417,8 @@ class StatArray(np.ndarray, myObject):
 
         """
         tmp = np.delete(self, i, axis=axis)
-        out = self.resize(tmp.shape)
+        out = self.resize(tmp.shape)  # Keeps the prior and proposal if set.
         out[:] = tmp[:]
-
-        out.copyStats(self)
         return out
 
     def edges(self, min=None, max=None, axis=-1):
@@ -527,8 +558,6 @@ class StatArray(np.ndarray, myObject):
         tmp = np.insert(self, i, values, axis)
         out = self.resize(tmp.shape)  # Keeps the prior and proposal if set.
         out[:] = tmp[:]
-
-        out.copyStats(self)
         return out
 
     def interleave(self, other):
@@ -7,6 +7,7 @@ from ....base import utilities as cf
 from ....base import plotting as cP
 from ....base import MPI as myMPI
 from ...statistics.Distribution import Distribution
+from ...statistics.MvDiagonalNormalDistribution import MvDiagonalNormal
 from ...statistics.Histogram import Histogram
 from ...mesh.RectilinearMesh1D import RectilinearMesh1D
 import numpy as np
@@ -246,10 +247,20 @@ class DataPoint(Point):
 
         # Update the variance of the predicted data prior
         if self.predictedData.hasPrior:
-            self.predictedData.prior.variance[np.diag_indices(np.sum(self.active))] = variance[self.active]
+            self._set_data_prior_variance(variance[self.active])
 
         return self._std
 
+    def _set_data_prior_variance(self, variance):
+        """Copy the variance of the active channels to the data prior, keeping any off-diagonal covariance. """
+        prior = self.predictedData.prior
+        if np.ndim(prior.variance) == 1:
+            prior.variance = variance
+        else:
+            tmp = prior.variance
+            tmp[np.diag_indices(np.size(variance))] = variance
+            prior.variance = tmp
+
     @std.setter
     def std(self, value):
 
@@ -295,6 +306,29 @@ class DataPoint(Point):
 
         return out
 
+    def __copy__(self):
+        """Lightweight copy used to generate candidate states during Markov chain perturbations.
+
+        Only the parameters that are perturbed or overwritten by a forward model have their values copied.
+        Everything else, including the attached priors, proposals, and posteriors, is shared with self.
+
+        Returns
+        -------
+        out : type(self)
+            Candidate data point.
+
+        """
+        out = type(self).__new__(type(self))
+        out.__dict__.update(self.__dict__)
+
+        out._z = copy(self.z)
+        out._relErr = copy(self.relErr)
+        out._addErr = copy(self.addErr)
+        out._std = copy(self.std)
+        out._predictedData = copy(self._predictedData)
+
+        return out
+
     # def initialize(self, **kwargs):
     
     #     self.relErr[:] = self.kwargs['initial_relative_error']
@@ -312,6 +346,9 @@ class DataPoint(Point):
         elif order == 2:
             J = self.sensitivity(model)[self.active, :]
             WdT_Wd = self.predictedData.priorDerivative(order=2)
+            if np.ndim(WdT_Wd) == 1:
+                # Diagonal data covariance
+                return np.dot(J.T, WdT_Wd[:, None] * J)
             return np.dot(J.T, np.dot(WdT_Wd, J))
 
     def _init_posterior_plots(self, gs):
@@ -424,6 +461,60 @@ class DataPoint(Point):
         misfit = np.float64(np.sum((cf.Ax(tmp2, self.deltaD[self.active]))**2.0, dtype=np.float64))
         return misfit
 
+    @staticmethod
+    def likelihood_many(datapoints):
+        """Data misfits and log likelihoods of several data points of the same system with single array operations.
+
+        The errors of each data point are computed, which also updates the variance of its data prior as dataMisfit does.
+
+        Parameters
+        ----------
+        datapoints : list of geobipy.DataPoint
+            Data points with the same observed data and active channels.
+
+        Returns
+        -------
+        misfit : numpy.ndarray
+            Data misfit of each data point, as given by dataMisfit.
+        likelihood : numpy.ndarray or None
+            Log likelihood of each data point, as given by likelihood.
+            None if the data priors are not MvDiagonalNormal, in which case each likelihood must be evaluated separately.
+
+        """
+        active = datapoints[0].active
+
+        std = np.vstack([datapoint.std[active] for datapoint in datapoints])
+        residual = np.vstack([datapoint.deltaD[active] for datapoint in datapoints])
+
+        misfit = np.sum((residual / std)**2.0, axis=1)
+
+        if not all(isinstance(datapoint.predictedData.prior, MvDiagonalNormal) for datapoint in datapoints):
+            return misfit, None
+
+        variance = np.vstack([datapoint.predictedData.prior.variance for datapoint in datapoints])
+        likelihood = -(0.5 * variance.shape[1]) * np.log(2.0 * np.pi) - 0.5 * np.sum(np.log(variance), axis=1) - 0.5 * np.sum(residual**2.0 / variance, axis=1)
+
+        return misfit, likelihood
+
+    @staticmethod
+    def forward_many(datapoints, models, with_jacobian=False):
+        """Forward model several data points of the same system, each from its own model.
+
+        Data points with a batched forward modeller override this to model them all in one call.
+
+        Parameters
+        ----------
+        datapoints : list of geobipy.DataPoint
+            Data points whose predicted data are overwritten.
+        models : list of geobipy.Model
+            Model of each data point.
+        with_jacobian : bool, optional
+            Also compute the sensitivity matrix of each data point.
+
+        """
+        for datapoint, model in zip(datapoints, models):
+            datapoint.forward(model, with_jacobian=with_jacobian)
+
     def initialize(self, **kwargs):
         self.relErr = kwargs['initial_relative_error']
         self.addErr = kwargs['initial_additive_error']
@@ -447,7 +538,8 @@ class DataPoint(Point):
                 additive_error_prior = Distribution('Uniform', kwargs['minimum_additive_error'], kwargs['maximum_additive_error'], log=False, prng=kwargs.get('prng'))
         
         if data_prior is None:
-            data_prior = Distribution('MvLogNormal', self.data[self.active], self.std[self.active]**2.0, linearSpace=False, prng=kwargs.get('prng'))
+            # Channel errors are independent, so only the variance of each channel is stored.
+            data_prior = Distribution('MvDiagonalNormal', self.data[self.active], self.std[self.active]**2.0, prng=kwargs.get('prng'))
         
         self.set_height_prior(height_prior)
         self.set_relative_error_prior(relative_error_prior)
@@ -139,6 +139,15 @@ class EmDataPoint(DataPoint):
 
         return out
 
+    @property
+    def loop_geometry(self):
+        """Geometry of the loops, other than the height, that the predicted data depend on.
+
+        Empty for data points whose loop geometry is fixed by their system.
+
+        """
+        return np.empty(0)
+
     @staticmethod
     def new_model():
         mesh = RectilinearMesh1D(edges=StatArray.StatArray(np.asarray([0.0, np.inf]), 'Depth', 'm'))
@@ -152,12 +161,15 @@ class EmDataPoint(DataPoint):
 
         return out
 
-    def find_best_halfspace(self, minConductivity=1e-4, maxConductivity=1e4, nSamples=100):
+    def find_best_halfspace(self, minConductivity=1e-4, maxConductivity=1e4, nSamples=100, table=None, nRefine=9):
         """Computes the best value of a half space that fits the data.
 
         Carries out a brute force search of the halfspace conductivity that best fits the data.
         The profile of data misfit vs halfspace conductivity is not quadratic, so a bisection will not work.
 
+        If a half space table is given and covers the height and loop geometry of the data point, the brute force search is replaced
+        by a lookup into the table, followed by a search of nRefine conductivities between the neighbours of the tabulated best fit.
+
         Parameters
         ----------
         minConductivity : float, optional
@@ -166,31 +178,57 @@ class EmDataPoint(DataPoint):
             The maximum conductivity to search over
         nSamples : int, optional
             The number of values between the min and max
+        table : geobipy.HalfSpaceTable, optional
+            Precomputed half space responses for the system of the data point.
+        nRefine : int, optional
+            The number of values in the local search after a table lookup.
 
         Returns
         -------
-        out : np.float64
-            The best fitting log10 conductivity for the half space
+        out : geobipy.Model
+            The best fitting half space model
 
         """
-        assert maxConductivity > minConductivity, ValueError("Maximum conductivity must be greater than the minimum")
-        minConductivity = np.log10(minConductivity)
-        maxConductivity = np.log10(maxConductivity)
+        if (not table is None) and table.covers(self):
+            i = table.lookup(self)
+            c = table.conductivity
+            c = np.logspace(np.log10(c[np.maximum(i-1, 0)]), np.log10(c[np.minimum(i+1, c.size-1)]), nRefine)
+        else:
+            assert maxConductivity > minConductivity, ValueError("Maximum conductivity must be greater than the minimum")
+            c = np.logspace(np.log10(minConductivity), np.log10(maxConductivity), nSamples)
 
-        c = np.logspace(minConductivity, maxConductivity, nSamples)
+        predicted = self.halfspace_responses(c)
 
-        PhiD = np.zeros(nSamples)
+        active = self.active
+        PhiD = np.sum(((predicted[:, active] - self.data[active]) / self.std[active])**2.0, axis=1)
 
         model = self.new_model()
+        model.values[0] = c[np.argmin(PhiD)]
+        return model
 
-        for i in range(nSamples):
-            model.values[0] = c[i]
+    def halfspace_responses(self, conductivity):
+        """Predicted data of a set of half spaces at the height of the data point.
+
+        Parameters
+        ----------
+        conductivity : array_like
+            Half space conductivities.
+
+        Returns
+        -------
+        out : numpy.ndarray
+            Predicted data with shape (conductivity.size, nChannels).
+
+        """
+        out = np.empty((np.size(conductivity), self.nChannels))
+
+        model = self.new_model()
+        for i, c in enumerate(conductivity):
+            model.values[0] = c
             self.forward(model)
-            PhiD[i] = self.dataMisfit()
+            out[i, :] = self.predictedData
 
-        i = np.argmin(PhiD)
-        model.values[0] = c[i]
-        return model
+        return out
 
     def priorProbability(self, rErr, aErr, height, calibration, verbose=False):
         """Evaluate the probability for the EM data point given the specified attached priors
@@ -293,24 +331,24 @@ class EmDataPoint(DataPoint):
 
     def perturbAdditiveError(self):
         if self.addErr.hasProposal:
+            # Centre the proposal on the current errors. The proposal may be shared with other states.
+            self.addErr.proposal.mean = np.array(self.addErr)
             # Generate a new error
             self.addErr.perturb(imposePrior=True, log=True)
-            # Update the mean of the proposed errors
-            self.addErr.proposal.mean = self.addErr
 
     def perturbHeight(self):
         if self.z.hasProposal:
+            # Centre the proposal on the current elevation. The proposal may be shared with other states.
+            self.z.proposal.mean = np.array(self.z)
             # Generate a new elevation
             self.z.perturb(imposePrior=True, log=True)
-            # Update the mean of the proposed elevation
-            self.z.proposal.mean = self.z
 
     def perturbRelativeError(self):
         if self.relErr.hasProposal:
+            # Centre the proposal on the current errors. The proposal may be shared with other states.
+            self.relErr.proposal.mean = np.array(self.relErr)
             # Generate a new error
             self.relErr.perturb(imposePrior=True, log=True)
-            # Update the mean of the proposed errors
-            self.relErr.proposal.mean = self.relErr
 
     def plotHalfSpaceResponses(self, minConductivity=-4.0, maxConductivity=2.0, nSamples=100, **kwargs):
         """Plots the reponses of different half space models.
@@ -4,7 +4,7 @@ Module describing a frequency domain EMData Point that contains a single measure
 from copy import copy, deepcopy
 
 from ....classes.core import StatArray
-from ...forwardmodelling.Electromagnetic.FD.fdem1d import fdem1dfwd, fdem1dsen
+from ...forwardmodelling.Electromagnetic.FD.fdem1d import fdem1dfwd, fdem1dfwd_batch, fdem1dsen
 from .EmDataPoint import EmDataPoint
 from ...model.Model import Model
 from...mesh.RectilinearMesh1D import RectilinearMesh1D
@@ -525,28 +525,158 @@ class FdemDataPoint(EmDataPoint):
     #     return model
 
 
-    def forward(self, mod):
-        """ Forward model the data from the given model """
+    def forward(self, mod, with_jacobian=False):
+        """Forward model the data from the given model
+
+        Parameters
+        ----------
+        mod : geobipy.Model
+            Model to forward model.
+        with_jacobian : bool, optional
+            Also compute the sensitivity matrix from the same pass through the kernel.
+            The sensitivity is cached against the model and height, so a later call to sensitivity with the same model reuses it.
+
+        """
 
         assert isinstance(mod, Model), TypeError("Invalid model class for forward modeling [1D]")
-        self._forward1D(mod)
+        self._forward1D(mod, with_jacobian)
+
+
+    def forward_batch(self, conductivity, thickness, n_layers, height=None, with_jacobian=False):
+        """Forward model a stack of 1D layered models in a single parallel call.
+
+        Parameters
+        ----------
+        conductivity : array_like
+            Layer conductivities with shape (number of models, maximum number of layers).
+        thickness : array_like
+            Layer thicknesses with the same shape as conductivity.
+        n_layers : array_like of ints
+            Number of layers in each model.
+        height : float or array_like, optional
+            Height of the sensor above each model. Defaults to the height of the data point.
+        with_jacobian : bool, optional
+            Also return the sensitivity matrix of each model, computed from the same pass through the kernel.
+
+        Returns
+        -------
+        out : numpy.ndarray
+            Predicted data with shape (number of models, number of channels).
+        J : numpy.ndarray, optional
+            Sensitivity matrices with shape (number of models, number of channels, maximum number of layers),
+            zero beyond the number of layers in each model. Only if with_jacobian is True.
+
+        """
+        if height is None:
+            height = self.z.item()
+
+        n_layers = np.asarray(n_layers)
+        out = np.empty((n_layers.size, self.nChannels))
+        if with_jacobian:
+            J = np.empty((n_layers.size, self.nChannels, np.shape(conductivity)[-1]))
 
+        for i, s in enumerate(self.system):
+            tmp = fdem1dfwd_batch(s, conductivity, thickness, n_layers, height, with_jacobian=with_jacobian)
+            if with_jacobian:
+                tmp, Jtmp = tmp
+                J[:, :self.nFrequencies[i], :] = Jtmp.real
+                J[:, self.nFrequencies[i]:, :] = Jtmp.imag
+            out[:, :self.nFrequencies[i]] = tmp.real
+            out[:, self.nFrequencies[i]:] = tmp.imag
+
+        if with_jacobian:
+            return out, J
+        return out
+
+    @staticmethod
+    def forward_many(datapoints, models, with_jacobian=False):
+        """Forward model several data points of the same system, each from its own model and at its own height, with one call to forward_batch.
+
+        Parameters
+        ----------
+        datapoints : list of geobipy.FdemDataPoint
+            Data points whose predicted data are overwritten.
+        models : list of geobipy.Model
+            Model of each data point.
+        with_jacobian : bool, optional
+            Also compute the sensitivity matrix of each data point, cached as by forward.
+
+        """
+        n_layers = np.asarray([model.mesh.nCells.item() for model in models])
+
+        conductivity = np.zeros((n_layers.size, n_layers.max()))
+        thickness = np.full((n_layers.size, n_layers.max()), np.inf)
+        for i, model in enumerate(models):
+            assert np.isinf(model.mesh.edges[-1]), ValueError('mod.edges must have last entry be infinity for forward modelling.')
+            conductivity[i, :n_layers[i]] = model.values
+            thickness[i, :n_layers[i]] = model.mesh.widths
+
+        height = np.asarray([datapoint.z.item() for datapoint in datapoints])
+        predicted = datapoints[0].forward_batch(conductivity, thickness, n_layers, height=height, with_jacobian=with_jacobian)
+
+        if with_jacobian:
+            predicted, J = predicted
+
+        for i, (datapoint, model) in enumerate(zip(datapoints, models)):
+            datapoint._predictedData[:] = predicted[i, :]
+            if with_jacobian:
+                datapoint.J = StatArray.StatArray(J[i, :, :n_layers[i]], 'Sensitivity', '$\\frac{ppm.m}{S}$')
+                datapoint._J_key = datapoint._sensitivity_key(model)
+
+    def halfspace_responses(self, conductivity):
+        """Predicted data of a set of half spaces at the height of the data point.
+
+        All half space responses are computed with one call to the batched forward modeller.
+
+        Parameters
+        ----------
+        conductivity : array_like
+            Half space conductivities.
+
+        Returns
+        -------
+        out : numpy.ndarray
+            Predicted data with shape (conductivity.size, nChannels).
+
+        """
+        n = np.size(conductivity)
+        return self.forward_batch(np.reshape(conductivity, (n, 1)), np.full((n, 1), np.inf), np.ones(n, dtype=np.int32))
 
     def sensitivity(self, mod):
         """ Compute the sensitivty matrix for the given model """
 
         assert isinstance(mod, Model), TypeError("Invalid model class for sensitivity matrix [1D]")
+
+        # Reuse the last sensitivity matrix if the model and height have not changed since it was computed.
+        if (not self.J is None) and (getattr(self, '_J_key', None) == self._sensitivity_key(mod)):
+            return self.J
+
         return StatArray.StatArray(self._sensitivity1D(mod), 'Sensitivity', '$\\frac{ppm.m}{S}$')
 
+    def _sensitivity_key(self, mod):
+        """Key identifying the model and height that a sensitivity matrix was computed for. """
+        return (self.z.item(), mod.mesh.edges.tobytes(), mod.values.tobytes())
 
-    def _forward1D(self, mod):
+    def _forward1D(self, mod, with_jacobian=False):
         """ Forward model the data from a 1D layered earth model """
         assert np.isinf(mod.mesh.edges[-1]), ValueError('mod.edges must have last entry be infinity for forward modelling.')
+
+        if with_jacobian:
+            J = StatArray.StatArray((self.nChannels, mod.mesh.nCells.item()), 'Sensitivity', '$\\frac{ppm.m}{S}$')
+
         for i, s in enumerate(self.system):
-            tmp = fdem1dfwd(s, mod, self.z[0])
+            tmp = fdem1dfwd(s, mod, self.z[0], with_jacobian=with_jacobian)
+            if with_jacobian:
+                tmp, Jtmp = tmp
+                J[:self.nFrequencies[i], :] = Jtmp.real
+                J[self.nFrequencies[i]:, :] = Jtmp.imag
             self._predictedData[:self.nFrequencies[i]] = tmp.real
             self._predictedData[self.nFrequencies[i]:] = tmp.imag
 
+        if with_jacobian:
+            self.J = J
+            self._J_key = self._sensitivity_key(mod)
+
 
     def _sensitivity1D(self, mod):
         """ Compute the sensitivty matrix for a 1D layered earth model """
@@ -560,6 +690,7 @@ class FdemDataPoint(EmDataPoint):
             J[self.nFrequencies[j]:, :] = Jtmp.imag
 
         self.J = J
+        self._J_key = self._sensitivity_key(mod)
         return self.J
 
 
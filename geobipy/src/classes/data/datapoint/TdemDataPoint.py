@@ -1,4 +1,4 @@
-from copy import deepcopy
+from copy import copy, deepcopy
 
 from ....classes.core import StatArray
 from ...model.Model import Model
@@ -145,6 +145,13 @@ class TdemDataPoint(EmDataPoint):
         self._data = self.secondary_field
         return self._data
 
+    @property
+    def loop_geometry(self):
+        """Orientation of the transmitter, and the offset and orientation of the receiver relative to it. """
+        return np.r_[self.transmitter.roll, self.transmitter.pitch, self.transmitter.yaw,
+                     self.loopOffset,
+                     self.receiver.roll, self.receiver.pitch, self.receiver.yaw]
+
     @property
     def loopOffset(self):
         diff = self.receiver - self.transmitter
@@ -297,6 +304,12 @@ class TdemDataPoint(EmDataPoint):
 
         return out
 
+    def __copy__(self):
+        out = super().__copy__()
+        out._predicted_primary_field = copy(self.predicted_primary_field)
+        out._predicted_secondary_field = copy(self.predicted_secondary_field)
+        return out
+
     @EmDataPoint.std.getter
     def std(self):
         """ Updates the data errors
@@ -344,7 +357,7 @@ class TdemDataPoint(EmDataPoint):
 
         # Update the variance of the predicted data prior
         if self.predictedData.hasPrior:
-            self.predictedData.prior.variance[np.diag_indices(np.sum(self.active))] = self._std[self.active]**2.0
+            self._set_data_prior_variance(self._std[self.active]**2.0)
 
         return self._std
 
@@ -894,8 +907,17 @@ class TdemDataPoint(EmDataPoint):
         #             a = active[i_comp]
         #             self.predictedData.posterior.update_with_line(x[a], self.predictedData[i_comp][a])
 
-    def forward(self, mod):
-        """ Forward model the data from the given model """
+    def forward(self, mod, with_jacobian=False):
+        """Forward model the data from the given model
+
+        Parameters
+        ----------
+        mod : geobipy.Model
+            Model to forward model.
+        with_jacobian : bool, optional
+            Also compute the sensitivity matrix, reusing the forward model held by the GA-AEM systems.
+
+        """
 
         assert isinstance(mod, Model), TypeError(
             "Invalid model class {} for forward modeling [1D]".format(type(mod)))
@@ -921,6 +943,9 @@ class TdemDataPoint(EmDataPoint):
 
             self.predicted_primary_field[s] = np.hstack(primary)
 
+        if with_jacobian:
+            self.J = self.sensitivity(mod, modelChanged=False)
+
 
     def sensitivity(self, model, ix=None, modelChanged=True):
         """ Compute the sensitivty matrix for the given model """
@@ -1,4 +1,4 @@
-from copy import deepcopy
+from copy import copy, deepcopy
 
 from ....classes.core import StatArray
 from .TdemDataPoint import TdemDataPoint
@@ -106,6 +106,13 @@ class Tempest_datapoint(TdemDataPoint):
                 'units must have type str')
         self._units = value
 
+    def __copy__(self):
+        out = super().__copy__()
+        # The transmitter pitch can be perturbed
+        out._transmitter = copy(self.transmitter)
+        out._transmitter._pitch = copy(self.transmitter.pitch)
+        return out
+
     def initialize(self, **kwargs):
         super().initialize(**kwargs)
 
@@ -210,10 +217,10 @@ class Tempest_datapoint(TdemDataPoint):
 
     def perturb_pitch(self):
         if self.transmitter.pitch.hasProposal:
-            # Generate a new error
+            # Centre the proposal on the current pitch. The proposal may be shared with other states.
+            self.transmitter.pitch.proposal.mean = np.array(self.transmitter.pitch)
+            # Generate a new pitch
             self.transmitter.pitch.perturb(imposePrior=True)
-            # Update the mean of the proposed errors
-            self.transmitter.pitch.proposal.mean = self.transmitter.pitch
 
     def plotWaveform(self,**kwargs):
         for i in range(self.nSystems):
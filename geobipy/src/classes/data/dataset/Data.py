@@ -484,19 +484,83 @@ class Data(PointCloud3D):
         nPoints, ixyz = PointCloud3D._csv_channels(filename)
         return nPoints, labels + ixyz
 
-    def _open_csv_files(self, filename):
+    @classmethod
+    def csv_to_columnar(cls, data_filename, system_filename, filename, block_size=10000):
+        """Convert a csv survey file to the columnar HDF5 layout.
+
+        The columnar file can be used wherever a data file is given for point by point reading, e.g. the data_filename option.
+        Its rows are memory mapped, so any data point can be read without parsing the file, see geobipy.fileIO.ColumnarReader.
+
+        Parameters
+        ----------
+        data_filename : str
+            Path to the csv data file.
+        system_filename : str or list of str
+            Path(s) to the system file(s).
+        filename : str
+            Path to the output HDF5 file.
+        block_size : int, optional
+            Number of rows parsed at a time.
+
+        """
+        self = cls(system_filename)
+        channels = self.csv_channels(data_filename)
+
+        reader = fIO.CsvBlockReader(data_filename, channels, block_size=block_size)
+        fIO.ColumnarReader.write(filename, reader.channels, reader.blocks(), self._nPoints,
+                                 line_channel=self._iC[0], fiducial_channel=self._iC[1],
+                                 channel_groups={key : getattr(self, key) for key in self._channel_groups})
+
+    def _open_data_files(self, filename):
+        """Open a csv or columnar data file for reading data points one at a time. """
+        if fIO.ColumnarReader.is_columnar(filename):
+            self._open_columnar_file(filename)
+        else:
+            self._open_csv_files(filename)
+
+    def _open_columnar_file(self, filename):
+
+        self._file = fIO.ColumnarReader(filename)
+        self._filename = filename
+
+        self._nPoints = self._file.nPoints
+        self._channels = self._file.channels
+        for key in self._channel_groups:
+            setattr(self, key, self._file.channel_groups[key])
+
+    def _fiducial_index(self, fiducial, line_number=None):
+        """Record index of a fiducial in the open data file. """
+        if isinstance(self._file, fIO.ColumnarReader):
+            return self._file.record(fiducial, line_number)
+
+        line, fid = self._read_line_fiducial(self._filename)
+        match = fid == fiducial
+        if not line_number is None:
+            match &= line == line_number
+        i = np.flatnonzero(match)
+        assert i.size > 0, ValueError("Could not find fiducial {} in {}".format(fiducial, self._filename))
+        assert i.size == 1, ValueError("Fiducial {} occurs on more than one line, please specify the line".format(fiducial))
+        return i[0]
+
+    def _open_csv_files(self, filename, block_size=10000):
+        """Open a csv file for reading data points one at a time.
 
+        Rows are parsed in blocks of block_size on a background thread, see geobipy.fileIO.CsvBlockReader.
+
+        """
         channels = self.csv_channels(filename)
-        try:
-            df = read_csv(filename, index_col=False, usecols=channels, chunksize=1, skipinitialspace = True)
-        except:
-            df = read_csv(filename, index_col=False, usecols=channels, chunksize=1, delim_whitespace=True, skipinitialspace = True)
 
-        self._file = df
+        self._file = fIO.CsvBlockReader(filename, channels, block_size=block_size)
         self._filename = filename
 
     def _read_line_fiducial(self, filename):
 
+        if fIO.ColumnarReader.is_columnar(filename):
+            f = fIO.ColumnarReader(filename)
+            out = f.line, f.fiducial
+            f.close()
+            return out
+
         _, channels = Data._csv_channels(filename)
 
         try:
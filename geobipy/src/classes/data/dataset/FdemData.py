@@ -66,6 +66,8 @@ class FdemData(Data):
     """
 
     single = FdemDataPoint
+    # Channel lists set by csv_channels, stored with columnar files.
+    _channel_groups = ('_iC', '_iData', '_iStd')
 
     def __init__(self, system=None, **kwargs):
         """Instantiate the FdemData class. """
@@ -683,7 +685,7 @@ class FdemData(Data):
         # Read in the EM System file
         self = cls(system_filename)
         self._data_filename = data_filename
-        self._open_csv_files(data_filename)
+        self._open_data_files(data_filename)
 
         return self
 
@@ -721,31 +723,29 @@ class FdemData(Data):
         FdemData.__initLineByLineRead() must have already been run.
 
         """
-        try:
-            df = self._file.get_chunk()
-            df = df.replace('NaN',np.nan)
-            endOfFile = False
-        except:
-            self._file.close()
-            endOfFile = True
+        row = self._file.read_row(record)
 
-        if endOfFile:
+        if row is None:
             return None
 
-        D = np.squeeze(df[self._iData].values)
+        f = self._file
+
+        D = row[f.index(self._iData)]
 
         if len(self._iStd) > 0:
-            S = np.squeeze(df[self._iStd].values)
+            S = row[f.index(self._iStd)]
         else:
             S = 0.1 * D
-        
-        return self.single(x=df[self._iC[2]].values,
-                             y=df[self._iC[3]].values,
-                             z=df[self._iC[4]].values,
-                             elevation=df[self._iC[5]].values,
+
+        location = row[f.index(self._iC)]
+
+        return self.single(x=location[2],
+                             y=location[3],
+                             z=location[4],
+                             elevation=location[5],
                              data=D, std=S, system=self.system,
-                             lineNumber=df[self._iC[0]].values,
-                             fiducial=df[self._iC[1]].values)
+                             lineNumber=location[0],
+                             fiducial=location[1])
 
 
     def readAarhusFile(self, dataFilename):
@@ -57,6 +57,8 @@ class TdemData(Data):
     """
 
     single = TdemDataPoint
+    # Channel lists set by csv_channels, stored with columnar files.
+    _channel_groups = ('_iC', '_iR', '_iT', '_iOffset', '_iData', '_iStd', '_iPrimary')
 
     def __init__(self, system=None, **kwargs):
         """ Initialize the TDEM data """
@@ -647,11 +649,11 @@ class TdemData(Data):
         # Read in the EM System file
         self = cls(system_filename)
         self._data_filename = data_filename
-        self._open_csv_files(data_filename)
+        self._open_data_files(data_filename)
         return self
 
-    def _open_csv_files(self, filename):
-        super()._open_csv_files(filename)
+    def _open_csv_files(self, filename, block_size=10000):
+        super()._open_csv_files(filename, block_size=block_size)
         self.csv_channels(filename)
 
     @property
@@ -669,39 +671,35 @@ class TdemData(Data):
 
         """
         
-        try:
-            df = self._file.get_chunk()
-            df = df.replace('NaN', np.nan)
-            endOfFile = False
-        except:
-            self._file.close()
-            endOfFile = True
+        row = self._file.read_row(record)
 
-        if endOfFile:
+        if row is None:
             return None
 
-        secondary_field = np.squeeze(df[self._iData].values)
+        f = self._file
+
+        secondary_field = row[f.index(self._iData)]
 
         if len(self._iStd) == 0:
             S = 0.1 * secondary_field
         else:
-            S = np.squeeze(df[self._iStd].values)
+            S = row[f.index(self._iStd)]
 
         primary_field = None
         if len(self._iPrimary) > 0:
-            primary_field = np.squeeze(df[self._iPrimary].values)
+            primary_field = row[f.index(self._iPrimary)]
 
-        data = np.squeeze(df[self._iC].values)
+        data = row[f.index(self._iC)]
 
-        loopOffset = np.squeeze(df[self._iOffset].values)
+        loopOffset = row[f.index(self._iOffset)]
 
-        tloop = np.squeeze(df[self._iT].values).astype(np.float64)
+        tloop = row[f.index(self._iT)]
         
         T = CircularLoop(x=data[2], y=data[3], z=data[4],
                          pitch=tloop[0], roll=tloop[1],yaw=tloop[2],
                          radius=self.system[0].loopRadius())
 
-        rloop = np.squeeze(df[self._iR].values).astype(np.float64)
+        rloop = row[f.index(self._iR)]
         R = CircularLoop(x=T.x + loopOffset[0],
                          y=T.y + loopOffset[1],
                          z=T.z + loopOffset[2],
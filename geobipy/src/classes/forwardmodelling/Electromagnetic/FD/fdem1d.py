@@ -4,10 +4,10 @@ Leon Foks
 June 2015
 """
 import numpy as np
-from .fdem1d_numba import (nbFdem1dfwd, nbFdem1dsen)
+from .fdem1d_numba import (nbFdem1dfwd, nbFdem1dfwd_batch, nbFdem1dfwdsen, nbFdem1dfwdsen_batch, nbFdem1dsen)
 # from ...ipforward1d_fortran import ipforward1d
 
-def fdem1dfwd(system, model1d, altitude):
+def fdem1dfwd(system, model1d, altitude, with_jacobian=False):
     """Wrapper to freqeuency domain EM forward modellers
 
     Parameters
@@ -18,11 +18,15 @@ def fdem1dfwd(system, model1d, altitude):
         1D layered earth geometry
     altitude : float
         Acquisition height above the model
+    with_jacobian : bool, optional
+        Also return the sensitivity matrix, computed from the same pass of the recursion.
 
     Returns
     -------
     predictedData : array_like
         Frequency domain data.
+    J : array_like, optional
+        Sensitivity matrix with shape (number of frequencies, number of layers). Only if with_jacobian is True.
 
     """
 
@@ -35,21 +39,89 @@ def fdem1dfwd(system, model1d, altitude):
 
     kappa = np.zeros(model1d.values.size, dtype=np.float64)
     perm = np.zeros(model1d.values.size, dtype=np.float64)
-    
-    return nbFdem1dfwd(system.tensor_id, 
-                       system.frequencies, 
-                       transmitter_height, 
-                       receiver_height, 
-                       system.transmitter.moment, 
-                       x_separation, 
-                       system.loop_separation, 
-                       system.w0, system.lamda0, system.lamda02, 
-                       system.w1, system.lamda1, system.lamda12,
-                       scl, 
-                       model1d.values, 
-                       kappa, 
-                       perm, 
-                       model1d.mesh.widths)
+
+    kernel = nbFdem1dfwdsen if with_jacobian else nbFdem1dfwd
+
+    return kernel(system.tensor_id, 
+                  system.frequencies, 
+                  transmitter_height, 
+                  receiver_height, 
+                  system.transmitter.moment, 
+                  x_separation, 
+                  system.loop_separation, 
+                  system.w0, system.lamda0, system.lamda02, 
+                  system.w1, system.lamda1, system.lamda12,
+                  scl, 
+                  model1d.values, 
+                  kappa, 
+                  perm, 
+                  model1d.mesh.widths)
+
+
+def fdem1dfwd_batch(system, conductivity, thickness, n_layers, altitude, with_jacobian=False):
+    """Wrapper to the batched frequency domain EM forward modeller
+
+    Parameters
+    ----------
+    system : geobipy.FdemSystem
+        Acquisition system information
+    conductivity : array_like
+        Layer conductivities with shape (number of models, maximum number of layers).
+        Rows are padded beyond the number of layers in each model.
+    thickness : array_like
+        Layer thicknesses with the same shape as conductivity.
+    n_layers : array_like of ints
+        Number of layers in each model.
+    altitude : float or array_like
+        Acquisition height above each model.
+    with_jacobian : bool, optional
+        Also return the sensitivity matrix of each model, computed from the same pass of the recursion.
+
+    Returns
+    -------
+    predictedData : array_like
+        Frequency domain data with shape (number of models, number of frequencies).
+    J : array_like, optional
+        Sensitivity matrices with shape (number of models, number of frequencies, maximum number of layers),
+        zero beyond the number of layers in each model. Only if with_jacobian is True.
+
+    """
+    conductivity = np.atleast_2d(np.asarray(conductivity, dtype=np.float64))
+    thickness = np.atleast_2d(np.asarray(thickness, dtype=np.float64))
+    n_layers = np.asarray(n_layers, dtype=np.int64)
+    n_models = n_layers.size
+
+    assert conductivity.shape == thickness.shape, ValueError("conductivity and thickness must have the same shape")
+    assert conductivity.shape[0] == n_models, ValueError("conductivity must have {} rows".format(n_models))
+    assert np.all(n_layers <= conductivity.shape[1]), ValueError("n_layers cannot exceed the number of columns of conductivity")
+
+    altitude = np.broadcast_to(np.asarray(altitude, dtype=np.float64), n_models)
+
+    transmitter_height = altitude[:, None] + system.transmitter.z
+    receiver_height = -transmitter_height + system.receiver.z
+    scl = system.transmitter.moment * system.receiver.moment
+    x_separation = system.loop_offsets[0, :]
+
+    kappa = np.zeros_like(conductivity)
+    perm = np.zeros_like(conductivity)
+
+    kernel = nbFdem1dfwdsen_batch if with_jacobian else nbFdem1dfwd_batch
+
+    return kernel(system.tensor_id,
+                  system.frequencies,
+                  transmitter_height,
+                  receiver_height,
+                  system.transmitter.moment,
+                  x_separation,
+                  system.loop_separation,
+                  system.w0, system.lamda0, system.lamda02,
+                  system.w1, system.lamda1, system.lamda12,
+                  scl,
+                  conductivity,
+                  kappa,
+                  perm,
+                  thickness,
+                  n_layers)
 
 
 # def ip1dfwd(S, mod, z0):
@@ -18,8 +18,9 @@ eps0 = 1.0 / (mu0 * (c**2.0))
 nC0 = int32(120)
 nC1 = int32(140)
 
-from numba import jit
+from numba import jit, prange
 _numba_settings = {'nopython': True, 'nogil': False, 'fastmath': True, 'cache': False}
+_numba_parallel_settings = {'nopython': True, 'nogil': False, 'fastmath': True, 'cache': True, 'parallel': True}
 
 @jit(**_numba_settings)
 def nbFdem1dfwd(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, conductivity, susceptibility, permeability, thickness):
@@ -68,8 +69,63 @@ def nbFdem1dfwd(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0,
     return 1.e6 * scale * ((H - H0) / H0)
 
 
+@jit(**_numba_parallel_settings)
+def nbFdem1dfwd_batch(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, conductivity, susceptibility, permeability, thickness, nLayers):
+    """Forward model a stack of 1D layered models in parallel.
+
+    The model parameters are padded 2D arrays with one model per row.
+    Only the first nLayers[i] entries of row i are used.
+    tHeight and rHeight have one row per model.
+
+    """
+    nModels = len(nLayers)
+
+    out = empty((nModels, len(frequencies)), dtype=complex128)
+
+    for i in prange(nModels):
+        n = nLayers[i]
+        out[i, :] = nbFdem1dfwd(tid, frequencies, tHeight[i, :], rHeight[i, :], moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale,
+                                conductivity[i, :n], susceptibility[i, :n], permeability[i, :n], thickness[i, :n])
+
+    return out
+
+
+@jit(**_numba_parallel_settings)
+def nbFdem1dfwdsen_batch(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, conductivity, susceptibility, permeability, thickness, nLayers):
+    """Forward model a stack of 1D layered models and their sensitivities in parallel.
+
+    Takes the same arguments as nbFdem1dfwd_batch.
+    The sensitivity of model i is in the first nLayers[i] columns of the second output, and the remaining columns are zero.
+
+    """
+    nModels = len(nLayers)
+
+    out = empty((nModels, len(frequencies)), dtype=complex128)
+    J = zeros((nModels, len(frequencies), conductivity.shape[1]), dtype=complex128)
+
+    for i in prange(nModels):
+        n = nLayers[i]
+        out[i, :], J[i, :, :n] = nbFdem1dfwdsen(tid, frequencies, tHeight[i, :], rHeight[i, :], moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale,
+                                                conductivity[i, :n], susceptibility[i, :n], permeability[i, :n], thickness[i, :n])
+
+    return out, J
+
+
 @jit(**_numba_settings)
 def nbFdem1dsen(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, conductivity, susceptibility, permeability, thickness):
+    H, J = _nbFdem1dfwdsen(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, conductivity, susceptibility, permeability, thickness, False)
+    return J
+
+
+@jit(**_numba_settings)
+def nbFdem1dfwdsen(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, conductivity, susceptibility, permeability, thickness):
+    """Forward model the response and its sensitivity from a single pass of the recursion. """
+    return _nbFdem1dfwdsen(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, conductivity, susceptibility, permeability, thickness, True)
+
+
+@jit(**_numba_settings)
+def _nbFdem1dfwdsen(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0, lamda0, lamda02, w1, lamda1, lamda12, scale, conductivity, susceptibility, permeability, thickness, with_response):
+    """Sensitivity from a pass of the recursion, and the response from the same pass if with_response is True. """
 
     nFrequencies = int32(len(frequencies))
     nLayers = int32(len(conductivity))
@@ -88,6 +144,9 @@ def nbFdem1dsen(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0,
     thk = zeros(nL1, dtype=float64)
     thk[1:] = thickness
 
+    H = zeros(nFrequencies, dtype=complex128)
+    H0 = ones(nFrequencies, dtype=complex128)
+
     dH = zeros((nLayers, nFrequencies), dtype=complex128)
     dH0 = zeros((nLayers, nFrequencies), dtype=complex128)
 
@@ -97,8 +156,20 @@ def nbFdem1dsen(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0,
             useJ0 = True
 
     if (useJ0):
-        u0j0, sens0 = calcFdemSensitivity1D(nLayers, nFrequencies, nC0, frequencies, lamda0, lamda02, par, kappa, perm, thk)
-    u0j1, sens1 = calcFdemSensitivity1D(nLayers, nFrequencies, nC1, frequencies, lamda1, lamda12, par, kappa, perm, thk)
+        rTEj0, u0j0, sens0 = calcFdemSensitivity1D(nLayers, nFrequencies, nC0, frequencies, lamda0, lamda02, par, kappa, perm, thk)
+    rTEj1, u0j1, sens1 = calcFdemSensitivity1D(nLayers, nFrequencies, nC1, frequencies, lamda1, lamda12, par, kappa, perm, thk)
+
+    if with_response:
+        for i in range(nFrequencies):
+            id = tid[i]
+            if id == 1:
+                H[i], H0[i] =  Hxx(tHeight[i], rHeight[i], moments[i], rx[i], separation[i], rTEj0[i, :], w0, lamda0[i, :], lamda02[i, :], rTEj1[i, :], w1, lamda1[i, :])
+            elif id == 3:
+                H[i], H0[i] =  Hxz(tHeight[i], rHeight[i], moments[i], rx[i], separation[i], rTEj1[i, :], w1, lamda1[i, :], lamda12[i, :])
+            elif id == 7:
+                H[i], H0[i] =  Hzx(tHeight[i], rHeight[i], moments[i], rx[i], separation[i], rTEj1[i, :], u0j1[i, :], w1, lamda1[i, :], lamda12[i, :])
+            elif id == 9:
+                H[i], H0[i] = Hzz(tHeight[i], rHeight[i], moments[i], separation[i], rTEj0[i,  :], u0j0[i,  :], w0, lamda0[i, :])
 
     for k in range(nLayers):
         for i in range(nFrequencies):
@@ -118,7 +189,7 @@ def nbFdem1dsen(tid, frequencies, tHeight, rHeight, moments, rx, separation, w0,
         for i in range(nFrequencies):
             J[i, k] = 1.e6 * scale[i] * (dH[k, i] - dH0[k, i]) / dH0[k, i]
 
-    return J
+    return 1.e6 * scale * ((H - H0) / H0), J
 
 
 @jit(**_numba_settings)
@@ -133,6 +204,7 @@ def calcFdemSensitivity1D(nLayers, nFrequencies, nCoefficients, frequencies, lam
     Y, Yn, un = initCoefficients(nLayers, nFrequencies, nCoefficients, frequencies, lamda, lamda2, par, kappa, perm)
 
     if (nLayers == 1):
+        rTE = empty((nFrequencies, nCoefficients), dtype=complex128)
         u0 = zeros((nFrequencies, nCoefficients), dtype=complex128)
         sens = zeros((nLayers, nFrequencies, nCoefficients), dtype=complex128)
 
@@ -147,11 +219,12 @@ def calcFdemSensitivity1D(nLayers, nFrequencies, nCoefficients, frequencies, lam
                 a0 = Yn[0, i, jc]
                 a1 = Y[1, i, jc]
                 a2 = 1.0 / (a0 + a1)
+                rTE[i, jc] = (a0 - a1) * a2
                 sens[0, i, jc] = -2.0 * a0 * sens[0, i, jc] * a2**2.0
     else:
-        u0, sens = M1_1(nLayers, nFrequencies, nCoefficients, frequencies, Yn, Y, un, thk, par, kappa, perm)
+        rTE, u0, sens = M1_1(nLayers, nFrequencies, nCoefficients, frequencies, Yn, Y, un, thk, par, kappa, perm)
 
-    return u0, sens
+    return rTE, u0, sens
 
 
 @jit(**_numba_settings)
@@ -222,6 +295,7 @@ def M1_0(nLayers, nFrequencies, nCoefficients, Yn, Y, un, thk):
 @jit(**_numba_settings)
 def M1_1(nLayers, nFrequencies, nCoefficients, frequencies, Yn, Y, un, thk, par, kappa, perm):
 
+    rTE = empty((nFrequencies, nCoefficients), dtype=complex128)
     u0 = empty((nFrequencies, nCoefficients), dtype=complex128)
     sens = empty((nLayers, nFrequencies, nCoefficients), dtype=complex128)
 
@@ -287,6 +361,9 @@ def M1_1(nLayers, nFrequencies, nCoefficients, frequencies, Yn, Y, un, thk, par,
             a1 = Y[1, i, jc]
             a2 = 1.0 / (a0 + a1)
 
+            # The reflection coefficient is a by-product of the recursion.
+            rTE[i, jc] = (a0 - a1) * a2
+
             Y[1, i, jc] = a2**2.0
             Yn[0, i, jc] = -2.0 * a0 * Y[1, i, jc]
 
@@ -300,7 +377,7 @@ def M1_1(nLayers, nFrequencies, nCoefficients, frequencies, Yn, Y, un, thk, par,
             for jc in range(nCoefficients):
                 sens[k,  i, jc] *= Yn[0, i, jc] * accumulate[k2, i, jc]
 
-    return u0, sens
+    return rTE, u0, sens
 
 
 @jit(**_numba_settings)
@@ -58,9 +58,58 @@ def empymod_walktem(system, model1d):
         verb=0,# Short filter, so fast.
     )
 
+    # Everything after the frequency domain response is a fixed linear map for the system.
+    EM = np.ravel(EM)
+    return time_domain_operator(system) @ np.r_[EM.real, EM.imag]
+
+
+def time_domain_operator(system):
+    """Dense linear operator from the frequency domain response of bipole to the time domain data of a system.
+
+    The conversion from H to dB/dt, the off-time filters, the transform to the time domain,
+    and the waveform convolution are all linear in the frequency domain response,
+    so they are applied once to unit real and imaginary responses at each modelling frequency.
+    The operator is cached on the system, and the data of a frequency domain response EM are
+    operator @ np.r_[EM.real, EM.imag].
+
+    Parameters
+    ----------
+    system : geobipy.TdemSystem
+        Time domain system.
+
+    Returns
+    -------
+    out : numpy.ndarray
+        Operator with shape (system.times.size, 2 * system.modellingFrequencies.size).
+
+    """
+    operator = getattr(system, '_time_domain_operator', None)
+    if operator is None:
+        nFrequencies = np.size(system.modellingFrequencies)
+        operator = np.empty((np.size(system.times), 2 * nFrequencies))
+
+        unit = np.zeros(nFrequencies, dtype=np.complex128)
+        for i in range(nFrequencies):
+            unit[i] = 1.0
+            operator[:, i] = to_time_domain(system, unit)
+            unit[i] = 1.0j
+            operator[:, nFrequencies + i] = to_time_domain(system, unit)
+            unit[i] = 0.0
+
+        system._time_domain_operator = operator
+
+    return operator
+
+
+def to_time_domain(system, EM):
+    """Convert a frequency domain response of bipole to the time domain data of a system.
+
+    Used to build time_domain_operator.
+
+    """
     # Multiply the frequecny-domain result with
     # \mu for H->B, and i\omega for B->dB/dt.
-    EM *= 2j * np.pi * system.modellingFrequencies * 4e-7 * np.pi
+    EM = EM * 2j * np.pi * system.modellingFrequencies * 4e-7 * np.pi
 
     # Apply filters the data for the given system
     for filt in system.offTimeFilters:
@@ -68,13 +117,14 @@ def empymod_walktem(system, model1d):
 
 
     # === CONVERT TO TIME DOMAIN ===
-    EM, _ = np.squeeze(tem(EM[:, None],
-                       np.array([1]),
-                       system.modellingFrequencies,
-                       system.modellingTimes,
-                       -1,
-                       system.ft,
-                       system.ftarg))
+    EM, _ = tem(EM[:, None],
+                np.array([1]),
+                system.modellingFrequencies,
+                system.modellingTimes,
+                -1,
+                system.ft,
+                system.ftarg)
+    EM = np.squeeze(EM)
 
     # === APPLY WAVEFORM ===
     return waveform(system.modellingTimes, EM, system.times, system.waveform.time-system.delayTime, system.waveform.amplitude)
@@ -0,0 +1,183 @@
+""" @HalfSpaceTable_Class
+Module describing a lookup table of half space responses for an acquisition system
+"""
+from copy import deepcopy
+from os.path import isfile
+import h5py
+import numpy as np
+from ..core.myObject import myObject
+from ..core import StatArray
+
+class HalfSpaceTable(myObject):
+    """Lookup table of the predicted data of half spaces over a grid of conductivities and heights.
+
+    The table is built once for the system of a data point, and can be written to disk and shared by every data point that uses the same system.
+    Finding the best fitting half space of a data point then only needs a misfit evaluation against
+    the responses interpolated to the height of the data point.
+
+    Any other loop geometry of the data point, such as the orientation and offsets of time domain loops, is fixed to
+    that of the data point the table was built from. Data points whose geometry differs by more than the tolerance are not covered by the table.
+
+    HalfSpaceTable(conductivity, height, responses, geometry=None, tolerance=1.0)
+
+    Parameters
+    ----------
+    conductivity : geobipy.StatArray
+        Log spaced half space conductivities with size nConductivity.
+    height : geobipy.StatArray
+        Increasing sensor heights with size nHeight.
+    responses : geobipy.StatArray
+        Predicted data with shape (nHeight, nConductivity, nChannels).
+    geometry : array_like, optional
+        Loop geometry, other than the height, of the data point the table was built from. See EmDataPoint.loop_geometry.
+    tolerance : float, optional
+        Largest absolute difference in any entry of the loop geometry of a data point covered by the table.
+
+    """
+
+    def __init__(self, conductivity, height, responses, geometry=None, tolerance=1.0):
+        """ Instantiate a half space table """
+
+        assert np.all(np.diff(height) > 0.0), ValueError("height must be increasing")
+        assert np.shape(responses)[:2] == (np.size(height), np.size(conductivity)), ValueError("responses must have shape (height.size, conductivity.size, nChannels)")
+
+        self.conductivity = StatArray.StatArray(conductivity, 'Conductivity', r'$\frac{S}{m}$')
+        self.height = StatArray.StatArray(height, 'Height', 'm')
+        self.responses = StatArray.StatArray(responses, 'Half space responses')
+        self.geometry = StatArray.StatArray(np.empty(0) if geometry is None else np.asarray(geometry, dtype=np.float64), 'Loop geometry')
+        self.tolerance = np.float64(tolerance)
+
+    def __deepcopy__(self, memo={}):
+        return HalfSpaceTable(deepcopy(self.conductivity, memo), deepcopy(self.height, memo), deepcopy(self.responses, memo),
+                              deepcopy(self.geometry, memo), self.tolerance)
+
+    @property
+    def nChannels(self):
+        return self.responses.shape[-1]
+
+    @classmethod
+    def build(cls, datapoint, height=None, minConductivity=1e-4, maxConductivity=1e4, nSamples=100, tolerance=1.0):
+        """Compute the half space responses for the system of a data point.
+
+        Parameters
+        ----------
+        datapoint : geobipy.EmDataPoint
+            Data point whose system, and any loop geometry, is used for the forward modelling.
+        height : array_like, optional
+            Sensor heights to tabulate. Defaults to 0 to 200m every 1m.
+        minConductivity : float, optional
+            The minimum conductivity of the table.
+        maxConductivity : float, optional
+            The maximum conductivity of the table.
+        nSamples : int, optional
+            The number of conductivities between the min and max.
+        tolerance : float, optional
+            Largest difference in loop geometry from datapoint of the data points covered by the table.
+
+        Returns
+        -------
+        out : geobipy.HalfSpaceTable
+            The half space table.
+
+        """
+        assert maxConductivity > minConductivity, ValueError("Maximum conductivity must be greater than the minimum")
+
+        if height is None:
+            height = np.linspace(0.0, 200.0, 201)
+
+        conductivity = np.logspace(np.log10(minConductivity), np.log10(maxConductivity), nSamples)
+
+        datapoint = deepcopy(datapoint)
+        responses = np.empty((np.size(height), nSamples, datapoint.nChannels))
+        for i, h in enumerate(height):
+            datapoint.z[0] = h
+            responses[i, :, :] = datapoint.halfspace_responses(conductivity)
+
+        return cls(conductivity, height, responses, datapoint.loop_geometry, tolerance)
+
+    def covers(self, datapoint):
+        """Whether the height and loop geometry of a data point lie inside the table. """
+        if not self.covers_height(datapoint.z.item()):
+            return False
+
+        geometry = datapoint.loop_geometry
+        if np.size(geometry) != self.geometry.size:
+            return False
+        return np.all(np.abs(geometry - self.geometry) <= self.tolerance)
+
+    def covers_height(self, height):
+        """Whether the height lies inside the table. """
+        return (self.height[0] <= height) & (height <= self.height[-1])
+
+    def interpolate(self, height):
+        """Half space responses linearly interpolated to a height.
+
+        Parameters
+        ----------
+        height : float
+            Sensor height inside the table.
+
+        Returns
+        -------
+        out : numpy.ndarray
+            Predicted data with shape (nConductivity, nChannels)
+
+        """
+        assert self.covers_height(height), ValueError("height {} is outside the table [{}, {}]".format(height, self.height[0], self.height[-1]))
+
+        i = np.clip(self.height.searchsorted(height) - 1, 0, self.height.size - 2)
+        w = (height - self.height[i]) / (self.height[i+1] - self.height[i])
+
+        return (1.0 - w) * self.responses[i, :, :] + w * self.responses[i+1, :, :]
+
+    def lookup(self, datapoint):
+        """Index of the tabulated conductivity that best fits the data of a data point.
+
+        Parameters
+        ----------
+        datapoint : geobipy.EmDataPoint
+            Data point with data and standard deviations, covered by the table.
+
+        Returns
+        -------
+        out : int
+            Index into self.conductivity.
+
+        """
+        assert datapoint.nChannels == self.nChannels, ValueError("datapoint has {} channels but the table has {}".format(datapoint.nChannels, self.nChannels))
+
+        predicted = self.interpolate(datapoint.z.item())
+
+        active = datapoint.active
+        PhiD = np.sum(((predicted[:, active] - datapoint.data[active]) / datapoint.std[active])**2.0, axis=1)
+        return np.argmin(PhiD)
+
+    def toHdf(self, h5obj, name):
+        """ Write the object to a HDF file """
+        grp = self.create_hdf_group(h5obj, name)
+        self.conductivity.toHdf(grp, 'conductivity')
+        self.height.toHdf(grp, 'height')
+        self.responses.toHdf(grp, 'responses')
+        self.geometry.toHdf(grp, 'geometry')
+        grp.attrs['tolerance'] = self.tolerance
+
+    @classmethod
+    def fromHdf(cls, grp):
+        """ Reads the object from a HDF file """
+        conductivity = StatArray.StatArray.fromHdf(grp['conductivity'])
+        height = StatArray.StatArray.fromHdf(grp['height'])
+        responses = StatArray.StatArray.fromHdf(grp['responses'])
+        geometry = StatArray.StatArray.fromHdf(grp['geometry'])
+        return cls(conductivity, height, responses, geometry, grp.attrs['tolerance'])
+
+    def write(self, filename):
+        """Write the table to its own HDF5 file. """
+        with h5py.File(filename, 'w') as f:
+            self.toHdf(f, 'halfspace_table')
+
+    @classmethod
+    def read(cls, filename):
+        """Read a table written with HalfSpaceTable.write. """
+        assert isfile(filename), ValueError("Could not find half space table {}".format(filename))
+        with h5py.File(filename, 'r') as f:
+            return cls.fromHdf(f['halfspace_table'])
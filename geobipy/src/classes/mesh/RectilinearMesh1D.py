@@ -3,7 +3,7 @@ Module describing a 1D Rectilinear Mesh class
 """
 from .Mesh import Mesh
 from ...classes.core import StatArray
-from copy import deepcopy
+from copy import copy, deepcopy
 import numpy as np
 from ...base import utilities
 from ...base import plotting as cp
@@ -104,6 +104,14 @@ class RectilinearMesh1D(Mesh):
 
         return out
 
+    def __copy__(self):
+        """Lightweight copy used to generate candidate meshes. Only the number of cells is copied, everything else is shared. """
+        out = type(self).__new__(type(self))
+        out.__dict__.update(self.__dict__)
+        out._nCells = copy(self._nCells)
+        out._action = copy(self.action)
+        return out
+
     def __getitem__(self, slic):
         """Slice into the class. """
 
@@ -438,7 +446,9 @@ class RectilinearMesh1D(Mesh):
 
         """
 
-        edges = self.edges
+        # Plain arrays, this is called every iteration when updating posteriors.
+        edges = np.asarray(self.edges)
+        values = np.asarray(values)
 
         # Remove values that are out of bounds
         if trim:
@@ -446,13 +456,13 @@ class RectilinearMesh1D(Mesh):
                             (values < edges[-1])]
 
         reversed = False
-        if self.edges[-1] < self.edges[0]:
+        if edges[-1] < edges[0]:
             reversed = True
-            edges = self.edges[::-1]
+            edges = edges[::-1]
 
 
         values, dum = utilities._log(np.atleast_1d(values).flatten(), self.log)
-        values = values - self.relativeTo
+        values = values - np.asarray(self.relativeTo)
 
         # Get the bin indices for all values
         iBin = np.atleast_1d(edges.searchsorted(values, side='right') - 1)
@@ -529,8 +539,8 @@ class RectilinearMesh1D(Mesh):
 
         assert 1 <= i <= (self.nEdges - 1), ValueError("Required  1 <= i <= {}".format(self.nEdges-1))
 
-        # Deepcopy the Model to ensure priors and proposals are preserved
-        out = deepcopy(self)
+        # Copy the mesh, priors and proposals are shared
+        out = copy(self)
         # Remove the interface depth
         out.edges = out.edges.delete(i)
 
@@ -539,7 +549,7 @@ class RectilinearMesh1D(Mesh):
         #     self._nCells[0] += 
 
         if values is not None:
-            values = deepcopy(values)
+            values = copy(values)
             if isinstance(values, list):
                 for j in range(len(values)):
                     tmp = values[j]
@@ -615,8 +625,8 @@ class RectilinearMesh1D(Mesh):
         # Get the index to insert the new layer
         i = self.edges.searchsorted(value)
 
-        # Deepcopy the 1D Model
-        out = deepcopy(self)
+        # Copy the mesh, priors and proposals are shared
+        out = copy(self)
 
         # Insert the new layer depth
         out.edges = self.edges.insert(i, value)
@@ -626,7 +636,7 @@ class RectilinearMesh1D(Mesh):
         #     self._nCells[0] += 1
 
         if values is not None:
-            values = deepcopy(values)
+            values = copy(values)
             if isinstance(values, list):
                 for j in range(len(values)):
                     values[j] = values[j].insert(i, values[j][i-1])    
@@ -842,11 +852,11 @@ class RectilinearMesh1D(Mesh):
 
             # Return if no change
             if (event == 3):
-                out = deepcopy(self)
+                out = copy(self)
                 out._action = ['none', 0, 0.0]
 
                 if values is not None:
-                    return out, deepcopy(values)
+                    return out, copy(values)
                 return out
 
             # Otherwise enter life-death-perturb cycle
@@ -900,12 +910,12 @@ class RectilinearMesh1D(Mesh):
                         tryAgain = True
 
                 if (not tryAgain):
-                    out = deepcopy(self)
+                    out = copy(self)
                     # z0[i] += dz  # Perturb the depth in the model
                     out.edges = z
                     out._action = ['perturb', np.int32(i), dz]
                     if values is not None:
-                        return out, deepcopy(values)
+                        return out, copy(values)
                     return out
 
         assert False, Exception("Should not be here, file a bug report....")
@@ -2,7 +2,8 @@
 Module describing a Model
 """
 import numpy as np
-from copy import deepcopy
+from copy import copy, deepcopy
+from scipy.linalg import cho_solve
 from ...base.utilities import reslice
 from ...base import plotting as cP
 from matplotlib.figure import Figure
@@ -56,6 +57,17 @@ class Model(myObject):
         #         out.setattr(k, deepcopy(v, memo=memo))
 
         return out
+
+    def __copy__(self):
+        """Lightweight copy used to generate candidate models.
+
+        The values are copied, while the mesh and any attached priors, proposals, and posteriors are shared.
+
+        """
+        out = type(self).__new__(type(self))
+        out.__dict__.update(self.__dict__)
+        out._values = copy(self.values)
+        return out
     
     @property
     def gradient(self):
@@ -83,7 +95,10 @@ class Model(myObject):
 
         gradient = StatArray.StatArray(self.mesh.gradient(values=self.values), 'Derivative', r"$\frac{"+self.values.units+"}{"+self.mesh.edges.units+"}$")
         if self._gradient is not None:
-            gradient.copyStats(self._gradient)
+            # Share the attached statistics, the values are recomputed on every call.
+            gradient.prior = self._gradient.prior
+            gradient.proposal = self._gradient.proposal
+            gradient.posterior = self._gradient.posterior
         
         self._gradient = gradient
         return self._gradient
@@ -201,6 +216,27 @@ class Model(myObject):
         else:
             return self.values.proposal.variance
 
+    def compute_local_precision_factor(self, observation=None):
+        """Generate the Cholesky factor of a localized Hessian matrix using
+        a dataPoint and the current realization of the Model1D.
+
+        Parameters
+        ----------
+        observation : geobipy.DataPoint, geobipy.Dataset, optional
+            The observed data to use when computing the local estimate of the variance.
+
+        Returns
+        -------
+        out : array_like
+            Lower triangular Cholesky factor of the Hessian matrix
+
+        """
+        # Factor a new Hessian only if the structure of the model changed.
+        if (self.mesh.action[0] in ['insert', 'delete']):
+            return np.linalg.cholesky(self.local_precision(observation))
+        else:
+            return self.values.proposal.precision_factor
+
     def delete_edge(self, i):
         out, values = self.mesh.delete_edge(i, values=self.values)
         out = type(self)(mesh=out, values=values)
@@ -291,6 +327,23 @@ class Model(myObject):
         out : array_like
             Inverse Hessian matrix
 
+        """
+        return np.linalg.inv(self.local_precision(observation))
+
+    def local_precision(self, observation=None):
+        """Generate a localized Hessian matrix using a dataPoint and the current realization of the Model1D.
+
+        Parameters
+        ----------
+        datapoint : geobipy.DataPoint, optional
+            The data point to use when computing the local estimate of the Hessian.
+            If None, only the prior derivative is used.
+
+        Returns
+        -------
+        out : array_like
+            Hessian matrix
+
         """
         assert self.values.hasPrior or self.gradient.hasPrior, Exception("Model must have either a parameter prior or gradient prior, use self.set_priors()")
 
@@ -301,9 +354,9 @@ class Model(myObject):
         #     hessian += self.gradient.priorDerivative(order=2)
 
         if not observation is None:
-            hessian += observation.prior_derivative(model=self, order=2)        
+            hessian += observation.prior_derivative(model=self, order=2)
 
-        return np.linalg.inv(hessian)
+        return hessian
 
     def pad(self, shape):
         """Copies the properties of a model including all priors or proposals, but pads memory to the given size
@@ -360,9 +413,10 @@ class Model(myObject):
     def perturb_structure(self, update_priors=True):
         
         remapped_mesh, remapped_values = self.mesh.perturb(values=self.values)
-        remapped_model = type(self)(remapped_mesh, values=remapped_values)
-
-        remapped_model._gradient = deepcopy(self._gradient)
+        # Assign directly rather than through the values setter to avoid copying the attached statistics.
+        remapped_model = type(self)(remapped_mesh)
+        remapped_model._values = remapped_values
+        remapped_model._gradient = self._gradient
 
         # if len(remapped_values) > 1:
         #     for k, v in zip(self.__values, remapped_values[1:]):
@@ -603,18 +657,19 @@ class Model(myObject):
 
         # Compute the stochastic newton offset.
         # The negative sign because we want to move downhill
-        SN_step_from_perturbed = 0.5 * np.dot(self.values.proposal.variance, gradient)
+        SN_step_from_perturbed = 0.5 * self.values.proposal.variance_dot(gradient)
 
         prng = self.values.proposal.prng
+        precision_factor = self.values.proposal.precision_factor
 
         # Create a multivariate normal distribution centered on the shifted parameter values, and with variance computed from the forward step.
         # We don't recompute the variance using the perturbed parameters, because we need to check that we could in fact step back from
         # our perturbed parameters to the unperturbed parameters. This is the crux of the reversible jump.
-        tmp = Distribution('MvLogNormal', np.exp(np.log(self.values) - SN_step_from_perturbed), self.values.proposal.variance, linearSpace=True, prng=prng)
+        tmp = Distribution('MvLogNormal', np.exp(np.log(self.values) - SN_step_from_perturbed), precision_factor=precision_factor, linearSpace=True, prng=prng)
         # Probability of jumping from our perturbed parameter values to the unperturbed values.
         proposal = tmp.probability(x=remappedModel.values, log=True)
 
-        tmp = Distribution('MvLogNormal', remappedModel.values, self.values.proposal.variance, linearSpace=True, prng=prng)
+        tmp = Distribution('MvLogNormal', remappedModel.values, precision_factor=precision_factor, linearSpace=True, prng=prng)
         proposal1 = tmp.probability(x=self.values, log=True)
 
         action = self.mesh.action[0]
@@ -757,7 +812,8 @@ class Model(myObject):
         remapped_model = self.perturb_structure()
 
         # Update the local Hessian around the current model.
-        inverse_hessian = remapped_model.compute_local_inverse_hessian(observation)
+        # Its Cholesky factor is used for the Newton step, and for sampling and evaluating the proposal.
+        precision_factor = remapped_model.compute_local_precision_factor(observation)
 
         # Proposing new parameter values
         # This is Wm'Wm(sigma - sigma_ref)
@@ -772,15 +828,15 @@ class Model(myObject):
         # This is the equivalent to the full newton gradient of the deterministic objective function.
         # delta sigma = 0.5 * inv(J'Wd'WdJ + Wm'Wm)(J'Wd'(dPredicted - dObserved) + Wm'Wm(sigma - sigma_ref))
         # This could be replaced with a CG solver for bigger problems like deterministic algorithms.
-        dSigma = 0.5 * np.dot(inverse_hessian, gradient)
+        dSigma = 0.5 * cho_solve((precision_factor, True), gradient)
 
         mean = np.log(remapped_model.values) - dSigma
 
-        perturbed_model = deepcopy(remapped_model)
+        perturbed_model = copy(remapped_model)
 
         # Assign a proposal distribution for the parameter using the mean and variance.
         perturbed_model.values.proposal = Distribution('MvLogNormal', mean=np.exp(mean),
-                                                      variance=inverse_hessian,
+                                                      precision_factor=precision_factor,
                                                       linearSpace=True,
                                                       prng=perturbed_model.values.proposal.prng)
 
@@ -812,35 +868,39 @@ class Model(myObject):
         # Update the hitmap posterior
         self.update_parameter_posterior(axis=0)
 
-    def update_parameter_posterior(self, axis=0):
+    def update_parameter_posterior(self, axis=0, counts=None):
         """ Imposes a model's parameters with depth onto a 2D Hitmap.
 
         The cells that the parameter-depth profile passes through are accumulated by 1.
+        The parameter bin of each layer is found once, and a compiled loop walks the layer edges
+        down the depth bins of the hitmap, incrementing the counts in place.
 
         Parameters
         ----------
-        Hitmap : geobipy.Hitmap
-            The hitmap to add to
+        axis : int, optional
+            Parameter axis of the hitmap.
+        counts : array_like, optional
+            Accumulate into these counts instead of the hitmap's, e.g. a buffer local to a thread
+            that is added to the hitmap periodically. Must have the shape of the hitmap.
 
         """
         histogram = self.values.posterior
 
-        # Interpolate the cell centres and parameter values to the 'axis' of the histogram
-        values = self.mesh.piecewise_constant_interpolate(self.values, histogram, axis=1-axis)
-
-        # values is now histogram.axis(axis).nCells in length
-        # interpolate those values to the opposite axis
-        i0 = histogram.cellIndex(values, axis=axis, clip=True)
+        if counts is None:
+            counts = histogram.counts
 
         ax = histogram.axis(1-axis)
         # Get the bounding indices depending on whether the mesh has open limits.
         if self.mesh.open_right:
-            mx = ax.nCells
+            mx = ax.nCells.item()
         else:
-            mx = ax.cellIndex(self.mesh.edges[-1], clip=True)
-        i1 = np.arange(mx)
+            mx = np.int64(ax.cellIndex(self.mesh.edges[-1], clip=True).item())
+
+        # A one layer model gives a scalar bin
+        layer_bins = np.atleast_1d(histogram.cellIndex(self.values, axis=axis, clip=True))
 
-        histogram.counts[i0, i1] += 1
+        counts = np.asarray(counts)
+        utilities.accumulate_layered_hitmap(counts if axis == 0 else counts.T, layer_bins, np.asarray(self.mesh.edges, dtype=np.float64), np.asarray(ax.centres, dtype=np.float64), mx)
 
     def resample(self, dx, dy):
         mesh, values = self.mesh.resample(dx, dy, self.values, kind='cubic')
@@ -4,7 +4,7 @@ import numpy as np
 from pandas import DataFrame, read_csv
 from ...classes.core import StatArray
 from ...base import fileIO as fIO
-# from ...base import interpolation
+from ...base import interpolation
 from ...base import utilities as cf
 from ...base import plotting as cP
 from .Point import Point
@@ -270,31 +270,135 @@ class PointCloud3D(myObject):
         return np.ravel_multi_index([ix, iy], (ax.nCells.item(), ay.nCells.item()))
 
 
-    def block_mean(self, dx, dy, values=None):
+    def _block_segments(self, dx=None, dy=None, x_grid=None, y_grid=None):
+        """Sort the points once by block.
 
-        i_cell = self.block_indices(dx, dy)
+        Returns
+        -------
+        isort : ints
+            Index that sorts the points by block.
+        cells : ints
+            Raveled cell index of each occupied block.
+        starts : ints
+            Position in isort of the first point in each occupied block.
+        counts : ints
+            Number of points in each occupied block.
+
+        """
+        i_cell = self.block_indices(dx, dy, x_grid, y_grid)
+
+        isort = np.argsort(i_cell, kind='stable')
+        sorted_cells = i_cell[isort]
+
+        starts = np.flatnonzero(np.hstack([True, np.diff(sorted_cells) > 0]))
+        counts = np.diff(np.hstack([starts, i_cell.size]))
+
+        return isort, sorted_cells[starts], starts, counts
 
-        isort = np.argsort(i_cell)
-        n_new = np.unique(i_cell).size
-        cuts = np.hstack([0, np.squeeze(np.argwhere(np.diff(i_cell[isort]) > 0)), i_cell.size])
+    def block_statistic(self, dx=None, dy=None, x_grid=None, y_grid=None, values=None, statistic='mean', percent=50.0):
+        """Reduce values within juxtaposed blocks across the domain.
+
+        The points are sorted by block once, and each statistic is computed over every block in a single vectorised pass.
+
+        Parameters
+        ----------
+        dx : float
+            Increment in x.
+        dy : float
+            Increment in y.
+        values : array_like, optional
+            Values with shape (nPoints,) or (nPoints, nChannels).
+            Defaults to self.z.
+        statistic : str, optional
+            One of 'mean', 'median', 'min', 'max', 'count', or 'percentile'.
+        percent : float, optional
+            Percentile in [0, 100] when statistic is 'percentile'. Linearly interpolated like numpy.percentile.
+
+        Returns
+        -------
+        cells : ints
+            Raveled cell index of each occupied block, increasing.
+        out : array_like
+            Reduced values with shape (nBlocks,) or (nBlocks, nChannels).
+
+        """
+        statistic = statistic.lower()
+        assert statistic in ('mean', 'median', 'min', 'max', 'count', 'percentile'), ValueError("statistic must be one of ['mean', 'median', 'min', 'max', 'count', 'percentile']")
+
+        isort, cells, starts, counts = self._block_segments(dx, dy, x_grid, y_grid)
+
+        if statistic == 'count':
+            return cells, counts
 
         if values is None:
             values = self.z
 
-        x_new = np.empty(n_new)
-        y_new = np.empty(n_new)
-        z_new = np.empty(n_new)
-        e_new = np.empty(n_new)
+        values = np.asarray(values)
+        assert values.shape[0] == self.nPoints, ValueError("values must have first dimension {}".format(self.nPoints))
+
+        if statistic == 'median':
+            statistic, percent = 'percentile', 50.0
+
+        if statistic == 'mean':
+            out = np.add.reduceat(values[isort], starts, axis=0)
+            out = out / (counts if values.ndim == 1 else counts[:, None])
+        elif statistic == 'min':
+            out = np.minimum.reduceat(values[isort], starts, axis=0)
+        elif statistic == 'max':
+            out = np.maximum.reduceat(values[isort], starts, axis=0)
+        else:
+            assert 0.0 <= percent <= 100.0, ValueError("percent must be in [0, 100]")
+            i_cell = np.repeat(cells, counts)
+            channels = values.reshape(self.nPoints, -1)
+
+            # Fractional position of the percentile inside each block.
+            position = (counts - 1) * (0.01 * percent)
+            lo = np.floor(position).astype(np.int64)
+            hi = np.ceil(position).astype(np.int64)
+            w = position - lo
 
-        for i in range(cuts.size-1):
-            i_cut = isort[cuts[i]:cuts[i+1]]
-            x_new[i] = np.mean(self.x[i_cut])
-            y_new[i] = np.mean(self.y[i_cut])
-            z_new[i] = np.mean(self.z[i_cut])
-            e_new[i] = np.mean(self.elevation[i_cut])
+            out = np.empty((cells.size, channels.shape[1]))
+            for j in range(channels.shape[1]):
+                # Sort by block, then by value within each block.
+                v = channels[isort, j]
+                v = v[np.lexsort((v, i_cell))]
+                out[:, j] = (1.0 - w) * v[starts + lo] + w * v[starts + hi]
 
-        return PointCloud3D(x=x_new, y=y_new, z=z_new, elevation=e_new)
+            out = out.reshape((cells.size,) + values.shape[1:])
 
+        return cells, out
+
+    def block_mean(self, dx=None, dy=None, x_grid=None, y_grid=None, values=None):
+        """Mean location of the points within juxtaposed blocks across the domain.
+
+        Parameters
+        ----------
+        dx : float
+            Increment in x.
+        dy : float
+            Increment in y.
+        values : array_like, optional
+            Extra values with shape (nPoints,) or (nPoints, nChannels) to average in each block.
+
+        Returns
+        -------
+        geobipy.PointCloud3D : Contains one point in each block.
+        out : array_like, optional
+            Block means of values, only returned if values are given.
+
+        """
+        channels = [self.x, self.y, self.z, self.elevation]
+        if not values is None:
+            channels.append(np.reshape(values, (self.nPoints, -1)))
+
+        _, means = self.block_statistic(dx, dy, x_grid, y_grid, values=np.column_stack(channels), statistic='mean')
+
+        out = PointCloud3D(x=means[:, 0], y=means[:, 1], z=means[:, 2], elevation=means[:, 3])
+
+        if values is None:
+            return out
+
+        return out, means[:, 4:].reshape((means.shape[0],) + np.shape(values)[1:])
 
     def block_median_indices(self, dx=None, dy=None, x_grid=None, y_grid=None, values=None):
         """Index to the median point within juxtaposed blocks across the domain.
@@ -313,27 +417,16 @@ class PointCloud3D(myObject):
         -------
         ints : Index of the median point in each block.
         """
-        i_cell = self.block_indices(dx, dy, x_grid, y_grid)
-
-        isort = np.argsort(i_cell)
-        n_new = np.unique(i_cell).size
-
-        cuts = np.squeeze(np.argwhere(np.diff(i_cell[isort]) > 0))
-        if cuts[0] != 0:
-            cuts = np.hstack([0, cuts])
-        if cuts[-1] != i_cell.size:
-            cuts = np.hstack([cuts, i_cell.size])
+        isort, cells, starts, counts = self._block_segments(dx, dy, x_grid, y_grid)
 
         if values is None:
             values = self.z
 
-        i_new = np.empty(cuts.size-1, dtype=np.int64)
-        for i in range(cuts.size-1):
-            i_cut = isort[cuts[i]:cuts[i+1]]
-            tmp = values[i_cut]
-            i_new[i] = i_cut[np.argpartition(tmp, tmp.size // 2)[tmp.size // 2]]
+        # Sort by block, then by value within each block, and take the middle point of each block.
+        i_cell = np.repeat(cells, counts)
+        order = isort[np.lexsort((np.asarray(values)[isort], i_cell))]
 
-        return i_new
+        return order[starts + counts // 2]
 
 
     def block_median(self, dx=None, dy=None, x_grid=None, y_grid=None, values=None):
@@ -459,7 +552,7 @@ class PointCloud3D(myObject):
             Defaults to None.
         method : str, optional
             * 'ct' uses Clough Tocher interpolation
-            * 'mc' uses Minimum curvature and requires pygmt to be installed.
+            * 'mc' uses Minimum curvature. See interpMinimumCurvature.
             Defaults to 'ct'.
         mask : float, optional
             Cells of distance mask away from points are NaN.
@@ -579,21 +672,113 @@ class PointCloud3D(myObject):
         return out, kwargs
 
     def interpMinimumCurvature(self, mesh, values, mask=False, clip=True, i=None, operator=None, condition=None, **kwargs):
+        """Interpolate values at the points to a regular grid with a minimum curvature, tension spline surface.
+
+        Uses the gridder in geobipy.src.base.interpolation.minimum_curvature, or pygmt.surface if gmt=True.
+
+        Parameters
+        ----------
+        mesh : geobipy.RectilinearMesh2D
+            Regular mesh whose cell centres are the grid nodes.
+        values : array_like
+            Values to interpolate.  Must have size self.nPoints.
+        mask : float, optional
+            Cells of distance mask away from points are NaN.
+        clip : bool, optional
+            Clip any overshot grid values to the min/max of values.
+        i : ints, optional
+            Use only the i locations during interpolation.
+
+        OtherParameters
+        ---------------
+        tension : float, optional
+            Tension of the spline in [0, 1]. Defaults to 0.25.
+        smoothing : float, optional
+            Weight of the spline energy against the data misfit. Defaults to 1e-2.
+        iterations : int, optional
+            Maximum number of conjugate gradient iterations on each grid. Defaults to 200.
+        accuracy : float, optional
+            Relative residual to stop the conjugate gradients at. Defaults to 1e-4.
+        gmt : bool, optional
+            Use pygmt.surface instead, with its own meaning of iterations and accuracy. Defaults to False.
+
+        Returns
+        -------
+        geobipy.Model : Interpolated values.
+
+        """
+        assert isinstance(mesh, RectilinearMesh2D), TypeError("mesh must be RectilinearMesh2D")
+        assert mesh.is_regular, ValueError("Minimum curvature must interpolate to a regular mesh")
+
+        if kwargs.pop('gmt', False):
+            return self._interp_gmt_surface(mesh, values, mask=mask, clip=clip, i=i, **kwargs)
+
+        tension = kwargs.pop('tension', 0.25)
+        smoothing = kwargs.pop('smoothing', 1e-2)
+        iterations = kwargs.pop('iterations', 200)
+        accuracy = kwargs.pop('accuracy', 1e-4)
+
+        x = self.x
+        y = self.y
+
+        name, units = cf.getName(values), cf.getUnits(values)
+
+        if not i is None:
+            x = x[i]
+            y = y[i]
+            values = values[i]
+
+        # Work on a copy, the caller's values are left untouched.
+        values = np.array(values, dtype=np.float64)
+        values[values == np.inf] = np.nan
+        mn = np.nanmin(values)
+        mx = np.nanmax(values)
+
+        values -= mn
+        if (mx - mn) != 0.0:
+            values = values / (mx - mn)
+
+        vals = interpolation.minimum_curvature(x, y, values, mesh.x.centres, mesh.y.centres,
+                                               tension=tension, smoothing=smoothing, accuracy=accuracy, iterations=iterations)
+
+        if clip:
+            vals = np.clip(vals, kwargs.pop('clip_min', np.nanmin(values)), kwargs.pop('clip_max', np.nanmax(values)))
+
+        if (mx - mn) != 0.0:
+            vals = vals * (mx - mn)
+        vals += mn
+
+        # Use distance masking
+        if mask:
+            if i is None:
+                self.setKdTree(nDims = 2)
+                kdt = self.kdtree
+            else:
+                kdt = cKDTree(np.column_stack((x, y)))
+            xi = _ndim_coords_from_arrays(tuple(np.meshgrid(mesh.x.centres, mesh.y.centres, indexing='ij')), ndim=2)
+            dists, _ = kdt.query(xi)
+            vals[dists > mask] = np.nan
+
+        vals = StatArray.StatArray(vals, name=name, units=units)
+
+        out = Model(mesh=mesh, values=vals)
+
+        return out, kwargs
+
+    def _interp_gmt_surface(self, mesh, values, mask=False, clip=True, i=None, **kwargs):
+        """ Minimum curvature interpolation using pygmt.surface """
 
         try:
             from pygmt import surface
         except Exception as e:
             print(repr(e))
-            raise Exception(("\npygmt not installed correctly.  method='mc' can only be used when pygmt is present.\n"
+            raise Exception(("\npygmt not installed correctly.  gmt=True can only be used when pygmt is present.\n"
                              "To install pygmt, you need to use conda environments. Installing instructions are here\n"
                              "https://www.pygmt.org/latest/install.html \n"
                              "After creating a new conda environment do\n"
                              "'pip install -c conda-forge numpy pandas xarray netcdf4 packaging gmt pygmt'\n"
                              "Then install geobipy and its dependencies to that environment."))
 
-        assert isinstance(mesh, RectilinearMesh2D), TypeError("mesh must be RectilinearMesh2D")
-        assert mesh.is_regular, ValueError("Minimum curvature must interpolate to a regular mesh")
-
         iterations = kwargs.pop('iterations', 2000)
         tension = kwargs.pop('tension', 0.25)
         accuracy = kwargs.pop('accuracy', 0.01)
@@ -601,11 +786,15 @@ class PointCloud3D(myObject):
         x = self.x
         y = self.y
 
+        name, units = cf.getName(values), cf.getUnits(values)
+
         if not i is None:
             x = x[i]
             y = y[i]
             values = values[i]
 
+        # Work on a copy, the caller's values are left untouched.
+        values = np.array(values, dtype=np.float64)
         values[values == np.inf] = np.nan
         mn = np.nanmin(values)
         mx = np.nanmax(values)
@@ -637,7 +826,7 @@ class PointCloud3D(myObject):
             dists, indexes = kdt.query(xi)
             vals[dists > mask] = np.nan
 
-        vals = StatArray.StatArray(vals, name=cf.getName(values), units = cf.getUnits(values))
+        vals = StatArray.StatArray(vals, name=name, units=units)
 
         out = Model(mesh=mesh, values=vals.T)
 
@@ -11,6 +11,7 @@ from .NormalDistribution import Normal
 from .LogNormalDistribution import LogNormal
 from .MvNormalDistribution import MvNormal
 from .MvLogNormalDistribution import MvLogNormal
+from .MvDiagonalNormalDistribution import MvDiagonalNormal
 from .UniformDistribution import Uniform
 from .GammaDistribution import Gamma
 from .OrderStatistics import Order
@@ -23,7 +24,7 @@ def Distribution(distributionType, *args, **kwargs):
     Parameters
     ----------
     distributionType : str or subclass of baseDistribution
-        If distributionType is str, choose between {Normal, MvNormal, Uniform, Gamma, Order, Categorical}
+        If distributionType is str, choose between {Normal, MvNormal, MvDiagonalNormal, Uniform, Gamma, Order, Categorical}
         if distributionType is subclass of baseDistribution, a copy is made
     \*args : See the documentation for each distribution type to determine what *args could be
     \*\*kwargs : See the documentation for each distribution type to determine what key words could be
@@ -52,6 +53,7 @@ def Distribution(distributionType, *args, **kwargs):
     --------
     geobipy.src.classes.statistics.NormalDistribution
     geobipy.src.classes.statistics.MvNormalDistribution
+    geobipy.src.classes.statistics.MvDiagonalNormalDistribution
     geobipy.src.classes.statistics.UniformDistribution
     geobipy.src.classes.statistics.GammaDistribution
     geobipy.src.classes.statistics.OrderStatistics
@@ -81,6 +83,9 @@ def Distribution(distributionType, *args, **kwargs):
     elif (tName == 'mvlognormal'):
         return MvLogNormal(*args, **kwargs)
 
+    elif (tName == 'mvdiagonalnormal'):
+        return MvDiagonalNormal(*args, **kwargs)
+
     elif (tName == 'studentt'):
         return StudentT(*args, **kwargs)
 
@@ -208,6 +208,51 @@ class Histogram(Model):
         return mixtures
 
 
+    def fit_mixture_to_pdf_batched(self, mixture=mixPearson, axis=0, **kwargs):
+        """Fit mixtures to every pdf of the histogram in one call.
+
+        The pdfs are the same as those fit by fit_mixture_to_pdf, i.e. for a 2D histogram the pdf along the other axis at each cell of axis,
+        and for a 3D histogram the pdf along axis at each cell of the other two.
+
+        Parameters
+        ----------
+        mixture : geobipy.Mixture, optional
+            Type of mixture to fit.
+        axis : int, optional
+            Axis, see above.
+
+        Returns
+        -------
+        params : numpy.ndarray
+            Parameters of the mixtures, with the axis of the pdfs replaced by the parameters of each mixture.
+
+        See Also
+        --------
+        geobipy.Mixture.fit_to_curves
+            For details on the fitting arguments.
+
+        """
+        kwargs.pop('track', None)
+
+        if self.ndim == 1:
+            pdf_axis = 0
+        elif self.ndim == 2:
+            pdf_axis = 1 - axis
+        else:
+            pdf_axis = axis
+
+        ax = self.mesh.axis(pdf_axis) if self.ndim > 1 else self.mesh
+        counts = np.moveaxis(np.asarray(self.values, dtype=np.float64), pdf_axis, -1)
+        shape = counts.shape[:-1]
+        counts = counts.reshape(-1, counts.shape[-1])
+
+        # pdf of each column, as Histogram.pdf gives for a single one
+        area = np.sum(counts * ax.widths, axis=1)
+        counts /= np.where(area > 0.0, area, 1.0)[:, None]
+
+        params = mixture.fit_to_curves(ax.centres_absolute, counts, **kwargs)
+        return params.reshape(*shape, -1)
+
     def fit_mixture_to_pdf_1d(self, mixture, **kwargs):
         """Find peaks in the histogram along an axis.
 
@@ -478,6 +523,10 @@ class Histogram(Model):
     def update(self, *args, **kwargs):
         iBin = self.mesh.cellIndices(*args, clip=True, **kwargs)
 
+        if self.mesh.ndim == 1:
+            utilities.increment_bins(np.asarray(self.values), np.atleast_1d(np.asarray(iBin, dtype=np.int64)))
+            return
+
         axis = None if iBin.size == 1 else np.ndim(iBin)-1
 
         unique, counts = np.unique(iBin, axis=axis, return_counts=True)
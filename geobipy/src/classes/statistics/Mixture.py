@@ -4,6 +4,7 @@ from ...classes.core.myObject import myObject
 from ...classes.core import StatArray
 from ...base import utilities as cF
 from scipy.optimize import curve_fit
+from scipy.special import beta
 from lmfit import models
 from lmfit import Parameters
 from lmfit.model import Model, ModelResult
@@ -297,6 +298,202 @@ class Mixture(myObject):
 
         return fit, pars
 
+    @classmethod
+    def fit_to_curves(cls, x, y, max_distributions=3, n_components=None, exponent=None, log=None, epsilon=0.05, mu=0.1, max_iterations=500, tolerance=1e-8):
+        """Fits mixtures to many curves that share the same abscissa at once.
+
+        Components are added one at a time as in fit_to_curve, where the current mixture under predicts the curve the most,
+        and kept while they reduce the misfit by more than mu. Each mixture is fit with expectation maximisation,
+        treating the curve as the density of a weighted sample at x, and every curve is updated in the same array operations.
+        Curves stop iterating once their weighted log likelihood changes by less than tolerance.
+
+        Parameters
+        ----------
+        x : array_like
+            Abscissa of the curves, shape (n_bins,).
+        y : array_like
+            Curves to fit, shape (n_curves, n_bins).
+        max_distributions : int, optional
+            Maximum number of components of each mixture.
+        n_components : int, optional
+            Fit exactly this many components rather than choosing the number from the misfit.
+        exponent : float, optional
+            Fixed exponent of Pearson type VII components. Gaussian components if None.
+        log : 'e' or float, optional
+            Fit the mixtures to the log of x.
+        epsilon : float, optional
+            Stop adding components once the relative misfit is below epsilon.
+        mu : float, optional
+            A new component is kept if it changes the relative misfit by more than mu.
+        max_iterations : int, optional
+            Maximum number of iterations of each fit.
+        tolerance : float, optional
+            Relative change in the log likelihood at which a fit has converged.
+
+        Returns
+        -------
+        params : numpy.ndarray
+            Parameters of each mixture, shape (n_curves, n_solvable_parameters * max_distributions),
+            in the layout of the params of the mixture, padded with zeros, and ready to write with Mixture.createHdf.
+
+        """
+        if not n_components is None:
+            max_distributions = n_components
+
+        x = StatArray.StatArray(x)
+        centres, _ = cF._log(x, log)
+        edges, _ = cF._log(x.edges(), log)
+        centres = np.asarray(centres)
+        widths = np.diff(np.asarray(edges))
+
+        y = np.atleast_2d(np.asarray(y, dtype=np.float64))
+        nCurves, nBins = y.shape
+        K = max_distributions
+
+        # Each curve is a weighted sample, with weights summing to one.
+        area = np.sum(y * widths, axis=1)
+        valid = area > 0.0
+        w = y * widths / np.where(valid, area, 1.0)[:, None]
+
+        cdf = np.cumsum(w, axis=1)
+        i05 = np.argmax(cdf >= 0.1, axis=1)
+        i95 = np.argmax(cdf >= 0.9, axis=1)
+        bins = np.arange(nBins)
+        inside = (bins >= i05[:, None]) & (bins < i95[:, None])
+
+        min_sigma = widths[0]
+        max_sigma = np.maximum(centres[i95] - centres[i05], min_sigma)
+        init_sigma = np.minimum(0.5 * max_sigma, 1.0)
+
+        means = np.zeros((nCurves, K))
+        sigmas = np.ones((nCurves, K))
+        weights = np.zeros((nCurves, K))
+
+        # First component at the peak between the confidence intervals
+        means[:, 0] = centres[np.argmax(np.where(inside, y, 0.0), axis=1)]
+        sigmas[:, 0] = init_sigma
+        weights[:, 0] = valid
+
+        fitted = cls._em_batch(centres, w, means, sigmas, weights, 1, exponent, min_sigma, max_sigma, max_iterations, tolerance, np.flatnonzero(valid))
+        n = np.where(valid, 1, 0)
+        misfit = cls._batch_misfit(centres, y, area, *fitted, exponent)
+
+        growing = valid.copy()
+        for k in range(1, K):
+
+            # Next peak where the mixture under predicts the curve the most
+            residual = np.maximum(y - cls._batch_curve(centres, area, *fitted, exponent), 0.0)
+            residual[~inside] = 0.0
+            new_peak = np.argmax(residual, axis=1)
+
+            if n_components is None:
+                growing &= (residual[np.arange(nCurves), new_peak] > 0.0) & np.all(misfit > epsilon, axis=1)
+            i = np.flatnonzero(growing)
+            if i.size == 0:
+                break
+
+            means, sigmas, weights = (np.copy(a) for a in fitted)
+            means[i, k] = centres[new_peak[i]]
+            sigmas[i, k] = init_sigma[i]
+            weights[i, :k] *= k / (k + 1.0)
+            weights[i, k] = 1.0 / (k + 1.0)
+
+            test = cls._em_batch(centres, w, means, sigmas, weights, k+1, exponent, min_sigma, max_sigma, max_iterations, tolerance, i)
+            misfit_test = cls._batch_misfit(centres, y, area, *test, exponent)
+
+            accept = growing.copy()
+            if n_components is None:
+                accept &= (misfit_test[:, 1] < misfit[:, 1]) & np.any(np.abs(misfit_test - misfit) > mu, axis=1)
+            growing = accept
+
+            for a, b in zip(fitted, test):
+                a[accept] = b[accept]
+            misfit[accept] = misfit_test[accept]
+            n[accept] = k + 1
+
+        # Pack into the parameter layout, components sorted by mean
+        means, sigmas, weights = fitted
+        order = np.argsort(np.where(weights > 0.0, means, np.inf), axis=1)
+        means, sigmas, weights = (np.take_along_axis(a, order, axis=1) for a in fitted)
+        active = np.arange(K)[None, :] < n[:, None]
+
+        nParameters = 3 if exponent is None else 4
+        params = np.zeros((nCurves, K, nParameters))
+        params[:, :, 0] = weights * area[:, None]
+        params[:, :, 1] = means
+        params[:, :, 2] = sigmas
+        if not exponent is None:
+            params[:, :, 3] = exponent
+        params[~active] = 0.0
+
+        return params.reshape(nCurves, K * nParameters)
+
+    @staticmethod
+    def _batch_log_pdf(x, means, sigmas, exponent):
+        """Log density of every component at x, shape (n_curves, n_components, n_bins), and the squared scaled distances. """
+        d2 = ((x[None, None, :] - means[:, :, None]) / sigmas[:, :, None])**2.0
+        if exponent is None:
+            return -0.5 * d2 - np.log(sigmas[:, :, None] * np.sqrt(2.0 * np.pi)), d2
+        return -exponent * np.log1p(d2) - np.log(sigmas[:, :, None] * beta(exponent - 0.5, 0.5)), d2
+
+    @classmethod
+    def _batch_curve(cls, x, area, means, sigmas, weights, exponent):
+        """Fitted curves, the mixture densities scaled by the area under each curve. """
+        log_pdf, _ = cls._batch_log_pdf(x, means, sigmas, exponent)
+        return area[:, None] * np.sum(weights[:, :, None] * np.exp(log_pdf), axis=1)
+
+    @classmethod
+    def _batch_misfit(cls, x, y, area, means, sigmas, weights, exponent):
+        """Infinity and 2 norms of the residual of each curve relative to those of the curve, as in fit_to_curve. """
+        residual = y - cls._batch_curve(x, area, means, sigmas, weights, exponent)
+        denominator = np.column_stack([np.max(np.abs(y), axis=1), np.linalg.norm(y, axis=1)])
+        denominator[denominator == 0.0] = 1.0
+        return np.column_stack([np.max(np.abs(residual), axis=1), np.linalg.norm(residual, axis=1)]) / denominator
+
+    @classmethod
+    def _em_batch(cls, x, w, means, sigmas, weights, n, exponent, min_sigma, max_sigma, max_iterations, tolerance, i):
+        """Expectation maximisation of the first n components of the curves i. Returns updated copies of the parameters. """
+        means, sigmas, weights = np.copy(means), np.copy(sigmas), np.copy(weights)
+
+        old = np.full(i.size, -np.inf)
+        for iteration in range(max_iterations):
+            if i.size == 0:
+                break
+
+            mean, sigma, weight = means[i, :n], sigmas[i, :n], weights[i, :n]
+            log_pdf, d2 = cls._batch_log_pdf(x, mean, sigma, exponent)
+
+            with np.errstate(divide='ignore'):
+                log_p = np.log(weight)[:, :, None] + log_pdf
+            log_sum = np.logaddexp.reduce(log_p, axis=1)
+
+            # Responsibilities, weighted by the curve
+            wr = w[i, None, :] * np.exp(log_p - log_sum[:, None, :])
+
+            # Pearson type VII components are scale mixtures of normals, weight each bin by its expected precision.
+            wru = wr if exponent is None else wr * (2.0 * exponent / ((2.0 * exponent - 1.0) * (1.0 + d2)))
+
+            total = np.sum(wr, axis=2)
+            weight = total
+            mean = np.sum(wru * x, axis=2) / np.maximum(np.sum(wru, axis=2), 1e-300)
+            variance = np.sum(wru * (x[None, None, :] - mean[:, :, None])**2.0, axis=2) / np.maximum(total, 1e-300)
+            if not exponent is None:
+                variance *= 2.0 * exponent - 1.0
+            sigma = np.clip(np.sqrt(variance), min_sigma, max_sigma[i, None])
+
+            # Components that lose all their weight keep their last values
+            keep = total > 0.0
+            means[i, :n] = np.where(keep, mean, means[i, :n])
+            sigmas[i, :n] = np.where(keep, sigma, sigmas[i, :n])
+            weights[i, :n] = weight
+
+            log_likelihood = np.sum(w[i] * log_sum, axis=1)
+            converged = np.abs(log_likelihood - old) <= tolerance * np.abs(log_likelihood)
+            old = log_likelihood[~converged]
+            i = i[~converged]
+
+        return means, sigmas, weights
+
     def _fit_GM_to_cuve(self, model, centres, edges, y, x_guess, sigma_guess=None, expon_guess=None, previous_fit=None, previous_pars=None, verbose=False, **kwargs):
 
         if previous_pars is None:
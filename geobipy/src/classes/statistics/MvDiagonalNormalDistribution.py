@@ -0,0 +1,182 @@
+""" @MvDiagonalNormalDistribution
+Module defining a multivariate normal distribution with independent dimensions
+"""
+import numpy as np
+from .baseDistribution import baseDistribution
+from .NormalDistribution import Normal
+from ..core import StatArray
+
+
+class MvDiagonalNormal(baseDistribution):
+    """Class extension to geobipy.baseDistribution
+
+    Handles a multivariate normal distribution whose covariance is diagonal.
+    Only the variance of each dimension is stored, so probabilities, derivatives,
+    and samples are element-wise operations rather than dense linear algebra.
+
+    MvDiagonalNormal(mean, variance, ndim, prng)
+
+    Parameters
+    ----------
+    mean : scalar or array_like
+        Mean(s) for each dimension
+    variance : scalar or array_like
+        Variance for each dimension
+    ndim : int, optional
+        The number of dimensions.
+        Only used if mean and variance are scalars that are constant for all dimensions
+    prng : numpy.random.RandomState, optional
+        A random state to generate random numbers. Required for parallel instantiation.
+
+    Returns
+    -------
+    out : MvDiagonalNormal
+        Multivariate normal distribution with a diagonal covariance.
+
+    """
+
+    def __init__(self, mean, variance, ndim=None, prng=None):
+        """ Initialize a diagonal multivariate normal distribution """
+
+        baseDistribution.__init__(self, prng)
+
+        if ndim is None:
+            self._mean = np.array(mean, dtype=np.float64, ndmin=1)
+        else:
+            assert np.size(mean) == 1, ValueError("When specifying ndim, mean must be a scalar.")
+            self._mean = np.full(np.int32(np.maximum(1, ndim)), fill_value=np.float64(mean))
+
+        assert np.ndim(variance) < 2, ValueError("variance must be a scalar or have one entry per dimension")
+        if np.size(variance) > 1:
+            assert np.size(variance) == self.ndim, ValueError('Mismatch in size of mean and variance')
+        self._variance = np.array(np.broadcast_to(variance, self.ndim), dtype=np.float64)
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @mean.setter
+    def mean(self, values):
+        self._mean[:] = values
+
+    @property
+    def multivariate(self):
+        return True
+
+    @property
+    def ndim(self):
+        return np.size(self._mean)
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    @property
+    def variance(self):
+        """Variance of each dimension. """
+        return self._variance
+
+    @variance.setter
+    def variance(self, values):
+        assert np.ndim(values) < 2, ValueError("variance must be a scalar or have one entry per dimension")
+        self._variance[:] = values
+
+    @property
+    def precision(self):
+        """Reciprocal of the variance of each dimension. """
+        return 1.0 / self._variance
+
+    def __deepcopy__(self, memo={}):
+        """ Define a deepcopy routine """
+        return type(self)(mean=self.mean, variance=self.variance, prng=self.prng)
+
+    def derivative(self, x, order):
+        """Derivative of the negative log probability.
+
+        Parameters
+        ----------
+        x : array_like
+            Values to evaluate at.
+        order : int
+            1 returns precision * (x - mean).
+            2 returns the diagonal of the precision matrix.
+
+        """
+        assert order in [1, 2], ValueError("Order must be 1 or 2.")
+        if order == 1:
+            return (x - self._mean) / self._variance
+        return self.precision
+
+    def mahalanobis(self, x):
+        return np.sqrt(np.sum((x - self._mean)**2.0 / self._variance))
+
+    def variance_dot(self, x):
+        """Multiply x by the variance matrix. """
+        return self._variance * x
+
+    def rng(self, size=1):
+        x = self._mean + self.std * self.prng.standard_normal((size, self.ndim))
+        return np.atleast_1d(np.squeeze(x))
+
+    def probability(self, x, log, axis=None):
+        """ For a realization x, compute the probability """
+
+        if not axis is None:
+            return Normal(mean=self._mean[axis], variance=self._variance[axis]).probability(x, log)
+
+        N = np.size(x)
+        nD = self.ndim
+
+        if N != nD:
+            probability = np.empty((nD, *np.shape(x)))
+            for i in range(nD):
+                probability[i, :] = self.probability(x, log, axis=i)
+            return probability
+
+        out = -(0.5 * N) * np.log(2.0 * np.pi) - 0.5 * np.sum(np.log(self._variance)) - 0.5 * np.sum((x - self._mean)**2.0 / self._variance)
+
+        return out if log else np.exp(out)
+
+    @property
+    def summary(self):
+        msg = ('MV Diagonal Normal Distribution:\n'
+               'Mean:\n{}\n'
+               'Variance:\n{}\n').format(str(self.mean), str(self.variance))
+
+        return msg
+
+    def pad(self, N):
+        """ Pads the mean and variance to the given size
+        N: Padded size
+        """
+        return type(self)(np.zeros(N, dtype=self._mean.dtype), np.zeros(N, dtype=self._variance.dtype), prng=self.prng)
+
+    def bins(self, nBins=99, nStd=4.0, axis=None, relative=False):
+        """Discretizes a range given the mean and variance of the distribution
+
+        Parameters
+        ----------
+        nBins : int, optional
+            Number of bins to return.
+        nStd : float, optional
+            The bin edges = mean +- nStd * std.
+        axis : int, optional
+            Get the bins of this dimension, if None, returns bins for all dimensions.
+
+        Returns
+        -------
+        bins : geobipy.StatArray
+            The bin edges.
+
+        """
+        nStd = np.float64(nStd)
+        t = np.linspace(-1.0, 1.0, nBins+1)
+
+        std = self.std if axis is None else self.std[axis]
+        mean = self._mean if axis is None else self._mean[axis]
+
+        bins = np.squeeze(np.outer(nStd * np.atleast_1d(std), t))
+        if not relative:
+            bins += np.atleast_1d(mean)[:, None] if np.ndim(bins) == 2 else mean
+
+        return StatArray.StatArray(bins)
@@ -15,7 +15,7 @@ class MvLogNormal(MvNormal):
     Handles a multivariate lognormal distribution.  Uses Scipy to evaluate probabilities,
     but Numpy to generate random samples since scipy is slow.
 
-    MvLogNormal(mean, variance, ndim, linearSpace, prng)
+    MvLogNormal(mean, variance, ndim, linearSpace, prng, precision_factor)
 
     Parameters
     ----------
@@ -32,6 +32,9 @@ class MvLogNormal(MvNormal):
             Inputs are internally logged, and the exponential of any output is returned
     prng : numpy.random.RandomState, optional
         A random state to generate random numbers. Required for parallel instantiation.
+    precision_factor : array_like, optional
+        Lower triangular Cholesky factor of the precision of the logged values.
+        Used instead of variance, see geobipy.MvNormal.
 
     Returns
     -------
@@ -42,11 +45,11 @@ class MvLogNormal(MvNormal):
 
     
 
-    def __init__(self, mean, variance, ndim=None, linearSpace=False, prng=None):
+    def __init__(self, mean, variance=None, ndim=None, linearSpace=False, prng=None, precision_factor=None):
         """ Initialize a multivariate lognormal distribution. """
         if linearSpace:
             mean = np.log(mean)
-        super().__init__(mean, variance, ndim, prng=prng)
+        super().__init__(mean, variance, ndim, prng=prng, precision_factor=precision_factor)
         self.linearSpace = linearSpace
 
     @property
@@ -61,6 +64,8 @@ class MvLogNormal(MvNormal):
         """ Define a deepcopy routine """
         if self._constant:
             return MvLogNormal(mean=self.mean[0], variance=self.variance[0, 0], ndim=self.ndim, linearSpace=self.linearSpace, prng=self.prng)
+        elif self._variance is None:
+            return MvLogNormal(mean=self.mean, precision_factor=np.copy(self._precision_factor), linearSpace=self.linearSpace, prng=self.prng)
         else:
             return MvLogNormal(mean=self.mean, variance=self.variance, linearSpace=self.linearSpace, prng=self.prng)
 
@@ -73,7 +78,8 @@ class MvLogNormal(MvNormal):
             return cf.Ax(self.precision, x-self._mean)
 
         elif order == 2:
-            return self.precision
+            # The precision is cached, and callers add the data term to the returned Hessian.
+            return np.copy(self.precision)
 
     def rng(self, size = 1):
         return np.exp(super().rng(size)) if self.linearSpace else super().rng(size)
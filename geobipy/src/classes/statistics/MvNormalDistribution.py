@@ -8,6 +8,7 @@ from .baseDistribution import baseDistribution
 from .NormalDistribution import Normal
 from ..core import StatArray
 from scipy.stats import multivariate_normal
+from scipy.linalg import cho_solve, solve_triangular
 
 
 class MvNormal(baseDistribution):
@@ -16,7 +17,7 @@ class MvNormal(baseDistribution):
     Handles a multivariate normal distribution.  Uses Scipy to evaluate probabilities,
     but Numpy to generate random samples since scipy is slow.
 
-    MvNormal(mean, variance, ndim, prng)
+    MvNormal(mean, variance, ndim, prng, precision_factor)
 
     Parameters
     ----------
@@ -29,15 +30,25 @@ class MvNormal(baseDistribution):
         Only used if mean and variance are scalars that are constant for all dimensions
     prng : numpy.random.RandomState, optional
         A random state to generate random numbers. Required for parallel instantiation.
+    precision_factor : array_like, optional
+        Lower triangular Cholesky factor L of the precision matrix, i.e. inv(variance) = LL'.
+        Used instead of variance. Samples and probabilities are then computed from the factor,
+        and the variance is only formed if it is requested.
 
     Returns
     -------
     out : MvNormal
         Multivariate normal distribution.
 
+    Notes
+    -----
+    The Cholesky factor of the variance, its log determinant, and the precision are computed when first needed
+    and kept until the variance is changed with the variance or ndim setters.
+    Modifying the variance in place does not update them.
+
     """
 
-    def __init__(self, mean, variance, ndim=None, prng=None):
+    def __init__(self, mean, variance=None, ndim=None, prng=None, precision_factor=None):
         """ Initialize a normal distribution
         mu:     :Mean of the distribution
         sigma:  :Standard deviation of the distribution
@@ -49,7 +60,18 @@ class MvNormal(baseDistribution):
 
         baseDistribution.__init__(self, prng)
 
-        if ndim is None:
+        self._precision_factor = None
+        self._reset_factorisation()
+
+        if not precision_factor is None:
+            assert ndim is None, ValueError("Cannot specify ndim with a precision_factor")
+            self._mean = np.copy(mean)
+            assert np.all(np.equal(np.shape(precision_factor), np.size(mean))), ValueError('precision_factor must have same dimensions as the mean')
+            self._precision_factor = np.asarray(precision_factor)
+            self._variance = None
+            self._constant = False
+
+        elif ndim is None:
             self._mean = np.copy(mean)
 
             # Variance
@@ -66,7 +88,8 @@ class MvNormal(baseDistribution):
             elif ndim == 2:
                 assert np.all(np.equal(variance.shape,  np.size(mean))), ValueError(
                     'Covariance must have same dimensions as the mean')
-                self._variance = np.asarray(variance)
+                # Copy, so that changes to the caller's array cannot go unseen by the cached factorisation.
+                self._variance = np.array(variance, dtype=np.float64)
 
             self._constant = False
 
@@ -117,6 +140,7 @@ class MvNormal(baseDistribution):
 
         self._mean = np.full(newDimension, fill_value=mean)
         self._variance = np.diag(np.full(newDimension, fill_value=variance))
+        self._reset_factorisation()
 
     @property
     def std(self):
@@ -124,6 +148,8 @@ class MvNormal(baseDistribution):
 
     @property
     def variance(self):
+        if self._variance is None:
+            self._variance = cho_solve((self._precision_factor, True), np.eye(self.ndim))
         return self._variance
 
     @variance.setter
@@ -132,19 +158,104 @@ class MvNormal(baseDistribution):
             assert np.size(values) == self.ndim, ValueError("variance must have length {} when specifying 1D".format(self.ndim))
             values = np.diag(values)
 
-        self._variance[:, :] = values
+        self.variance[:, :] = values
+        # The factors no longer describe the variance.
+        self._precision_factor = None
+        self._reset_factorisation()
+
+    def _reset_factorisation(self):
+        """Forget the quantities derived from the variance. Called whenever the variance changes. """
+        self._variance_factor = None
+        self._log_determinant = None
+        self._precision = None
+        self._is_isotropic = None
+
+    @property
+    def _isotropic(self):
+        # Constant distributions have a variance of vI, which needs no factorisation,
+        # unless a different variance has since been assigned.
+        if self._is_isotropic is None:
+            self._is_isotropic = self._constant and (not self._variance is None) and \
+                np.array_equal(self._variance, np.diag(np.full(self.ndim, fill_value=self._variance[0, 0])))
+        return self._is_isotropic
 
     @property
     def precision(self):
-        return np.linalg.inv(self.variance)
+        if self._precision is None:
+            if self._variance is None:
+                self._precision = np.dot(self._precision_factor, self._precision_factor.T)
+            elif self._isotropic:
+                self._precision = np.diag(np.full(self.ndim, fill_value=1.0 / self._variance[0, 0]))
+            else:
+                self._precision = cho_solve((self.variance_factor, True), np.eye(self.ndim))
+        return self._precision
+
+    @property
+    def precision_factor(self):
+        """Lower triangular Cholesky factor of the precision matrix. """
+        if self._precision_factor is None:
+            self._precision_factor = np.linalg.cholesky(self.precision)
+        return self._precision_factor
+
+    @property
+    def variance_factor(self):
+        """Lower triangular Cholesky factor C of the variance matrix, i.e. variance = CC'. Computed once per variance. """
+        if self._variance_factor is None:
+            self._variance_factor = np.linalg.cholesky(self.variance)
+        return self._variance_factor
+
+    @property
+    def log_determinant(self):
+        """Log determinant of the variance matrix. Computed once per variance. """
+        if self._log_determinant is None:
+            if self._variance is None:
+                # log|variance| = -2 sum(log(diag(L)))
+                self._log_determinant = -2.0 * np.sum(np.log(np.diag(self._precision_factor)))
+            elif self._isotropic:
+                self._log_determinant = self.ndim * np.log(self._variance[0, 0])
+            else:
+                self._log_determinant = 2.0 * np.sum(np.log(np.diag(self.variance_factor)))
+        return self._log_determinant
 
     def __deepcopy__(self, memo={}):
         """ Define a deepcopy routine """
         if self._constant:
             return MvNormal(mean=self.mean[0], variance=self.variance[0, 0], ndim=self.ndim, prng=self.prng)
+        elif self._variance is None:
+            return MvNormal(mean=self.mean, precision_factor=np.copy(self._precision_factor), prng=self.prng)
         else:
             return MvNormal(mean=self.mean, variance=self.variance, prng=self.prng)
 
+    def _whiten(self, x):
+        """Return a vector whose dot product with itself is the squared mahalanobis distance of x. """
+        if self._variance is None:
+            # L'x
+            return np.dot(x, self._precision_factor)
+        if self._isotropic:
+            return x / np.sqrt(self._variance[0, 0])
+        # inv(C)x
+        return solve_triangular(self.variance_factor, x, lower=True)
+
+    def variance_dot(self, x):
+        """Multiply x by the variance matrix.
+
+        Solves with the precision factor rather than forming the variance when the distribution was defined by one.
+
+        Parameters
+        ----------
+        x : array_like
+            Vector to multiply.
+
+        Returns
+        -------
+        out : array_like
+            variance.x
+
+        """
+        if self._variance is None:
+            return cho_solve((self._precision_factor, True), x)
+        return np.dot(self.variance, x)
+
     # def derivative(self, x, order):
 
     #     assert order in [1, 2], ValueError("Order must be 1 or 2.")
@@ -154,12 +265,21 @@ class MvNormal(baseDistribution):
     #         return cf.Ax(self.inverseVariance, self.probability(x))
 
     def mahalanobis(self, x):
-        tmp = x - self.mean
-        return np.sqrt(np.dot(tmp, np.dot(self.precision, tmp)))
+        tmp = self._whiten(x - self.mean)
+        return np.sqrt(np.dot(tmp, tmp))
 
     def rng(self, size=1):
         """  """
-        return np.atleast_1d(np.squeeze(self.prng.multivariate_normal(self._mean, self.variance, size)))
+        z = self.prng.standard_normal((size, self.ndim))
+        if self._variance is None:
+            # x = mu + inv(L')z has variance inv(LL')
+            x = solve_triangular(self._precision_factor, z.T, lower=True, trans='T').T
+        elif self._isotropic:
+            x = np.sqrt(self._variance[0, 0]) * z
+        else:
+            # x = mu + Cz has variance CC'
+            x = np.dot(z, self.variance_factor.T)
+        return np.atleast_1d(np.squeeze(self._mean + x))
 
     def probability(self, x, log, axis=None):
         """ For a realization x, compute the probability """
@@ -187,14 +307,11 @@ class MvNormal(baseDistribution):
             if (nD == 1):
                 mean = np.repeat(self._mean, N)
 
-            dv = 0.5 * np.prod(np.linalg.slogdet(self.variance))
             # subtract the mean from the samples
-            xMu = x - mean
-            # Start computing the exponent term
-            # e^(-0.5*(x-mu)'*inv(cov)*(x-mu))                        (1)
-            # Compute the multiplication on the right of equation 1
+            xMu = self._whiten(x - mean)
+
             # Probability Density Function
-            return -(0.5 * N) * np.log(2.0 * np.pi) - dv - 0.5 * np.dot(xMu, np.dot(self.precision, xMu))
+            return -(0.5 * N) * np.log(2.0 * np.pi) - 0.5 * self.log_determinant - 0.5 * np.dot(xMu, xMu)
 
         else:
 
@@ -207,18 +324,7 @@ class MvNormal(baseDistribution):
                     probability[i, :] = self.probability(x, log, axis=i)
                 return probability
 
-            
-            # assert (N == nD), TypeError(
-            #     'size of samples {} must equal number of distribution dimensions {} for a multivariate distribution'.format(N, nD))
-            # For a diagonal matrix, the determinant is the product of the diagonal
-            # entries
-            # subtract the mean from the samples.
-            xMu = x - self._mean
-            # Take the inverse of the variance
-            exp = np.exp(-0.5 * np.dot(xMu, np.dot(self.precision, xMu)))
-            # Probability Density Function
-            prob = (1.0 / np.sqrt(((2.0 * np.pi)**N) * cf.Det(self.variance))) * exp
-            return prob
+            return np.exp(self.probability(x, log=True))
 
     @property
     def summary(self):
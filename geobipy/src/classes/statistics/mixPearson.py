@@ -120,6 +120,11 @@ class mixPearson(Mixture):
         return fit, self
 
 
+    @classmethod
+    def fit_to_curves(cls, x, y, exponent=10.5, **kwargs):
+        """Fits Pearson type VII mixtures with a fixed exponent to many curves at once, see Mixture.fit_to_curves. """
+        return super().fit_to_curves(x, y, exponent=exponent, **kwargs)
+
     def plot_components(self, x, log, ax=None, **kwargs):
 
         if not ax is None:
@@ -1,8 +1,10 @@
 """ @Inference1D
 Class to store inversion results. Contains plotting and writing to file procedures
 """
-from copy import deepcopy
-from os.path import join
+from copy import copy, deepcopy
+from os import remove, replace
+from os.path import isfile, join
+import pickle
 import matplotlib.pyplot as plt
 from ..base import plotting as cP
 from ..base import utilities as cF
@@ -67,6 +69,9 @@ class Inference1D(myObject):
         self.fig = None
         self.kwargs = kwargs
 
+        # The likelihood is raised to the power 1 / temperature. Only chains at temperature 1 update the posteriors.
+        self.temperature = np.float64(kwargs.get('temperature', 1.0))
+
         self.prng = prng
         self.rank = 1 if world is None else world.rank
 
@@ -150,9 +155,6 @@ class Inference1D(myObject):
         if datapoint is None:
             return
 
-        assert self.interactive_plot or self.save_hdf5, Exception(
-            'You have chosen to neither view or save the inversion results!')
-
         self._update_plot_every = self.kwargs['update_plot_every']
         self.limits = self.kwargs['parameter_limits']
         self.reciprocateParameter = self.kwargs['reciprocate_parameters']
@@ -173,6 +175,9 @@ class Inference1D(myObject):
         # Initialize the acceptance level
         # Model acceptance rate
         self.accepted = 0
+        # Number of candidates forward modelled, and rejected on their prior without a forward model
+        self.n_forward_models = 0
+        self.n_early_rejections = 0
 
         n = 2 * np.int32(self.n_markov_chains / self._update_plot_every)
         self.acceptance_x = StatArray.StatArray(np.arange(1, n + 1) * self._update_plot_every, name='Iteration #')
@@ -253,7 +258,7 @@ class Inference1D(myObject):
 
     def initialize_model(self):
         # Find the conductivity of a half space model that best fits the data
-        halfspace = self.datapoint.find_best_halfspace()
+        halfspace = self.datapoint.find_best_halfspace(table=self.kwargs.get('halfspace_table', None))
         self.halfspace[0] = halfspace.values
 
         # Create an initial model for the first iteration
@@ -278,16 +283,17 @@ class Inference1D(myObject):
         # if (not self.kwargs.referenceHitmap is None):
         #     Mod.setReferenceHitmap(self.kwargs.referenceHitmap)
 
-        # Compute the predicted data
-        self.datapoint.forward(self.model)
-
         observation = self.datapoint
         if self.kwargs['ignore_likelihood']:
             observation = None
-        local_variance = self.model.local_variance(observation)
+
+        # Compute the predicted data, and the sensitivity for the local Hessian from the same pass.
+        self.datapoint.forward(self.model, with_jacobian=not observation is None)
+
+        precision_factor = np.linalg.cholesky(self.model.local_precision(observation))
 
         # Instantiate the proposal for the parameters.
-        parameterProposal = Distribution('MvLogNormal', mean=self.model.values, variance=local_variance, linearSpace=True, prng=self.prng)
+        parameterProposal = Distribution('MvLogNormal', mean=self.model.values, precision_factor=precision_factor, linearSpace=True, prng=self.prng)
 
         probabilities = [self.kwargs['probability_of_birth'],
                          self.kwargs['probability_of_death'],
@@ -299,7 +305,30 @@ class Inference1D(myObject):
 
     def accept_reject(self):
         """ Propose a new random model and accept or reject it """
-        perturbed_datapoint = deepcopy(self.datapoint)
+        candidate = self.propose()
+
+        # The candidate was rejected on its prior
+        if candidate is None:
+            return
+
+        # Forward model the data from the candidate model
+        remapped_model, perturbed_model, perturbed_datapoint, prior1, u = candidate
+        perturbed_datapoint.forward(perturbed_model)
+
+        self.accept_candidate(*candidate)
+
+    def propose(self):
+        """Propose a new random model and data point, and evaluate their prior.
+
+        Returns
+        -------
+        out : tuple or None
+            The remapped model, candidate model, candidate data point, prior of the candidate and acceptance threshold.
+            None if the candidate is rejected on its prior, in which case it does not need forward modelling.
+
+        """
+        # Candidate data point, shares priors, proposals, and posteriors with the current data point.
+        perturbed_datapoint = copy(self.datapoint)
 
         # Perturb the current model
         observation = perturbed_datapoint
@@ -310,26 +339,44 @@ class Inference1D(myObject):
         # Propose a new data point, using assigned proposal distributions
         perturbed_datapoint.perturb()
 
-        # Forward model the data from the candidate model
-        perturbed_datapoint.forward(perturbed_model)
-
-        # Compute the data misfit
-        data_misfit1 = perturbed_datapoint.dataMisfit()
-
         # Evaluate the prior for the current model
         prior1 = perturbed_model.prior_probability(self.kwargs['solve_parameter'], self.kwargs['solve_gradient'])
         # Evaluate the prior for the current data
         prior1 += perturbed_datapoint.priorProbability(self.kwargs['solve_relative_error'], self.kwargs['solve_additive_error'], self.kwargs['solve_height'], False)#self.user_options.solveCalibration)
 
-        # Test for early rejection
+        # Draw the acceptance threshold before any forward modelling, so the random stream
+        # is the same whether or not the proposal is rejected early.
+        u = self.prng.uniform()
+
+        # Test for early rejection. The acceptance ratio is zero whatever the likelihood,
+        # so the candidate is never forward modelled.
         if (prior1 == -np.inf):
-            return
+            self.n_early_rejections += 1
+            return None
+
+        return remapped_model, perturbed_model, perturbed_datapoint, prior1, u
+
+    def accept_candidate(self, remapped_model, perturbed_model, perturbed_datapoint, prior1, u, data_misfit1=None, likelihood1=None):
+        """Accept or reject a candidate from propose whose predicted data have been forward modelled.
+
+        The data misfit and log likelihood of the candidate are computed unless they are given,
+        e.g. by DataPoint.likelihood_many for the candidates of several chains.
+
+        """
+
+        self.n_forward_models += 1
+
+        # Compute the data misfit
+        if data_misfit1 is None:
+            data_misfit1 = perturbed_datapoint.dataMisfit()
 
         # Compute the components of each acceptance ratio
-        likelihood1 = 1.0
         observation = None
-        if not  self.kwargs.get('ignore_likelihood', False):
-            likelihood1 = perturbed_datapoint.likelihood(log=True)
+        if self.kwargs.get('ignore_likelihood', False):
+            likelihood1 = 1.0
+        else:
+            if likelihood1 is None:
+                likelihood1 = perturbed_datapoint.likelihood(log=True)
             observation = perturbed_datapoint
         proposal, proposal1 = perturbed_model.proposal_probabilities(remapped_model, observation)
 
@@ -337,7 +384,7 @@ class Inference1D(myObject):
 
         prior_ratio = prior1 - self.prior
 
-        likelihood_ratio = likelihood1 - self.likelihood
+        likelihood_ratio = (likelihood1 - self.likelihood) / self.temperature
 
         proposal_ratio = proposal - proposal1
 
@@ -349,7 +396,7 @@ class Inference1D(myObject):
             acceptance_probability = -1.0
 
         # If we accept the model
-        accepted = acceptance_probability > self.prng.uniform()
+        accepted = acceptance_probability > u
 
         if (accepted):
             self.accepted += 1
@@ -360,14 +407,19 @@ class Inference1D(myObject):
             self.model = perturbed_model
             self.datapoint = perturbed_datapoint
 
-    def infer(self, hdf_file_handle):
+    def infer(self, hdf_file_handle, checkpoint_file=None, keep_checkpoint=False):
         """ Markov Chain Monte Carlo approach for inversion of geophysical data
         userParameters: User input parameters object
         DataPoint: Datapoint to invert
         ID: Datapoint label for saving results
         pHDFfile: Optional HDF5 file opened using h5py.File('name.h5','w',driver='mpio', comm=world) before calling Inv_MCMC
+        checkpoint_file: Optional file to checkpoint the chain to every checkpoint_every iterations. Removed once the results are written.
+        keep_checkpoint: Do not remove checkpoint_file, e.g. because the results are buffered and removed by the buffer once written.
         """
 
+        assert self.interactive_plot or self.save_hdf5, Exception(
+            'You have chosen to neither view or save the inversion results!')
+
         if self.interactive_plot:
             self.initFigure()
             plt.show(block=False)
@@ -386,12 +438,10 @@ class Inference1D(myObject):
             if self.interactive_plot:
                 self.plot("Fiducial {}".format(self.datapoint.fiducial), increment=self.kwargs['update_plot_every'])
 
-            Go = self.iteration <= self.n_markov_chains + self.burned_in_iteration
+            Go, failed = self._keep_going()
 
-            if not self.burned_in:
-                Go = self.iteration < self.n_markov_chains
-                if not Go:
-                    failed = True
+            if Go and self._checkpoint_due(checkpoint_file):
+                self.checkpoint(checkpoint_file)
 
         self.clk.stop()
         # self.invTime = np.float64(self.clk.timeinSeconds())
@@ -406,8 +456,85 @@ class Inference1D(myObject):
             self.plot()
             self.toPNG('.', self.datapoint.fiducial)
 
+        if (not keep_checkpoint) and (not checkpoint_file is None) and isfile(checkpoint_file):
+            remove(checkpoint_file)
+
         return failed
 
+    def _checkpoint_due(self, checkpoint_file):
+        """Whether to checkpoint the chain at the current iteration. """
+        every = self.kwargs.get('checkpoint_every', 0)
+        return (not checkpoint_file is None) and (every > 0) and (self.iteration % every == 0)
+
+    def checkpoint(self, filename):
+        """Pickle the chain so that it can be continued with resume.
+
+        The half space table and the systems are only referenced in the file, and are passed to or read again by resume.
+        The file is written under a temporary name first so that an interrupted write never replaces a good checkpoint.
+
+        """
+        with open(filename + '.tmp', 'wb') as f:
+            CheckpointPickler(f, self._checkpoint_references()).dump(self)
+        replace(filename + '.tmp', filename)
+
+    @staticmethod
+    def resume(filename, halfspace_table=None):
+        """Read a chain written with checkpoint. Calling infer continues it from the checkpointed iteration.
+
+        Parameters
+        ----------
+        filename : str
+            Checkpoint file.
+        halfspace_table : geobipy.HalfSpaceTable, optional
+            Table the chain was created with. Only needed by a chain that is initialized again.
+
+        """
+        with open(filename, 'rb') as f:
+            return CheckpointUnpickler(f, halfspace_table=halfspace_table).load()
+
+    def _checkpoint_references(self):
+        """Persistent ids of the objects that are referenced rather than pickled in a checkpoint, keyed by their id. """
+        out = {}
+
+        table = self.kwargs.get('halfspace_table', None)
+        if not table is None:
+            out[id(table)] = ('halfspace_table',)
+
+        filenames = self.kwargs.get('system_filename', None)
+        if isinstance(filenames, str):
+            filenames = [filenames]
+
+        for i, system in enumerate(getattr(self.datapoint, 'system', None) or []):
+            filename = getattr(system, 'filename', None) if filenames is None else filenames[i]
+            if not filename is None:
+                out[id(system)] = ('system', type(system), filename)
+
+        return out
+
+    def __getstate__(self):
+        # Figures are rebuilt by initFigure when a resumed chain is plotted.
+        state = self.__dict__.copy()
+        state['fig'] = None
+        state.pop('ax', None)
+        return state
+
+    def _keep_going(self):
+        """Check whether the Markov chain should continue.
+
+        Returns
+        -------
+        go : bool
+            Whether to carry out another iteration.
+        failed : bool
+            Whether the chain reached the maximum number of iterations without burning in.
+
+        """
+        if not self.burned_in:
+            go = self.iteration < self.n_markov_chains
+            return go, not go
+
+        return self.iteration <= self.n_markov_chains + self.burned_in_iteration, False
+
     def __deepcopy__(self, memo={}):
         return None
 
@@ -443,14 +570,14 @@ class Inference1D(myObject):
 
         if (np.mod(self.iteration, self.update_plot_every) == 0):
             time_per_model = self.clk.lap() / self.update_plot_every
-            tmp = "i=%i, k=%i, %4.3f s/Model, %0.3f s Elapsed\n" % (self.iteration, np.float64(self.model.nCells[0]), time_per_model, self.clk.timeinSeconds())
+            tmp = "i=%i, k=%i, %4.3f s/Model, %0.3f s Elapsed, %i forward models avoided\n" % (self.iteration, np.float64(self.model.nCells[0]), time_per_model, self.clk.timeinSeconds(), self.n_early_rejections)
             if (self.rank == 1):
                 print(tmp, flush=True)
 
             if (not self.burned_in and not self.datapoint.relErr.hasPrior):
                 self.multiplier *= self.kwargs['multiplier']
 
-        if (self.burned_in):  # We need to update some plotting options
+        if (self.burned_in and (self.temperature == 1.0)):  # We need to update some plotting options
             # Added the layer depths to a list, we histogram this list every
             # iPlot iterations
             self.model.update_posteriors(0.5)#self.user_options.clip_ratio)
@@ -684,6 +811,7 @@ class Inference1D(myObject):
         parent.create_dataset('multiplier',  shape=(nPoints), dtype=self.multiplier.dtype, fillvalue=np.nan)
         parent.create_dataset('invtime',  shape=(nPoints), dtype=float, fillvalue=np.nan)
         parent.create_dataset('savetime',  shape=(nPoints), dtype=float, fillvalue=np.nan)
+        parent.create_dataset('completed', shape=(nPoints), dtype=bool, fillvalue=False)
 
 
         # self.meanInterp.createHdf(parent,'meaninterp', add_axis=nPoints, fillvalue=np.nan)
@@ -713,7 +841,8 @@ class Inference1D(myObject):
             fiducials = StatArray.StatArray.fromHdf(parent['data/fiducial'])
             index = fiducials.searchsorted(self.datapoint.fiducial)
 
-        i = index
+        # A single integer, so that buffered writes of the point are held until the buffer is flushed.
+        i = int(np.squeeze(index))
         # Add the iteration number
         hdfFile['i'][i] = self.iteration
 
@@ -768,6 +897,10 @@ class Inference1D(myObject):
         # Write the highest posterior data
         self.best_model.writeHdf(hdfFile,'model', withPosterior=False, index=i) 
 
+        # Flag the point as completed last, so that a partially written point is inverted again on restart
+        if 'completed' in hdfFile:
+            hdfFile['completed'][i] = True
+
 
     def read_fromH5Obj(self, h5obj, fName, grpName, system_file_path = ''):
         """ Reads a data points results from HDF5 file """
@@ -852,3 +985,56 @@ class Inference1D(myObject):
 
         return self
 
+
+
+class CheckpointPickler(pickle.Pickler):
+    """Pickler of checkpoints that references the half space table and the systems instead of pickling them.
+
+    The table can be many megabytes, and the systems of time domain data wrap a handle to the GA-AEM library,
+    which cannot be pickled.
+
+    CheckpointPickler(file, references)
+
+    Parameters
+    ----------
+    file : file
+        Opened for binary writing.
+    references : dict
+        Persistent id of each referenced object, keyed by the id of the object.
+
+    """
+
+    def __init__(self, file, references):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.references = references
+
+    def persistent_id(self, obj):
+        return self.references.get(id(obj), None)
+
+
+class CheckpointUnpickler(pickle.Unpickler):
+    """Unpickler of checkpoints that restores the half space table, and reads every referenced system from its file once.
+
+    CheckpointUnpickler(file, halfspace_table=None)
+
+    Parameters
+    ----------
+    file : file
+        Opened for binary reading.
+    halfspace_table : geobipy.HalfSpaceTable, optional
+        Table to restore, or None.
+
+    """
+
+    def __init__(self, file, halfspace_table=None):
+        super().__init__(file)
+        self.halfspace_table = halfspace_table
+        self.systems = {}
+
+    def persistent_load(self, pid):
+        if pid[0] == 'halfspace_table':
+            return self.halfspace_table
+
+        if not pid in self.systems:
+            self.systems[pid] = pid[1].read(pid[2])
+        return self.systems[pid]
@@ -5,6 +5,7 @@ import h5py
 from copy import deepcopy
 from cached_property import cached_property
 from datetime import timedelta
+from collections import OrderedDict
 from ..classes.core.myObject import myObject
 from ..classes.core import StatArray
 from ..classes.statistics.Distribution import Distribution
@@ -27,6 +28,7 @@ import matplotlib.pyplot as plt
 import matplotlib.gridspec as gridspec
 from os.path import (split, join)
 from .Inference1D import Inference1D
+from .LazyInference1D import LazyInference1D
 import progressbar
 
 
@@ -38,12 +40,27 @@ except:
 from numba import (jit, float64)
 _numba_settings = {'nopython': True, 'nogil': False, 'fastmath': True, 'cache': True}
 
+@jit(**_numba_settings)
+def _doi_from_opacity(axis, values, p):
+    """ Walk up from the bottom of each column until the opacity reaches p """
+    shp = np.shape(values)
+    out = np.empty(shp[0])
+    for i in range(shp[0]):
+        tmp = values[i, :]
+        j = shp[1] - 1
+        while tmp[j] < p and j >= 1:
+            j -= 1
+        out[i] = axis[i, j]
+    return out
+
 class Inference2D(myObject):
     """ Class to define results from EMinv1D_MCMC for a line of data """
     def __init__(self, hdf5_file_path=None, system_file_path=None, hdf5_file=None, mode='r+', world=None):
         """ Initialize the lineResults """
 
         self._world = world
+        self._inference_1d_cache = OrderedDict()
+        self.inference_1d_cache_size = 32
         if (hdf5_file_path is None): return
 
         assert not system_file_path is None, Exception("Please also specify the path to the system file")
@@ -88,6 +105,8 @@ class Inference2D(myObject):
 
     def close(self):
         """ Check whether the file is open """
+        # Lazy data points read from the handle being closed.
+        self._inference_1d_cache.clear()
         if (self.hdfFile is None): return
         try:
             self.hdfFile.close()
@@ -199,41 +218,194 @@ class Inference2D(myObject):
     def burned_in(self):
         return StatArray.StatArray(np.asarray(self.hdfFile['burnedin']))
 
+    @property
+    def completed(self):
+        """Whether the inversion of each data point has been written to the file.
+
+        Files created before completion was recorded report no points as completed.
+
+        """
+        if 'completed' in self.hdfFile:
+            return StatArray.StatArray(np.asarray(self.hdfFile['completed']), 'Completed')
+        return StatArray.StatArray(np.zeros(self.nPoints, dtype=bool), 'Completed')
+
     def percentile(self, percent, slic=None):
-        # Read in the opacity if present
-        key = "percentile_{}".format(percent)
-        if key in self.hdfFile.keys():
-            return StatArray.StatArray.fromHdf(self.hdfFile[key], index=slic)
-        else:
-            h = self.parameter_posterior()
-            ci = h.percentile(percent=percent, axis=1)
+        # Read in the percentile if present, older files key it by the percent as given, e.g. percentile_5
+        key = "percentile_{}".format(np.float64(percent))
+        for k in (key, "percentile_{}".format(percent)):
+            if k in self.hdfFile.keys():
+                return StatArray.StatArray.fromHdf(self.hdfFile[k], index=slic)
 
-            if self.mode == 'r+':
-                if key in self.hdfFile.keys():
-                    ci.writeHdf(self.hdfFile, key)
-                else:
-                    ci.toHdf(self.hdfFile, key)
-            return ci
+        return self.compute_posterior_summary(statistics=(), percentiles=percent, track=False)[key]
 
     def credible_interval(self, percent=90.0):
         percent = 0.5 * np.minimum(percent, 100.0 - percent)
         return self.percentile(percent), self.percentile(100.0-percent)
 
     def compute_mean_parameter(self, log=None, track=True):
-            
-        posterior = self.parameter_posterior()
-        mean = posterior.mean(axis=1)
+        return self.compute_posterior_summary(statistics=('mean',), track=track)['mean_parameter']
+
+    def compute_posterior_summary(self, statistics=('mean', 'median', 'mode', 'opacity', 'doi', 'entropy'), percentiles=None, opacity_percent=90.0, opacity_log=None, doi_percent=67.0, doi_smooth=None, entropy_log=2, chunk_size=None, track=True):
+        """Compute summaries of the parameter posterior with a single read of its counts.
+
+        The counts are streamed in blocks of data points, and every statistic is computed from the same block.
+        Each summary has shape (nPoints, nCells in depth), except the DOI which has size nPoints.
+        When the file is open in 'r+' mode the summaries are written back to it,
+        where mean_parameters, percentile, opacity, doi, and entropy read them.
+
+        Parameters
+        ----------
+        statistics : sequence of str, optional
+            Any of 'mean', 'median', 'mode', 'opacity', 'doi', 'entropy'. The DOI also computes the opacity.
+        percentiles : float or array_like, optional
+            Extra percentiles of the parameter, e.g. the bounds of a credible interval.
+        opacity_percent : float, optional
+            Percent of the credible interval whose width defines the opacity.
+        opacity_log : 2, 10, or 'e', optional
+            Take the width of the credible interval in this log space. Defaults to the log of the parameter axis.
+        doi_percent : float, optional
+            Opacity percentage at which the depth of investigation is picked.
+        doi_smooth : float, optional
+            Smooth the depth of investigation with this width.
+        entropy_log : 2, 10, or 'e', optional
+            Base of the entropy.
+        chunk_size : int, optional
+            Number of data points per block. Defaults to blocks of about 64MB, aligned with the HDF5 chunks.
+        track : bool, optional
+            Show a progress bar.
+
+        Returns
+        -------
+        out : dict of geobipy.StatArray
+            Summaries keyed by the name they are stored under,
+            'mean_parameter', 'mode_parameter', 'percentile_{percent}', 'opacity', 'doi', and 'entropy'.
+
+        """
+        statistics = set(statistics)
+        assert statistics <= {'mean', 'median', 'mode', 'opacity', 'doi', 'entropy'}, ValueError("statistics must be some of 'mean', 'median', 'mode', 'opacity', 'doi', 'entropy'")
+        assert entropy_log in [2, 10, 'e'], ValueError("entropy_log must be one of [2, 'e', 10]")
+        assert 0.0 < doi_percent < 100.0, ValueError("Must have 0.0 < doi_percent < 100.0")
+
+        if 'doi' in statistics:
+            statistics.add('opacity')
+
+        percentiles = [] if percentiles is None else list(np.atleast_1d(np.float64(percentiles)))
+        if 'median' in statistics:
+            percentiles.append(50.0)
+
+        # The opacity needs the credible interval of the parameter, found with the other percentiles.
+        credible = 0.5 * np.minimum(opacity_percent, 100.0 - opacity_percent)
+        probabilities = np.unique(np.r_[percentiles, credible, 100.0 - credible] if 'opacity' in statistics else np.r_[percentiles])
+
+        posterior = self.hdfFile['/model/values/posterior']
+        mesh = hdfRead.read_item(posterior['mesh'], skip_posterior=True)
+        counts = posterior['values/data']
+
+        nPoints, nParameter, nz = counts.shape
+        parameter = mesh.y
+
+        # Parameter bin centres per data point, (nPoints or 1, nParameter)
+        centres = np.atleast_2d(parameter.centres_absolute)
+        area = parameter.widths[None, :, None] * mesh.z.widths[None, None, :]
+        x_widths = mesh.x.widths
+
+        if chunk_size is None:
+            chunk_size = np.int64(max(1, 2**26 // (nParameter * nz * counts.dtype.itemsize)))
+            if not counts.chunks is None:
+                chunk_size = max(counts.chunks[0], chunk_size - chunk_size % counts.chunks[0])
+
+        out = {}
+        def allocate(key, name, units):
+            out[key] = StatArray.StatArray((nPoints, nz), name, units)
+
+        if 'mean' in statistics:
+            allocate('mean_parameter', self.parameterName, self.parameterUnits)
+        if 'mode' in statistics:
+            allocate('mode_parameter', self.parameterName, self.parameterUnits)
+        for p in probabilities:
+            allocate('percentile_{}'.format(p), self.parameterName, self.parameterUnits)
+        if 'entropy' in statistics:
+            allocate('entropy', 'Entropy', {2:'bits', 10:'bans', 'e':'nats'}[entropy_log])
+            # Entropy of the pdf needs the total over the line, so keep sum(c log c) and sum(c) until the end.
+            c_log_c = np.zeros((nPoints, nz))
+            total = np.zeros((nPoints, nz))
+            normalizer = 0.0
+
+        r = range(0, nPoints, chunk_size)
+        if track:
+            print('Computing posterior summaries', flush=True)
+            r = progressbar.progressbar(r)
+
+        for i0 in r:
+            i1 = min(i0 + chunk_size, nPoints)
+            c = np.asarray(counts[i0:i1, :, :], dtype=np.float64)
+            x = centres[i0:i1, :, None] if centres.shape[0] > 1 else centres[:, :, None]
+
+            s = c.sum(axis=1)
+            positive = s > 0.0
+
+            if 'mean' in statistics:
+                out['mean_parameter'][i0:i1, :] = np.divide(np.sum(x * c, axis=1), s, out=np.zeros_like(s), where=positive)
+
+            if 'mode' in statistics:
+                out['mode_parameter'][i0:i1, :] = np.take_along_axis(np.broadcast_to(x, c.shape), np.argmax(c, axis=1)[:, None, :], axis=1)[:, 0, :]
+
+            if probabilities.size > 0:
+                cdf = np.cumsum(c, axis=1)
+                np.divide(cdf, s[:, None, :], out=cdf, where=positive[:, None, :])
+                cdf[~np.broadcast_to(positive[:, None, :], cdf.shape)] = 0.0
+                for p in probabilities:
+                    # Same as a searchsorted along the parameter axis
+                    i = np.minimum(np.sum(cdf < 0.01 * p, axis=1), nParameter - 1)
+                    out['percentile_{}'.format(p)][i0:i1, :] = np.take_along_axis(np.broadcast_to(x, c.shape), i[:, None, :], axis=1)[:, 0, :]
+
+            if 'entropy' in statistics:
+                a = x_widths[i0:i1, None, None] * area
+                normalizer += np.sum(a * c)
+                logged = np.log(c, out=np.zeros_like(c), where=c > 0.0)
+                c_log_c[i0:i1, :] = np.sum(c * logged, axis=1)
+                total[i0:i1, :] = s
+
+        if 'entropy' in statistics:
+            # p = c / normalizer, so -sum(p log p) = (log(normalizer) sum(c) - sum(c log c)) / normalizer
+            if normalizer > 0.0:
+                out['entropy'][:, :] = (np.log(normalizer) * total - c_log_c) / normalizer
+            out['entropy'] /= (1.0 if entropy_log == 'e' else np.log(entropy_log))
+
+        if 'opacity' in statistics:
+            low = out['percentile_{}'.format(credible)]
+            high = out['percentile_{}'.format(100.0 - credible)]
+            log = parameter.log if opacity_log is None else opacity_log
+            if log is not None:
+                low, _ = cF._log(low, log=log)
+                high, _ = cF._log(high, log=log)
+
+            opacity = StatArray.StatArray(np.abs(high - low), 'Opacity')
+            mn = np.nanmin(opacity)
+            t = np.nanmax(opacity) - mn
+            opacity = (opacity - mn) / t if t > 0.0 else opacity - mn
+            out['opacity'] = 1.0 - opacity
+            out['opacity'].name = 'Opacity'
+
+            # Only keep the credible bounds if they were asked for
+            for p in (credible, 100.0 - credible):
+                if not p in percentiles:
+                    del out['percentile_{}'.format(p)]
+
+        if 'doi' in statistics:
+            doi = _doi_from_opacity(self.mesh.y.centres_absolute, np.asarray(out['opacity']), 0.01 * doi_percent)
+            doi = StatArray.StatArray(doi, 'Depth of investigation', 'm')
+            out['doi'] = doi if doi_smooth is None else doi.smooth(doi_smooth)
 
         if self.mode == 'r+':
-            key = 'mean_parameter'
-            if key in self.hdfFile.keys():
-                mean.writeHdf(self.hdfFile, key)
-            else:
-                mean.toHdf(self.hdfFile, key)
-            self.hdfFile[key].attrs['name'] = mean.name
-            self.hdfFile[key].attrs['units'] = mean.units
+            for key, values in out.items():
+                self.uncache(key)
+                # Replace rather than overwrite, older files may hold these keys with another shape.
+                if key in self.hdfFile.keys():
+                    del self.hdfFile[key]
+                values.toHdf(self.hdfFile, key)
 
-        return mean
+        return out
 
 
     # def credible_range(self, perceslic=None):
@@ -257,44 +429,24 @@ class Inference2D(myObject):
     def compute_doi(self, percent=67.0, smooth=None, track=True):
         """ Get the DOI of the line depending on a percentage credible interval cutoff for each data point """
 
-        self.uncache('doi')
         assert 0.0 < percent < 100.0, ValueError("Must have 0.0 < percent < 100.0")
 
-        nz = self.mesh.y.nCells
-        # doi = np.empty(self.nPoints)
-
-        p = 0.01 * percent
-
-        r = range(self.nPoints)
-        if track:
-            print('Computing Depth of Investigation', flush=True)
-            r = progressbar.progressbar(r)
-
-        @jit(**_numba_settings)
-        def loop(axis, values, p):
-            shp = np.shape(values)
-            out = np.empty(shp[0])
-            for i in range(shp[0]):
-                tmp = values[i, :]
-                j = shp[1] - 1
-                while tmp[j] < p and j >= 1:
-                    j -= 1
-                out[i] = axis[i, j]
-            return out
+        if "opacity" in self.hdfFile.keys():
+            doi = _doi_from_opacity(self.mesh.y.centres_absolute, np.asarray(self.opacity()), 0.01 * percent)
+            doi = StatArray.StatArray(doi, 'Depth of investigation', 'm')
 
-        doi = loop(self.mesh.y.centres_absolute, self.opacity(), p)
-        doi = StatArray.StatArray(doi, 'Depth of investigation', 'm')
+            if smooth is not None:
+                doi = doi.smooth(smooth)
 
-        if smooth is not None:
-            doi = doi.smooth(smooth)
-        
-        if self.mode == 'r+':        
-            if 'doi' in self.hdfFile.keys():
-                doi.writeHdf(self.hdfFile, 'doi')
-            else:
-                doi.toHdf(self.hdfFile, 'doi')
+            if self.mode == 'r+':
+                self.uncache('doi')
+                if 'doi' in self.hdfFile.keys():
+                    doi.writeHdf(self.hdfFile, 'doi')
+                else:
+                    doi.toHdf(self.hdfFile, 'doi')
+            return doi
 
-        return doi
+        return self.compute_posterior_summary(statistics=('doi',), doi_percent=percent, doi_smooth=smooth, track=track)['doi']
 
     @property
     def easting(self):
@@ -315,7 +467,9 @@ class Inference2D(myObject):
 
     @property
     def entropy(self):
-        return self.parameter_posterior().entropy(axis=1)
+        if 'entropy' in self.hdfFile.keys():
+            return StatArray.StatArray.fromHdf(self.hdfFile['entropy'])
+        return self.compute_posterior_summary(statistics=('entropy',), track=False)['entropy']
 
     # def extract1DModel(self, values, index=None, fiducial=None):
     #     """ Obtain the results for the given iD number """
@@ -486,6 +640,92 @@ class Inference2D(myObject):
 
     #     return distributions
 
+    def fit_mixture_to_pdf(self, mixture=mixPearson, **kwargs):
+        """Fit mixtures to the parameter posterior of every data point in the line.
+
+        Parameters
+        ----------
+        mixture : geobipy.Mixture, optional
+            Type of mixture to fit.
+
+        Returns
+        -------
+        out : list
+            For each data point, None if its posterior is empty or the fit failed,
+            otherwise the list of fitted mixtures along the depth axis.
+
+        See Also
+        --------
+        geobipy.Histogram.fit_mixture_to_pdf
+            For details on the fitting arguments.
+
+        """
+        kwargs['track'] = False
+
+        out = []
+        for i in range(self.nPoints):
+            hm = self.parameter_posterior(index=i)
+
+            mixtures = None
+            if not np.all(hm.counts == 0):
+                try:
+                    # Keep the mixture of each (fit, mixture) pair, the lmfit result cannot be pickled.
+                    mixtures = [None if m is None else m[1] for m in hm.fit_mixture_to_pdf(mixture=mixture, axis=1, **kwargs)]
+                except:
+                    print('line {} point {} failed'.format(self.line, i), flush=True)
+
+            out.append(mixtures)
+
+        return out
+
+    def fit_mixture_to_pdf_batched(self, mixture=mixPearson, points_per_batch=64, **kwargs):
+        """Fit mixtures to the parameter posterior at every depth of every data point in the line.
+
+        The posteriors are read points_per_batch points at a time, and the mixtures of all their depths are fit in one call.
+
+        Parameters
+        ----------
+        mixture : geobipy.Mixture, optional
+            Type of mixture to fit.
+        points_per_batch : int, optional
+            Number of data points read and fit at once.
+
+        Returns
+        -------
+        out : numpy.ndarray
+            Parameters of the mixtures, shape (nPoints, number of depth cells, parameters of a mixture),
+            in the layout of Mixture.createHdf.
+
+        See Also
+        --------
+        geobipy.Mixture.fit_to_curves
+            For details on the fitting arguments.
+
+        """
+        kwargs.pop('track', None)
+
+        # The bins of the posterior are shared by every point.
+        mesh = self.parameter_posterior(index=0).mesh
+        x = mesh.x.centres_absolute
+        widths = np.asarray(mesh.x.widths)
+
+        counts = self.hdfFile['/model/values/posterior/values/data']
+
+        out = None
+        for i0 in range(0, self.nPoints, points_per_batch):
+            # (points, bins, depths) to (points, depths, bins)
+            pdf = np.moveaxis(np.asarray(counts[i0:i0+points_per_batch], dtype=np.float64), 1, -1)
+            area = np.sum(pdf * widths, axis=-1, keepdims=True)
+            pdf /= np.where(area > 0.0, area, 1.0)
+
+            params = mixture.fit_to_curves(x, pdf.reshape(-1, pdf.shape[-1]), **kwargs)
+
+            if out is None:
+                out = np.zeros((self.nPoints, pdf.shape[1], params.shape[-1]))
+            out[i0:i0+pdf.shape[0]] = params.reshape(*pdf.shape[:2], -1)
+
+        return out
+
     def fit_estimated_pdf(self, intervals=None, external_files=True, **kwargs):
         """Uses Mixture modelling to fit disrtibutions to the hitmaps for the specified intervals.
 
@@ -804,6 +1044,11 @@ class Inference2D(myObject):
     #     """ Get the mean model of the parameters """
     #     return np.max(np.asarray(self.hdfFile["model/values/posterior/mesh/x/edges/data"][:, -1]))
 
+    def mode_parameters(self, slic=None):
+        if not 'mode_parameter' in self.hdfFile:
+            return self.compute_posterior_summary(statistics=('mode',), track=False)['mode_parameter']
+        return StatArray.StatArray.fromHdf(self.hdfFile['mode_parameter'], index=slic)
+
     def mean_parameters(self, slic=None):
         if not 'mean_parameter' in self.hdfFile:
             self._mean_parameter = self.compute_mean_parameter(log=10)
@@ -875,19 +1120,8 @@ class Inference2D(myObject):
         else:
             return self.compute_opacity()
 
-    def compute_opacity(self, percent=90.0, log=10, multiplier=0.5):
-
-        self.uncache('opacity')
-
-        opacity = self.parameter_posterior().opacity(percent, log, axis=1)
-
-        if self.mode == 'r+':
-            if 'opacity' in self.hdfFile.keys():
-                opacity.writeHdf(self.hdfFile, 'opacity')
-            else:
-                opacity.toHdf(self.hdfFile, 'opacity')
-
-        return opacity
+    def compute_opacity(self, percent=90.0, log=None):
+        return self.compute_posterior_summary(statistics=('opacity',), opacity_percent=percent, opacity_log=log, track=False)['opacity']
 
     def compute_probability(self, distribution, log=None, log_probability=False, axis=0, **kwargs):
         return self.parameter_posterior().compute_probability(distribution, log, log_probability, axis, **kwargs)
@@ -966,8 +1200,26 @@ class Inference2D(myObject):
         return Histogram.fromHdf(self.hdfFile['/model/mesh/nCells/posterior'], index=index)
 
 
-    def inference_1d(self, index=None, fiducial=None, reciprocateParameter=False):
-        """ Obtain the results for the given iD number """
+    def inference_1d(self, index=None, fiducial=None, reciprocateParameter=False, lazy=False):
+        """Obtain the results for the given data point
+
+        Parameters
+        ----------
+        index : int, optional
+            Index of the data point in the line.
+        fiducial : float, optional
+            Fiducial of the data point.
+        lazy : bool, optional
+            Return a LazyInference1D that only reads the parts of the file that are accessed.
+            The inference_1d_cache_size most recently requested lazy data points are kept,
+            along with everything already read from them, so going back to a data point is free.
+
+        Returns
+        -------
+        out : geobipy.Inference1D or geobipy.LazyInference1D
+            Results of the data point.
+
+        """
 
         assert not (index is None and fiducial is None), Exception("Please specify either an integer index or a fiducial.")
         assert index is None or fiducial is None, Exception("Only specify either an integer index or a fiducial.")
@@ -977,11 +1229,21 @@ class Inference2D(myObject):
             # Get the point index
             index = self.fiducials.searchsorted(fiducial)
 
-        R = Inference1D.fromHdf(self.hdfFile, index=index, system_file_path=self.system_file_path)
+        if not lazy:
+            return Inference1D.fromHdf(self.hdfFile, index=index, system_file_path=self.system_file_path)
 
-        return R
+        index = np.int64(index)
+        cache = self._inference_1d_cache
+        if index in cache:
+            cache.move_to_end(index)
+            return cache[index]
 
+        R = LazyInference1D(self.hdfFile, self.system_file_path, index)
+        cache[index] = R
+        while len(cache) > self.inference_1d_cache_size:
+            cache.popitem(last=False)
 
+        return R
 
     @cached_property
     def totalError(self):
@@ -1478,19 +1740,16 @@ class Inference2D(myObject):
 
     def plotModeModel(self, **kwargs):
 
-        values = self.modeParameter()
+        values = self.mode_parameters()
         if (kwargs.pop('reciprocateParameter', False)):
             values = 1.0 / values
             values.name = 'Resistivity'
             values.units = '$Omega m$'
 
-        return self.plot_cross_section(values = values.T, **kwargs)
+        return self.plot_cross_section(values = values, **kwargs)
 
     def plot_percentile(self, percent, **kwargs):
-        posterior = self.parameter_posterior()
-        percentile = posterior.percentile(percent, axis=1)
-
-        return self.plot_cross_section(values=percentile, **kwargs)
+        return self.plot_cross_section(values=self.percentile(percent), **kwargs)
 
     def marginal_probability(self, slic=None):
 
@@ -1681,7 +1940,7 @@ class Inference2D(myObject):
 
     def plot_inference_1d(self, fiducial):
         """ Plot the geobipy results for the given data point """
-        R = self.inference_1d(fiducial=fiducial)
+        R = self.inference_1d(fiducial=fiducial, lazy=True)
         R.initFigure(forcePlot=True)
         R.plot(forcePlot=True)
 
@@ -1849,11 +2108,15 @@ class Inference2D(myObject):
               "====================================================\n")
 
 
-    def createHdf(self, hdfFile, fiducials, inference1d):
+    def createHdf(self, hdfFile, fiducials, inference1d, layout=None):
         """ Create the hdf group metadata in file
         parent: HDF object to create a group inside
         myName: Name of the group
+        layout: Optional geobipy.HdfLayout used to chunk and compress the datasets stacked over the fiducials
         """
 
         self.hdfFile = hdfFile
-        inference1d.createHdf(hdfFile, fiducials)
\ No newline at end of file
+        if layout is None:
+            inference1d.createHdf(hdfFile, fiducials)
+        else:
+            inference1d.createHdf(layout.group(hdfFile, np.size(fiducials)), fiducials)
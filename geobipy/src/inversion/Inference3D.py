@@ -8,6 +8,8 @@ from matplotlib.animation import FuncAnimation
 import numpy as np
 import h5py
 from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
 
 from sklearn.mixture import GaussianMixture
 from smm import SMM
@@ -22,28 +24,94 @@ from ..classes.statistics.mixPearson import mixPearson
 from ..classes.pointcloud.PointCloud3D import PointCloud3D
 from ..classes.mesh.RectilinearMesh3D import RectilinearMesh3D
 from ..classes.model.Model import Model
+from ..classes.forwardmodelling.HalfSpaceTable import HalfSpaceTable
 from .Inference1D import Inference1D
 from .Inference2D import Inference2D
+from .MultiChainInference1D import MultiChainInference1D
+from .SurveyIndex import SurveyIndex
 
 from ..classes.data.dataset.Data import Data
 from ..classes.data.datapoint.DataPoint import DataPoint
 from ..base.HDF import hdfRead
+from ..base.HDF.hdfBuffer import WriteBuffer
+from ..base.HDF.hdfLayout import HdfLayout
 from ..base import plotting as cP
 from ..base import utilities as cF
-from os.path import join
-from scipy.spatial import Delaunay
+from os.path import isfile, join
+from scipy.spatial import Delaunay, cKDTree
+from scipy.interpolate import CloughTocher2DInterpolator
 
-from os import listdir
+from os import listdir, makedirs, remove
 import progressbar
 
+
+# Workers are forked from a clean server process. Forking this process directly copies the state of the threads of
+# the parallel numba kernels, which can leave it hanging at exit.
+_pool_context = get_context('forkserver')
+
+def _line_task(filename, system_file_path, mode, method, args, kwargs):
+    """Call an Inference2D method in a worker process, which opens its own handle to the line file. """
+    line = Inference2D(filename, system_file_path=system_file_path, mode=mode)
+    try:
+        return getattr(line, method)(*args, **kwargs)
+    finally:
+        line.close()
+
+
+# State shared by the depth chunks interpolated in one worker process
+_volume_worker = {}
+
+def _init_volume_worker(filenames, key, index, xy, query, outside, clip):
+    """Triangulate the interpolation points once per process. """
+    _volume_worker.update(filenames=filenames, key=key, index=index, query=query, outside=outside, clip=clip,
+                          triangulation=Delaunay(xy))
+
+def _volume_task(start, stop):
+    """Interpolate the cells start:stop of a summary from every line file to the query points.
+
+    Returns an array of shape (number of query points, stop - start).
+    """
+    w = _volume_worker
+
+    values = []
+    for filename in w['filenames']:
+        with h5py.File(filename, 'r') as f:
+            values.append(f[w['key'] + '/data'][:, start:stop])
+    values = np.vstack(values)[w['index']]
+    values[np.isinf(values)] = np.nan
+
+    # Normalise each cell for the gradient estimation of the interpolator
+    mn = np.nanmin(values, axis=0)
+    rng = np.nanmax(values, axis=0) - mn
+    rng[rng == 0.0] = 1.0
+
+    out = CloughTocher2DInterpolator(w['triangulation'], (values - mn) / rng)(w['query'])
+
+    # Truncate values to the observed values
+    if w['clip']:
+        out = np.clip(out, 0.0, 1.0)
+    out = out * rng + mn
+
+    if not w['outside'] is None:
+        out[w['outside'], :] = np.nan
+
+    return out
+
+
 class Inference3D(myObject):
     """ Class to define results from Inv_MCMC for a full data set """
 
-    def __init__(self, directory, system_file_path, files=None, mpi_enabled=False, mode='r+', world=None):
+    # File of the survey index, written next to the line results files
+    survey_index_name = 'survey_index.h5'
+
+    def __init__(self, directory, system_file_path, files=None, mpi_enabled=False, mode='r+', world=None, n_processes=1):
         """ Initialize the 3D inference
         directory = directory containing folders for each line of data results
+        n_processes = number of local processes used to post-process the lines when MPI is not enabled
         """
         self.directory = directory
+        self.mode = mode
+        self.n_processes = n_processes
         self._h5files = None
         self._nPoints = None
         self.cumNpoints = None
@@ -63,6 +131,7 @@ class Inference3D(myObject):
         self.world = world
 
         self._mesh3d = None
+        self._survey_index = None
         self.kdtree = None
         self._mean3D = None
         self.best3D = None
@@ -78,7 +147,7 @@ class Inference3D(myObject):
             if not isinstance(files, list):
                 files = [files]
         else:
-            files = [f for f in listdir(directory) if f.endswith('.h5')]
+            files = [f for f in listdir(directory) if f.endswith('.h5') and f != self.survey_index_name]
 
         self._h5files = []
         for file in files:
@@ -221,8 +290,24 @@ class Inference3D(myObject):
         # else:
         #     return self._createHDF5_datapoint(data, **kwargs)
 
+    @staticmethod
+    def _hdf5_layout(**options):
+        """Layout of the line results files from the hdf5_layout and hdf5_compression options.
+
+        hdf5_layout is a geobipy.HdfLayout, or its mode 'write' or 'analysis'. Defaults to contiguous datasets.
+
+        """
+        layout = options.get('hdf5_layout', None)
+        if isinstance(layout, str):
+            layout = HdfLayout(layout, compression=options.get('hdf5_compression', None))
+        return layout
+
     def _createHDF5_dataset(self, dataset, **kwargs):
 
+        layout = self._hdf5_layout(**kwargs)
+        if self.parallel_access and not layout is None:
+            assert layout.compression is None, ValueError("Compressed datasets cannot be written independently by MPI ranks, set hdf5_compression = None")
+
         # Prepare the dataset so that we can read a point at a time.
         dataset = dataset._initialize_sequential_reading(kwargs['data_filename'], kwargs['system_filename'])
 
@@ -231,6 +316,8 @@ class Inference3D(myObject):
 
         line_numbers, fiducials = dataset._read_line_fiducial(kwargs['data_filename'])
 
+        kwargs['halfspace_table'] = self._halfspace_table(datapoint, **kwargs)
+
         # Get the line numbers in the data
         self._lineNumbers = np.sort(np.unique(line_numbers))
 
@@ -239,7 +326,7 @@ class Inference3D(myObject):
         # options.check(datapoint)
 
         # While preparing the file, we need access to the line numbers and fiducials in the data file
-        inference1d = Inference1D(datapoint, **kwargs)
+        inference1d = self._inference1d(datapoint, **kwargs)
 
         self.print('Creating HDF5 files, this may take a few minutes...')
         self.print('Files are being created for data files {} and system files {}'.format(kwargs['data_filename'], kwargs['system_filename']))
@@ -254,7 +341,7 @@ class Inference3D(myObject):
                 kwargs['comm'] = self.world
 
             with h5py.File(join(self.directory, '{}.h5'.format(line)), 'w', **kwargs) as f:
-                Inference2D().createHdf(f, line_sorted_fiducials, inference1d)
+                Inference2D().createHdf(f, line_sorted_fiducials, inference1d, layout=layout)
 
             self.print('Created hdf5 file for line {} with {} data points'.format(line, line_sorted_fiducials.size))
 
@@ -360,12 +447,69 @@ class Inference3D(myObject):
             line.uncache('additiveError')
         return out
 
+    @staticmethod
+    def _inference1d(datapoint, prng=None, world=None, **options):
+        """Instantiate the inference for a single data point, using several chains if n_chains > 1. """
+        if options.get('n_chains', 1) > 1:
+            return MultiChainInference1D(datapoint, prng=prng, world=world, **options)
+        return Inference1D(datapoint, prng=prng, world=world, **options)
+
+    def _halfspace_table(self, datapoint=None, dataset=None, **options):
+        """Read the half space table named by the halfspace_table option.
+
+        If the file does not exist, the table is built and written to file first, from datapoint or
+        otherwise from the first record of dataset. This is the case when restarting an inversion
+        whose table was never written, or when the line results files were not created by this run.
+
+        """
+        filename = options.get('halfspace_table', None)
+        if (filename is None) or isinstance(filename, HalfSpaceTable):
+            return filename
+
+        if not isfile(filename):
+            if self.rank == 0:
+                if datapoint is None:
+                    assert not dataset is None, ValueError("Half space table {} does not exist and there is no data to build it from".format(filename))
+                    datapoint = dataset._initialize_sequential_reading(options['data_filename'], options['system_filename'])._read_record(record=0)
+                self.print('Creating the half space table {}'.format(filename))
+                HalfSpaceTable.build(datapoint).write(filename)
+
+            if self.parallel_access:
+                self.world.barrier()
+
+        return HalfSpaceTable.read(filename)
+
     def infer(self, dataset, seed=None, index=None, fiducial=None, line_number=None, **options):
+        """Invert the data points of a data set, writing to the line results files.
 
-        if self.parallel_access:
-            self.infer_mpi(dataset, **options)
-        else:
-            self.infer_serial(dataset, seed=seed, index=index, fiducial=fiducial, line_number=line_number, **options)
+        Data points that are flagged as completed in the line results files are skipped, so an interrupted run
+        can be restarted on the same files. Setting the option checkpoint_every also pickles the chain of each
+        data point every checkpoint_every iterations to the checkpoints folder, and a checkpointed chain is
+        continued rather than restarted.
+
+        Results are buffered in memory, up to write_buffer_mb megabytes shared by every line of a rank (default 256,
+        0 to write every point straight to file), and written in contiguous blocks of data points.
+        The buffer is also written when the inversion stops, and checkpoints are only removed once their point is written.
+
+        """
+
+        options['halfspace_table'] = self._halfspace_table(dataset=dataset, **options)
+
+        if options.get('checkpoint_every', 0) > 0:
+            makedirs(self._checkpoint_directory, exist_ok=True)
+
+        self._write_buffer_ = None
+        try:
+            if self.parallel_access:
+                self.infer_mpi(dataset, **options)
+            else:
+                self.infer_serial(dataset, seed=seed, index=index, fiducial=fiducial, line_number=line_number, **options)
+        finally:
+            if not self._write_buffer_ is None:
+                self._write_buffer_.flush()
+            self._write_buffer_ = None
+            # Co-ordinates are written as points are inverted.
+            self.remove_survey_index()
 
     def infer_serial(self, dataset, seed=None, index=None, fiducial=None, line_number=None, **options):
 
@@ -374,21 +518,20 @@ class Inference3D(myObject):
 
         prng = np.random.RandomState(seed)
 
+        if not fiducial is None:
+            index = dataset._fiducial_index(fiducial, line_number)
+
         if index is None:
-            nPoints = dataset.nPoints
-            r = range(nPoints)
+            records = self._pending_records(dataset, **options)
+            if records.size < dataset.nPoints:
+                print("Skipping {} completed data points".format(dataset.nPoints - records.size))
         else:
-            nPoints = 1
-            r = range(index, index+1)
+            records = np.arange(index, index+1)
 
-        for i in r:
-            datapoint = dataset._read_record(i)
+        nPoints = records.size
 
-            # Pass through the line results file object if a parallel file system is in use.
-            iLine = self.lineNumbers.searchsorted(datapoint.lineNumber)[0]
-
-            inference = Inference1D(datapoint, prng=prng, **options)
-            inference.infer(hdf_file_handle=self.lines[iLine].hdfFile)
+        for i, record in enumerate(records):
+            self._infer_record(dataset, record, prng, **options)
 
             e = time.time() - t0
             elapsed = str(timedelta(seconds=e))
@@ -396,8 +539,89 @@ class Inference3D(myObject):
             eta = str(timedelta(seconds=(np.float64(nPoints) / np.float64(i+1)) * e))
             print("Remaining Points {}/{} || Elapsed Time: {} h:m:s || ETA {} h:m:s".format(nPoints-i-1, nPoints, elapsed, eta))
 
+    def _pending_records(self, dataset, **options):
+        """Indices of the records in the data file that are not flagged as completed in the line results files. """
+
+        line_numbers, fiducials = dataset._read_line_fiducial(options['data_filename'])
+
+        pending = np.ones(np.size(line_numbers), dtype=bool)
+        for line_number, line in zip(self.lineNumbers, self.lines):
+            completed = line.completed
+            if not np.any(completed):
+                continue
+
+            i = np.where(line_numbers == line_number)[0]
+            j = np.minimum(line.fiducials.searchsorted(fiducials[i]), completed.size - 1)
+            pending[i[completed[j]]] = False
+
+        return np.where(pending)[0]
+
+    @property
+    def _checkpoint_directory(self):
+        return join(self.directory, 'checkpoints')
+
+    def _checkpoint_file(self, datapoint):
+        return join(self._checkpoint_directory, '{}_{}.pkl'.format(datapoint.lineNumber.item(), datapoint.fiducial.item()))
+
+    def _infer_record(self, dataset, index, prng, **options):
+        """Invert one record of the data set on this rank, continuing from a checkpoint if there is one. """
+
+        from ..base import MPI as myMPI
+
+        datapoint = dataset._read_record(index)
+
+        # Pass through the line results file object if a parallel file system is in use.
+        iLine = self.lineNumbers.searchsorted(datapoint.lineNumber)[0]
+
+        checkpoint = None
+        if options.get('checkpoint_every', 0) > 0:
+            checkpoint = self._checkpoint_file(datapoint)
+
+        if (not checkpoint is None) and isfile(checkpoint):
+            myMPI.print("Resuming datapoint {} from {}".format(datapoint.fiducial, checkpoint))
+            inference = Inference1D.resume(checkpoint, halfspace_table=options.get('halfspace_table', None))
+        else:
+            inference = self._inference1d(datapoint, prng=prng, world=self.world, **options)
+
+        buffer = self._write_buffer(**options)
+        hdf_file_handle = self.lines[iLine].hdfFile if buffer is None else buffer.group(self.lines[iLine].hdfFile)
+
+        # A buffered point is not on disk until the buffer is flushed, so the buffer removes its checkpoint.
+        failed = inference.infer(hdf_file_handle=hdf_file_handle, checkpoint_file=checkpoint, keep_checkpoint=not buffer is None)
+        if failed:
+            myMPI.print("datapoint {} failed to converge".format(datapoint.fiducial))
+
+        if not buffer is None:
+            buffer.end_point(checkpoint)
+
+    def _write_buffer(self, **options):
+        """The write buffer shared by every line results file of this rank, or None if buffering is switched off. """
+        megabytes = options.get('write_buffer_mb', 256)
+        if megabytes <= 0:
+            return None
+
+        if getattr(self, '_write_buffer_', None) is None:
+            self._write_buffer_ = WriteBuffer(max_bytes=np.int64(megabytes * 2**20))
+        return self._write_buffer_
+
 
     def infer_mpi(self, dataset, **options):
+        """Invert every data point using a batched master-worker scheduler.
+
+        Every rank opens the data file itself, so only positions in the array of pending records are communicated.
+        Workers request their next batch before computing the current one, so the next batch is already
+        waiting when they finish. The master rank services requests in between inverting points of its own.
+
+        OtherParameters
+        ---------------
+        batch_seconds : float, optional
+            Targeted run time of a batch on a worker. Defaults to 120s.
+        max_batch_size : int, optional
+            Largest number of points in a batch. Defaults to 64.
+        master_inference : bool, optional
+            Whether the master rank also inverts data points. Defaults to True.
+
+        """
 
         from mpi4py import MPI
         from ..base import MPI as myMPI
@@ -407,130 +631,150 @@ class Inference3D(myObject):
         # Create a parallel RNG on each worker with a different seed.
         prng = myMPI.getParallelPrng(world, MPI.Wtime)
 
-        t0 = MPI.Wtime()
+        # Every rank reads its own records from the file.
+        dataset = dataset._initialize_sequential_reading(options['data_filename'], options['system_filename'])
+
+        # Only the records that have not completed are handed out.
+        records = None
+        if world.rank == 0:
+            records = self._pending_records(dataset, **options)
+            if records.size < dataset.nPoints:
+                myMPI.print("Skipping {} completed data points".format(dataset.nPoints - records.size))
+        records = world.bcast(records, root=0)
 
         # Carryout the master-worker tasks
         if (world.rank == 0):
-            self._infer_mpi_master_task(dataset, **options)
+            self._infer_mpi_master_task(dataset, records, prng, **options)
         else:
-            self._infer_mpi_worker_task(dataset.single, prng, **options)
+            self._infer_mpi_worker_task(dataset, records, prng, **options)
+
+    @staticmethod
+    def _batch_size(seconds_per_point, nRemaining, nRanks, batch_seconds=120.0, max_batch_size=64):
+        """Number of points to send to a worker.
+
+        The batch is sized to take batch_seconds given the measured run time per point, but never
+        more than a share of the remaining points so that the final batches finish together.
+
+        """
+        # Until a worker has measured a point, give it two so it has a point queued behind the first.
+        n = 2 if np.isnan(seconds_per_point) else np.int64(batch_seconds / np.maximum(seconds_per_point, 1e-3))
+        n = np.minimum(n, np.int64(np.ceil(nRemaining / (2 * nRanks))))
+        return np.int64(np.clip(n, 1, max_batch_size))
+
+    def _infer_mpi_master_task(self, dataset, records, prng, **options):
+        """Hand out batches of records on request, and invert points on the master in between.
 
-    def _infer_mpi_master_task(self, dataset, **options):
-        """ Define a Send Recv Send procedure on the master """
+        Requests carry the measured seconds per point of the worker, and the reply is the
+        [start, size] of a contiguous batch of records. A size of zero shuts the worker down.
+
+        """
 
         from mpi4py import MPI
         from ..base import MPI as myMPI
 
-        # Prep the data for point by point reading
-        dataset = dataset._initialize_sequential_reading(options['data_filename'], options['system_filename'])
+        world = self.world
 
-        # Set the total number of data points
-        nPoints = dataset.nPoints
+        nPoints = records.size
+        nWorkers = world.size - 1
+        master_inference = options.get('master_inference', True) or (nWorkers == 0)
+        batch_seconds = options.get('batch_seconds', 120.0)
+        max_batch_size = options.get('max_batch_size', 64)
 
-        nFinished = 0
-        nSent = 0
+        seconds_per_point = np.full(world.size, np.nan)
+        running = np.ones(world.size, dtype=bool)
+        running[0] = False
 
-        world = self.world
-        # Send out the first indices to the workers
-        for iWorker in range(1, world.size):
-            # Get a datapoint from the file.
-            datapoint = dataset._read_record(nSent)
-
-            # If DataPoint is None, then we reached the end of the file and no more points can be read in.
-            if datapoint is None:
-                # Send the kill switch to the worker to shut down.
-                world.send(False, dest=iWorker)
-            else:
-                world.send(True, dest=iWorker)
-                datapoint.Isend(dest=iWorker, world=world)
+        request = np.empty(1, dtype=np.float64)
+        status = MPI.Status()
+        # Replies are sent without blocking, so keep their buffers alive until they complete.
+        sends = []
 
-            nSent += 1
+        nSent = 0
+        nReported = 0
 
         # Start a timer
         t0 = MPI.Wtime()
 
-        myMPI.print("Initial data points sent. Master is now waiting for requests")
+        def reply():
+            nonlocal nSent
+            world.Recv(request, source=status.Get_source(), tag=0)
+            source = status.Get_source()
 
-        # Now wait to send indices out to the workers as they finish until the entire data set is finished
-        while nFinished < nPoints:
-            # Wait for a worker to request the next data point
-            status = MPI.Status()
-            dummy = world.recv(source = MPI.ANY_SOURCE, tag = MPI.ANY_TAG, status = status)
-            requestingRank = status.Get_source()
-            
-            nFinished += 1
+            if not np.isnan(request[0]):
+                seconds_per_point[source] = request[0]
 
-            # Read the next data point from the file
-            if nSent == nPoints:
-                datapoint = None
+            n = 0
+            if nSent < nPoints:
+                n = self._batch_size(seconds_per_point[source], nPoints - nSent, world.size, batch_seconds, max_batch_size)
+                n = np.minimum(n, nPoints - nSent)
             else:
-                datapoint = dataset._read_record(nSent)
+                running[source] = False
 
-            # If DataPoint is None, then we reached the end of the file and no more points can be read in.
-            if datapoint is None:
-                # Send the kill switch to the worker to shut down.
-                world.send(False, dest=requestingRank)
-            else:
-                world.send(True, dest=requestingRank)
-                datapoint.Isend(dest=requestingRank, world=world, system=datapoint.system)
+            batch = np.asarray([nSent, n], dtype=np.int64)
+            sends.append((world.Isend(batch, dest=source, tag=1), batch))
+            nSent += n
 
-                nSent += 1
+        # Give every worker its first batch before the master starts on its own points.
+        for i in range(nWorkers):
+            world.Probe(source=MPI.ANY_SOURCE, tag=0, status=status)
+            reply()
 
-            report = ((nFinished % (world.size - 1)) == 0) or (nFinished >= nPoints)
+        myMPI.print("Initial batches sent. Master is now waiting for requests")
 
-            if report:
-                e = MPI.Wtime() - t0
-                elapsed = str(timedelta(seconds=e))
-                eta = str(timedelta(seconds=(nPoints / nFinished-1) * e))
-                myMPI.print("Points sent {} || Remaining {}/{} || Elapsed Time: {} h:m:s || ETA {} h:m:s".format(nSent, nPoints-nFinished, nPoints, elapsed, eta))
+        while np.any(running) or (master_inference and nSent < nPoints):
 
-    def _infer_mpi_worker_task(self, datapoint, prng, **options):
-        """ Define a wait run ping procedure for each worker """
+            # Service every request that is waiting.
+            while world.Iprobe(source=MPI.ANY_SOURCE, tag=0, status=status):
+                reply()
 
-        # Import here so serial code still works...
-        from ..base import MPI as myMPI
+            # Drop the replies that have been delivered.
+            sends = [s for s in sends if not s[0].Test()]
 
-        lineNumbers = self.lineNumbers
-        Inference2D = self.lines
-        world = self.world
+            if master_inference and (nSent < nPoints):
+                i = nSent
+                nSent += 1
+                self._infer_record(dataset, records[i], prng, **options)
+            elif np.any(running):
+                world.Probe(source=MPI.ANY_SOURCE, tag=0, status=status)
+                reply()
 
-        # Initialize the worker process to go
-        Go = True
+            if nSent > nReported:
+                nReported = nSent
+                e = MPI.Wtime() - t0
+                elapsed = str(timedelta(seconds=e))
+                eta = str(timedelta(seconds=(nPoints / nSent - 1) * e))
+                myMPI.print("Points sent {} || Remaining {}/{} || Elapsed Time: {} h:m:s || ETA {} h:m:s".format(nSent, nPoints-nSent, nPoints, elapsed, eta))
 
-        # Wait till you are told what to process next
-        continueRunning = world.recv(source=0)
-        # If we continue running, receive the next DataPoint. Otherwise, shutdown the rank
-        if continueRunning:
-            datapoint = datapoint.Irecv(source=0, world=world)
-        else:
-            Go = False
+        MPI.Request.Waitall([s[0] for s in sends])
 
-        while Go:
-            # # initialize the parameters
-            # paras = user_parameters.userParameters(datapoint)
-            # # Check the user input parameters against the datapoint
-            # paras.check(datapoint)
+    def _infer_mpi_worker_task(self, dataset, records, prng, **options):
+        """Invert batches of records, requesting the next batch before computing the current one. """
 
-            # Pass through the line results file object if a parallel file system is in use.
-            iLine = lineNumbers.searchsorted(datapoint.lineNumber)[0]
+        from mpi4py import MPI
 
-            inference = Inference1D(datapoint, prng, world=world, **options)
+        world = self.world
 
-            failed = inference.infer(hdf_file_handle=self.lines[iLine].hdfFile)
-            if failed:
-                myMPI.print("datapoint {} failed to converge".format(datapoint.fiducial))
+        request = np.full(1, np.nan)
+        batch = np.empty(2, dtype=np.int64)
 
-            # Ping the Master to request a new index
-            world.send('requesting', dest=0)
+        # Ask for the first batch
+        world.Send(request, dest=0, tag=0)
+        world.Recv(batch, source=0, tag=1)
 
-            # Wait till you are told whether to continue or not
-            continueRunning = world.recv(source=0)
+        while batch[1] > 0:
+            # Queue the request for the next batch, so it arrives while this one is being computed.
+            world.Send(request, dest=0, tag=0)
+            next_batch = np.empty(2, dtype=np.int64)
+            pending = world.Irecv(next_batch, source=0, tag=1)
 
-            # If we continue running, receive the next DataPoint. Otherwise, shutdown the rank
-            if continueRunning:
-                datapoint = datapoint.Irecv(source=0, world=world, system=datapoint.system)
-            else:
-                Go = False
+            t0 = MPI.Wtime()
+            for i in range(batch[0], batch[0] + batch[1]):
+                self._infer_record(dataset, records[i], prng, **options)
+
+            request[0] = (MPI.Wtime() - t0) / batch[1]
+
+            pending.Wait()
+            batch = next_batch
 
     # @cached_property
     # def additiveError(self):
@@ -601,14 +845,13 @@ class Inference3D(myObject):
     def xy_slice(self, x, y, n_test_points, distance_cutoff, variable):
 
         import pandas as pd
-        self.pointcloud.setKdTree(nDims=2)
 
         x_grid = np.linspace(x[0], x[1], n_test_points)
         y_grid = np.linspace(y[0], y[1], n_test_points)
 
         query = np.vstack([x_grid, y_grid]).T
 
-        r, i = self.pointcloud.nearest(query)
+        r, i = self.survey_index.nearest(query)
         j = np.squeeze(np.argwhere(r < distance_cutoff))
         i = i[j]
         i = pd.unique(i)
@@ -619,43 +862,81 @@ class Inference3D(myObject):
 
         return slic
 
-    def compute_credible_interval(self, percent=95.0, log=None, progress=False):
+    def _map_lines(self, method, *args, mode='r+', **kwargs):
+        """Call an Inference2D method on every line.
 
-        # Need to create HDF memory collectively.
-        for line in self.lines:
-            key = 'credible_lower'
-            if not key in line.hdfFile.keys():
-                credibleLower = StatArray.StatArray(np.zeros(line.mesh.shape), '{}% Credible Interval'.format(100.0 - percent), line.parameterUnits)
-                credibleLower.createHdf(line.hdfFile, key)
+        With MPI the lines are split over the ranks. Otherwise, if n_processes > 1, the lines are
+        distributed over a pool of local processes. In both cases each line file is opened on its own, by
+        the rank or worker handling it, while the handles of this object are closed. Otherwise the lines are looped over in serial.
 
-            key = 'credible_upper'
-            if not key in line.hdfFile.keys():
-                credibleUpper = StatArray.StatArray(np.zeros(line.mesh.shape), '{}% Credible Interval'.format(percent), line.parameterUnits)
-                credibleUpper.createHdf(line.hdfFile, key)
+        Parameters
+        ----------
+        method : str
+            Name of the Inference2D method.
+        mode : str, optional
+            Mode to open the line files in when working in parallel.
+            Use 'r' when the method does not write.
+
+        Returns
+        -------
+        out : list
+            Return value of the method for each line. Under MPI, None for the lines of other ranks.
+
+        """
+        out = [None] * self.nLines
 
         if self.parallel_access:
+            self.close()
             self.world.barrier()
+            for i in self.loop_over(self.line_starts[self.rank], self.line_ends[self.rank]):
+                line = self.lines[i]
+                line.open(mode=mode)
+                out[i] = getattr(line, method)(*args, **kwargs)
+                line.close()
+            self.world.barrier()
+            self.open(mode=self.mode, world=self.world)
 
-        r = self.loop_over(self.line_starts[self.rank], self.line_ends[self.rank])
+        elif self.n_processes > 1:
+            self.close()
+            try:
+                with ProcessPoolExecutor(max_workers=min(self.n_processes, self.nLines), mp_context=_pool_context) as pool:
+                    futures = {pool.submit(_line_task, line.fName, self.system_file_path, mode, method, args, kwargs) : i for i, line in enumerate(self.lines)}
+                    Bar = progressbar.ProgressBar(max_value=self.nLines)
+                    for future in Bar(as_completed(futures)):
+                        out[futures[future]] = future.result()
+            finally:
+                self.open(mode=self.mode)
 
-        for i in r:
-            self.lines[i].computeCredibleInterval(percent, log)
+        else:
+            for i in self.loop_over(self.nLines):
+                out[i] = getattr(self.lines[i], method)(*args, **kwargs)
+
+        return out
+
+    def compute_credible_interval(self, percent=90.0):
+        """Compute the credible interval of the parameter for every line.
+
+        Stored as the percentiles that Inference2D.credible_interval reads.
 
-    def compute_doi(self, *args, **kwargs):
-        """Compute the depth of investigation.
         """
-        for line in self.lines:
-            if not 'doi' in line.hdfFile:
-                doi = StatArray.StatArray(line.nPoints, 'Depth of investigation', line.height.units)
-                doi.createHdf(line.hdfFile, 'doi')
+        percent = 0.5 * np.minimum(percent, 100.0 - percent)
+        self._map_lines('compute_posterior_summary', statistics=(), percentiles=[percent, 100.0 - percent], track=False)
 
-        if self.parallel_access:
-            self.world.barrier()
-            kwargs['track'] = False
+    def compute_mean_parameter(self):
+        """Compute the mean parameter for every line. """
+        self._map_lines('compute_mean_parameter', track=False)
 
-        r = self.loop_over(self.line_starts[self.rank], self.line_ends[self.rank])
-        for i in r:
-            self.lines[i].compute_doi(*args, **kwargs)
+    def compute_posterior_summary(self, **kwargs):
+        """Compute summaries of the parameter posterior for every line.
+
+        See Also
+        --------
+        geobipy.Inference2D.compute_posterior_summary : For the keyword arguments.
+
+        """
+        kwargs['track'] = False
+        self._map_lines('compute_posterior_summary', **kwargs)
+        self.uncache(['doi', 'opacity'])
 
 
     def compute_MinsleyFoksBedrosian2020_P_lithology(self, global_mixture_hdf5, local_mixture_hdf5, log=None):
@@ -839,20 +1120,10 @@ class Inference3D(myObject):
         return np.hstack([line.doi for line in self.lines])
 
     def compute_doi(self, *args, **kwargs):
-
-        if self.parallel_access:
-            self.close()
-            self.world.barrier()
-            r = self.loop_over(self.line_starts[self.world.rank], self.line_ends[self.worlf.rank])
-            for i in r:
-                line = self.lines[i]
-                line.open()
-                line.compute_doi(*args, **kwargs)
-
-            self.open(world=self.world)
-        else:
-            for line in self.lines:
-                line.compute_doi(*args, **kwargs)
+        """Compute the depth of investigation of every line. """
+        kwargs['track'] = False
+        self._map_lines('compute_doi', *args, **kwargs)
+        self.uncache('doi')
 
     
     @cached_property
@@ -1027,25 +1298,57 @@ class Inference3D(myObject):
 
     @cached_property
     def pointcloud(self):
+        return self.survey_index.pointcloud
 
-        x = StatArray.StatArray(self.nPoints, name=self.lines[0].x.name, units=self.lines[0].x.units)
-        y = StatArray.StatArray(self.nPoints, name=self.lines[0].y.name, units=self.lines[0].y.units)
-        z = StatArray.StatArray(self.nPoints, name=self.lines[0].height.name, units=self.lines[0].height.units)
-        e = StatArray.StatArray(self.nPoints, name=self.lines[0].elevation.name, units=self.lines[0].elevation.units)
-        # Loop over the lines in the data set and get the attributes
-        print('Reading co-ordinates', flush=True)
-        bar = self.loop_over(self.nLines)
+    @property
+    def survey_index_file(self):
+        return join(self.directory, self.survey_index_name)
 
-        for i in bar:
-            indices = self.lineIndices[i]
-            x[indices] = self.lines[i].x
-            y[indices] = self.lines[i].y
-            z[indices] = self.lines[i].height
-            e[indices] = self.lines[i].elevation
+    @property
+    def survey_index(self):
+        """Co-ordinates and fiducials of every data point, see geobipy.SurveyIndex.
+
+        Read from survey_index_file if it was built from the current line files, otherwise read from the lines,
+        and written to survey_index_file when not running under MPI.
+
+        """
+        if not self._survey_index is None:
+            return self._survey_index
 
-            self.lines[i].uncache(['x', 'y', 'height', 'elevation'])
+        nPoints = [line.hdfFile['data/fiducial/data'].shape[0] for line in self.lines]
+        if isfile(self.survey_index_file):
+            index = SurveyIndex.fromHdf(self.survey_index_file)
+            if index.matches(self.h5files, nPoints):
+                self._survey_index = index
+                return index
 
-        return PointCloud3D(x, y, z, e)
+        if self.parallel_access:
+            self._survey_index = SurveyIndex.fromLines(self.lines)
+        else:
+            self.write_survey_index()
+
+        return self._survey_index
+
+    def write_survey_index(self):
+        """Read the co-ordinates and fiducials from every line and write them to survey_index_file. """
+        self.print('Reading co-ordinates')
+        self._survey_index = SurveyIndex.fromLines(self.lines)
+        self.uncache('pointcloud')
+
+        if self.rank == 0:
+            try:
+                self._survey_index.toHdf(self.survey_index_file)
+            except OSError:
+                self.print('Could not write {}, the survey index is kept in memory'.format(self.survey_index_file))
+
+        return self._survey_index
+
+    def remove_survey_index(self):
+        """Delete survey_index_file, so that the index is read from the lines when next needed. """
+        self._survey_index = None
+        self.uncache('pointcloud')
+        if (self.rank == 0) and isfile(self.survey_index_file):
+            remove(self.survey_index_file)
 
     def read_fit_distributions(self, fit_file, mask_by_doi=False, skip=None, components='mve', mean_limits=None, flatten=True):
         if skip is None:
@@ -1127,13 +1430,15 @@ class Inference3D(myObject):
         return self.pointcloud.y
 
 
-    def inference_1d(self, fiducial=None, index=None, line_index=None):
+    def inference_1d(self, fiducial=None, index=None, line_index=None, lazy=False):
         """Get the inversion results for the given fiducial.
 
         Parameters
         ----------
         fiducial : float
             Unique fiducial of the data point.
+        lazy : bool, optional
+            Only read what is accessed, see Inference2D.inference_1d.
 
         Returns
         -------
@@ -1145,7 +1450,7 @@ class Inference3D(myObject):
         if np.size(fidIndex) > 1:
             assert line_index is not None, ValueError("Multiple fiducials found, please specify which line_index out of {}".format(lineIndex))
             lineIndex = line_index
-        return self.lines[lineIndex].inference_1d(fidIndex)
+        return self.lines[lineIndex].inference_1d(fidIndex, lazy=lazy)
 
     def lineIndex(self, lineNumber=None, fiducial=None, index=None):
         """Get the line index """
@@ -1196,19 +1501,13 @@ class Inference3D(myObject):
 
     @property
     def fiducials(self):
-        return StatArray.StatArray(np.hstack([line.fiducials for line in self.lines]), name='fiducials')
+        return StatArray.StatArray(self.survey_index.fiducials, name='fiducials')
 
     def fiducial(self, index):
         """ Get the fiducial of the given data point """
-        iLine, index = self.lineIndex(index=index)
-        iLine = np.atleast_1d(iLine)
         index = np.atleast_1d(index)
-
-        out = np.empty(np.size(index))
-        for i in range(np.size(index)):
-            out[i] = self.lines[iLine[i]].fiducials[index[i]]
-
-        return out
+        assert np.all(index <= self.nPoints-1), IndexError('index {} is out of bounds for data point index with size {}'.format(index, self.nPoints))
+        return np.asarray(self.survey_index.fiducials[index], dtype=np.float64)
 
 
     def fiducialIndex(self, fiducial):
@@ -1228,20 +1527,11 @@ class Inference3D(myObject):
 
         """
 
-        lineIndex = []
-        index = []
-
-        for i, line in enumerate(self.lines):
-            ids = line.fiducialIndex(fiducial)
-            nIds = np.size(ids)
-            if nIds > 0:
-                lineIndex.append(np.full(nIds, fill_value=i))
-                index.append(ids)
+        i = self.survey_index.fiducial_index(fiducial)
 
-        if np.size(index) > 0:
-            return np.squeeze(np.hstack(lineIndex)), np.squeeze(np.hstack(index))
+        assert np.size(i) > 0, ValueError("fiducial not present in this data set")
 
-        assert False, ValueError("fiducial not present in this data set")
+        return np.squeeze(self.survey_index.line_index[i]), np.squeeze(self.survey_index.row[i])
 
     def fit_mixture_to_pdf_mpi(self, intervals=None, **kwargs):
 
@@ -1350,13 +1640,69 @@ class Inference3D(myObject):
                     Go = False
 
 
-    def fit_mixture_to_pdf(self, intervals=None, **kwargs):
+    def fit_mixture_to_pdf(self, intervals=None, batched=False, **kwargs):
+
+        if batched:
+            return self.fit_mixture_to_pdf_batched(**kwargs)
 
         if self.parallel_access:
             return self.fit_mixture_to_pdf_mpi(intervals, **kwargs)
+        elif self.n_processes > 1:
+            return self.fit_mixture_to_pdf_local(intervals, **kwargs)
         else:
             return self.fit_mixture_to_pdf_serial(intervals, **kwargs)
 
+    def fit_mixture_to_pdf_batched(self, mixture=mixPearson, **kwargs):
+        """Fit mixtures to the posterior of every data point, fitting all the depths of a batch of points in one call.
+
+        The fits are written to fits.h5 in the same layout as fit_mixture_to_pdf_mpi.
+        The lines are split over the MPI ranks, or the n_processes local processes, as in _map_lines.
+
+        See Also
+        --------
+        geobipy.Inference2D.fit_mixture_to_pdf_batched
+            For details on the fitting arguments.
+
+        """
+        kwargs['max_distributions'] = kwargs.get('max_distributions', 3)
+
+        fits = self._map_lines('fit_mixture_to_pdf_batched', mixture, mode='r', **kwargs)
+
+        driver = {'driver' : 'mpio', 'comm' : self.world} if self.parallel_access else {}
+        with h5py.File("fits.h5", 'w', **driver) as hdfFile:
+            tmp = mixture()
+            tmp.params = np.zeros(kwargs['max_distributions'] * tmp.n_solvable_parameters)
+            tmp.createHdf(hdfFile, 'fits', add_axis=(self.nPoints, self.lines[0].mesh.y.nCells))
+
+            ds = hdfFile['fits/params/data']
+            for line_indices, line_fits in zip(self.lineIndices, fits):
+                if not line_fits is None:
+                    ds[line_indices] = line_fits
+
+    def fit_mixture_to_pdf_local(self, intervals=None, **kwargs):
+        """Fit mixtures to the posterior of every data point, with the lines distributed over n_processes local processes.
+
+        The fits are written to fits.h5 in the same layout as fit_mixture_to_pdf_mpi.
+        Workers only read their line, and return the mixtures to be written here.
+
+        """
+        kwargs['max_distributions'] = kwargs.get('max_distributions', 3)
+
+        mixtures = self._map_lines('fit_mixture_to_pdf', mode='r', **kwargs)
+
+        with h5py.File("fits.h5", 'w') as hdfFile:
+            a = np.zeros(kwargs['max_distributions'])
+            mixture = mixPearson(a, a, a, a)
+            mixture.createHdf(hdfFile, 'fits', add_axis=(self.nPoints, self.lines[0].mesh.y.nCells))
+
+            for line_indices, line_mixtures in zip(self.lineIndices, mixtures):
+                for index, point_mixtures in zip(range(line_indices.start, line_indices.stop), line_mixtures):
+                    if point_mixtures is None:
+                        continue
+                    for j, m in enumerate(point_mixtures):
+                        if not m is None:
+                            m.writeHdf(hdfFile, 'fits', index=(index, j))
+
 
     def fit_mixture_to_pdf_serial(self, intervals, **kwargs):
         """Uses Mixture modelling to fit disrtibutions to the hitmaps for the specified intervals.
@@ -1695,6 +2041,116 @@ class Inference3D(myObject):
 
         f.close()
 
+    def build_volume(self, dx, dy, variable, filename=None, depth_chunk=8, mask=False, clip=True, block=True, log=None, chunk_bytes=2**20):
+        """Interpolate a posterior summary of every line onto a 3D mesh, without holding the volume in memory.
+
+        The summary is streamed from the line files a few depth cells at a time, interpolated with a Clough-Tocher scheme,
+        and each chunk of depth cells is written to a chunked dataset as soon as it is done.
+        The interpolation points, their triangulation, and the distance mask are computed once and reused for every chunk.
+        If n_processes > 1 the chunks are interpolated by a pool of local processes.
+
+        Parameters
+        ----------
+        dx : float
+            Increment in x.
+        dy : float
+            Increment in y.
+        variable : str
+            Summary computed by compute_posterior_summary, e.g. 'mean_parameter', 'mode_parameter', 'opacity', 'entropy', 'percentile_5'.
+            'mean' and 'mode' are accepted for the parameter summaries.
+        filename : str, optional
+            File to create. Defaults to "{variable}_{dx}_{dy}.h5".
+        depth_chunk : int, optional
+            Number of depth cells interpolated at once by each process.
+        mask : float, optional
+            Cells further than mask from any interpolation point are set to nan.
+        clip : bool, optional
+            Truncate the interpolated values to the range of the values in each depth cell.
+        block : bool, optional
+            Interpolate from the block median points of the grid, chosen once by the elevation of the points,
+            rather than from every point.
+        log : 'e' or float, optional
+            Take the log of the interpolated values.
+        chunk_bytes : int, optional
+            Upper bound on the size of a chunk of the 3D dataset.
+
+        Returns
+        -------
+        filename : str
+            The file holding the 3D model, which can be read with geobipy.Model.fromHdf.
+
+        """
+        assert not self.parallel_access, Exception("build_volume uses local processes and cannot be called under MPI")
+
+        key = {'mean' : 'mean_parameter', 'mode' : 'mode_parameter'}.get(variable, variable)
+        for line in self.lines:
+            assert key in line.hdfFile, ValueError("{} is not in {}. Run compute_posterior_summary first.".format(key, line.fName))
+        attrs = self.lines[0].hdfFile[key].attrs
+        name, units = attrs.get('name', key), attrs.get('units', '')
+
+        if filename is None:
+            filename = "{}_{}_{}.h5".format(variable, dx, dy)
+
+        mesh = self.mesh3d(dx, dy)
+        nx, ny, nz = mesh.shape
+
+        # Points used by every depth chunk
+        pc = self.pointcloud
+        index = pc.block_median_indices(x_grid=mesh.x.edges, y_grid=mesh.y.edges) if block else np.arange(self.nPoints)
+        xy = np.column_stack((pc.x[index], pc.y[index]))
+
+        X, Y = np.meshgrid(mesh.x.centres, mesh.y.centres, indexing='ij')
+        query = np.column_stack((X.ravel(), Y.ravel()))
+
+        outside = None
+        if mask:
+            dists, _ = cKDTree(xy).query(query)
+            outside = dists > mask
+
+        # Chunks span a few depth cells, halving the larger horizontal side until they fit.
+        chunks = [nx, ny, np.minimum(depth_chunk, nz)]
+        while (np.prod(chunks) * 8 > chunk_bytes) and (max(chunks[:2]) > 1):
+            axis = np.argmax(chunks[:2])
+            chunks[axis] = (chunks[axis] + 1) // 2
+
+        with h5py.File(filename, 'w') as f:
+            grp = f.create_group(variable)
+            grp.attrs['repr'] = 'Model'
+            mesh.toHdf(grp, 'mesh')
+
+            values = StatArray.StatArray(1, name=name, units=units)
+            vgrp = values.create_hdf_group(grp, 'values')
+            vgrp.attrs['name'] = name
+            vgrp.attrs['units'] = units
+            ds = vgrp.create_dataset('data', mesh.shape, dtype=np.float64, chunks=tuple(int(c) for c in chunks), fillvalue=np.nan)
+
+            def write(start, vals):
+                vals, _ = cF._log(vals, log)
+                vals = np.ma.filled(vals, np.nan)
+                ds[:, :, start:start + vals.shape[-1]] = vals.reshape(nx, ny, -1)
+
+            starts = range(0, nz, depth_chunk)
+            initargs = ([line.fName for line in self.lines], key, index, xy, query, outside, clip)
+
+            self.close()
+            try:
+                if self.n_processes > 1:
+                    with ProcessPoolExecutor(max_workers=self.n_processes, mp_context=_pool_context, initializer=_init_volume_worker, initargs=initargs) as pool:
+                        futures = {pool.submit(_volume_task, i, i + depth_chunk) : i for i in starts}
+                        Bar = progressbar.ProgressBar(max_value=len(futures))
+                        for future in Bar(as_completed(futures)):
+                            write(futures.pop(future), future.result())
+                else:
+                    _init_volume_worker(*initargs)
+                    Bar = progressbar.ProgressBar()
+                    for i in Bar(starts):
+                        write(i, _volume_task(i, i + depth_chunk))
+                    _volume_worker.clear()
+            finally:
+                self.open(mode=self.mode)
+
+        return filename
+
     def interpolate_marginal_3d(self, dx, dy, block=True, **kwargs):
 
         if self.parallel_access:
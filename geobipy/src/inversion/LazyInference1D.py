@@ -0,0 +1,108 @@
+""" @LazyInference1D
+Class to read the results of a single data point from a line results file on demand.
+"""
+import numpy as np
+from ..classes.core import StatArray
+from ..classes.statistics.Histogram import Histogram
+from ..base.HDF import hdfRead
+from .Inference1D import Inference1D
+
+class LazyInference1D(Inference1D):
+    """Inference1D whose attributes are read from a line results file the first time they are accessed.
+
+    Inference1D.fromHdf reads every posterior of a data point, while plotting or querying one quantity
+    only needs a few slices of the file. Each attribute of the proxy is mapped to the slice of the line
+    results that holds it, is read when first touched, and is kept for later accesses.
+    The parameter hitmap is read on its own unless the full model has already been read.
+
+    LazyInference1D(hdfFile, system_file_path, index)
+
+    Parameters
+    ----------
+    hdfFile : h5py.File
+        Open line results file. It must stay open while the proxy is used.
+    system_file_path : str
+        Path to the system files of the data.
+    index : int
+        Index of the data point in the line.
+
+    """
+
+    def __init__(self, hdfFile, system_file_path, index):
+        """ Initialize the proxy without reading anything """
+        super().__init__(None)
+
+        self._hdfFile = hdfFile
+        self._system_file_path = system_file_path
+        self.index = np.int64(index)
+
+        self.verbose = False
+        self.plotMe = True
+
+    # Attributes stored once per file
+    def _read_file_attribute(self, key):
+        return np.array(self._hdfFile.get(key))
+
+    def _read_limits(self):
+        tmp = self._hdfFile.get('limits')
+        return None if tmp is None else np.array(tmp)
+
+    # Attributes stored per data point
+    def _read_point(self, key, **kwargs):
+        return hdfRead.readKeyFromFile(self._hdfFile, '', '/', key, index=self.index, **kwargs)
+
+    def _read_row(self, key):
+        return hdfRead.readKeyFromFile(self._hdfFile, '', '/', key, index=np.s_[self.index, :])
+
+    def _read_hitmap(self):
+        if 'model' in self.__dict__:
+            return self.model.values.posterior
+        return Histogram.fromHdf(self._hdfFile['/model/values/posterior'], index=self.index)
+
+    _readers = {
+        '_n_markov_chains' : lambda self: self._read_file_attribute('nmc'),
+        '_update_plot_every' : lambda self: self._read_file_attribute('iplot'),
+        'interactive_plot' : lambda self: self._read_file_attribute('plotme'),
+        'limits' : lambda self: self._read_limits(),
+        'reciprocateParameter' : lambda self: self._read_file_attribute('reciprocateParameter'),
+        'nSystems' : lambda self: self._read_file_attribute('nsystems'),
+        'acceptance_x' : lambda self: hdfRead.readKeyFromFile(self._hdfFile, '', '/', 'ratex'),
+        'iteration' : lambda self: self._read_point('i'),
+        'burned_in_iteration' : lambda self: self._read_point('iburn'),
+        'burned_in' : lambda self: self._read_point('burnedin'),
+        'multiplier' : lambda self: self._read_point('multiplier'),
+        'acceptance_rate' : lambda self: self._read_row('rate'),
+        'data_misfit_v' : lambda self: self._read_row('phids'),
+        'datapoint' : lambda self: self._read_point('data', system_file_path=self._system_file_path),
+        'model' : lambda self: self._read_point('model'),
+        'halfspace' : lambda self: self._read_point('halfspace'),
+        'Hitmap' : lambda self: self._read_hitmap(),
+        'invTime' : lambda self: np.array(self._hdfFile.get('invtime')[self.index]),
+        'saveTime' : lambda self: np.array(self._hdfFile.get('savetime')[self.index]),
+        'iRange' : lambda self: StatArray.StatArray(np.arange(2 * self.n_markov_chains), name="Iteration #", dtype=np.int64),
+    }
+
+    def __getattr__(self, name):
+        # Only called when normal lookup fails, i.e. the attribute has not been read yet.
+        reader = LazyInference1D._readers.get(name)
+        if (reader is None) or (not '_hdfFile' in self.__dict__):
+            raise AttributeError("'{}' object has no attribute '{}'".format(type(self).__name__, name))
+
+        value = reader(self)
+        self.__dict__[name] = value
+        return value
+
+    @property
+    def hitmap(self):
+        return self.Hitmap
+
+    @property
+    def loaded(self):
+        """Names of the attributes that have been read from file. """
+        return [key for key in LazyInference1D._readers if key in self.__dict__]
+
+    def load(self):
+        """Read every attribute, after which the proxy no longer needs the file. """
+        for key in LazyInference1D._readers:
+            getattr(self, key)
+        return self
@@ -0,0 +1,336 @@
+""" @MultiChainInference1D
+Class to run several Markov chains for a single data point within one process.
+"""
+from copy import deepcopy
+from os import remove
+from os.path import isfile
+import matplotlib.pyplot as plt
+import numpy as np
+from ..base import utilities as cF
+from ..classes.core import StatArray
+from ..classes.core.myObject import myObject
+from .Inference1D import Inference1D
+
+class MultiChainInference1D(myObject):
+    """Run several independent or parallel tempered McMC chains for the same data point.
+
+    Each chain is an Inference1D instance with its own random number generator.
+    The chains are advanced in lock step. The candidates of every chain are forward modelled together with
+    the forward_many method of the data point, which is a single batched call for frequency domain data,
+    and their data misfits and likelihoods are evaluated together with likelihood_many.
+    The chains share the posterior histograms of the first chain,
+    so the posteriors that are written to file are the merged posteriors of every chain at temperature 1.
+    The most probable model and data are taken from the chain with the highest posterior.
+
+    With parallel tempering, every swap_every iterations the temperatures of a random pair of running chains
+    that are adjacent in temperature are swapped with the Metropolis probability
+    min(1, exp((1/T_i - 1/T_j)(L_j - L_i))), where L is the log likelihood of a chain.
+    Swapping temperatures rather than states leaves each chain with its own models and random number generator.
+
+    MultiChainInference1D(datapoint, prng, world, \*\*kwargs)
+
+    Parameters
+    ----------
+    datapoint : geobipy.DataPoint
+        Datapoint to use in the inversion.
+    prng : numpy.random.RandomState, optional
+        Random number generator used to seed each chain.
+    world : mpi4py.MPI.Comm, optional
+        MPI communicator.
+
+    OtherParameters
+    ---------------
+    n_chains : int, optional
+        Number of Markov chains to run. Defaults to 1.
+    temperatures : array_like, optional
+        Initial temperature of each chain, all >= 1 and at least one equal to 1. Defaults to 1 for every chain,
+        i.e. independent chains.
+    swap_every : int, optional
+        Number of iterations between temperature swaps. Defaults to 10.
+
+    Notes
+    -----
+    In addition to the Inference1D layout, each data point stores the burn in iteration,
+    mean acceptance rate, and highest posterior of every chain, as well as the Gelman-Rubin
+    potential scale reduction factor of the data misfit and number of layers.
+    The potential scale reduction factors only use the samples each chain drew at temperature 1.
+
+    """
+
+    def __init__(self, datapoint, prng=None, world=None, **kwargs):
+        """ Initialize the chains """
+
+        self.kwargs = kwargs
+        self.prng = np.random.RandomState() if prng is None else prng
+        self.n_chains = kwargs.get('n_chains', 1)
+
+        assert self.n_chains >= 1, ValueError("n_chains must be >= 1")
+
+        temperatures = np.asarray(kwargs.get('temperatures', np.ones(self.n_chains)), dtype=np.float64)
+        assert temperatures.size == self.n_chains, ValueError("temperatures must have n_chains = {} entries".format(self.n_chains))
+        assert np.all(temperatures >= 1.0) and np.any(temperatures == 1.0), ValueError("temperatures must be >= 1, with at least one equal to 1")
+
+        self.tempered = np.any(temperatures > 1.0)
+        self.swap_every = kwargs.get('swap_every', 10)
+        self.n_swaps = 0
+        self.n_swap_proposals = 0
+
+        # Each chain initializes its own data point, so take copies before the first chain modifies it.
+        datapoints = [datapoint] + [deepcopy(datapoint) for i in range(self.n_chains - 1)]
+
+        seeds = self.prng.randint(np.iinfo(np.int32).max, size=self.n_chains)
+
+        self.chains = []
+        for i in range(self.n_chains):
+            options = dict(kwargs)
+            # Only the first chain, which holds the merged posteriors, is plotted.
+            options['interactive_plot'] = kwargs['interactive_plot'] and (i == 0)
+            options['temperature'] = temperatures[i]
+
+            chain = Inference1D(datapoints[i], prng=np.random.RandomState(seeds[i]), world=world, **options)
+
+            if i > 0:
+                self._share_posteriors(chain)
+
+            self.chains.append(chain)
+
+        n = 2 * self.master.n_markov_chains
+        self.n_layers_v = StatArray.StatArray((self.n_chains, n), name='# of Layers')
+        # Whether each sample of each chain was drawn at temperature 1
+        self.cold_v = np.zeros((self.n_chains, n), dtype=bool)
+
+        self.chain_burned_in_iteration = StatArray.StatArray(self.n_chains, name='Burn in iteration')
+        self.chain_acceptance = StatArray.StatArray(self.n_chains, name='Mean acceptance', units='%')
+        self.chain_best_posterior = StatArray.StatArray(self.n_chains, name='Highest posterior')
+        self.rhat = StatArray.StatArray(2, name='Potential scale reduction')
+
+    def __deepcopy__(self, memo={}):
+        raise TypeError("MultiChainInference1D cannot be deep copied, its chains share their posteriors. Use checkpoint and resume instead.")
+
+    @property
+    def datapoint(self):
+        return self.master.datapoint
+
+    @property
+    def master(self):
+        """The first chain, which holds the merged posteriors. """
+        return self.chains[0]
+
+    @property
+    def model(self):
+        return self.master.model
+
+    @staticmethod
+    def _posterior_arrays(inference):
+        """StatArrays of an Inference1D that can have attached posteriors. """
+        model = inference.model
+        datapoint = inference.datapoint
+
+        out = [model.nCells, model.mesh.edges, model.values,
+               datapoint.z, datapoint.relErr, datapoint.addErr, datapoint.predictedData]
+
+        transmitter = getattr(datapoint, 'transmitter', None)
+        if transmitter is not None:
+            out.append(transmitter.pitch)
+
+        return out
+
+    @property
+    def temperatures(self):
+        """Current temperature of each chain. """
+        return np.asarray([chain.temperature for chain in self.chains])
+
+    def _share_posteriors(self, chain):
+        """Point the posteriors of chain to those of the first chain. """
+        for this, other in zip(self._posterior_arrays(chain), self._posterior_arrays(self.master)):
+            if other.hasPosterior:
+                this.posterior = other.posterior
+
+    # Checkpointing pickles every chain together, so their shared posteriors stay shared on resume.
+    checkpoint = Inference1D.checkpoint
+    resume = staticmethod(Inference1D.resume)
+
+    def _checkpoint_references(self):
+        out = {}
+        for chain in self.chains:
+            out.update(chain._checkpoint_references())
+        return out
+
+    def infer(self, hdf_file_handle, checkpoint_file=None, keep_checkpoint=False):
+        """Run every chain until they have each finished.
+
+        Parameters
+        ----------
+        hdf_file_handle : h5py.File
+            Line results file to write to.
+        checkpoint_file : str, optional
+            File to checkpoint the chains to every checkpoint_every iterations. Removed once the results are written.
+        keep_checkpoint : bool, optional
+            Do not remove checkpoint_file, e.g. because the results are buffered and removed by the buffer once written.
+
+        Returns
+        -------
+        failed : bool
+            Whether any of the chains failed to burn in.
+
+        """
+
+        master = self.master
+
+        assert master.interactive_plot or master.save_hdf5, Exception(
+            'You have chosen to neither view or save the inversion results!')
+
+        if master.interactive_plot:
+            master.initFigure()
+            plt.show(block=False)
+
+        for chain in self.chains:
+            chain.clk.start()
+
+        go = np.ones(self.n_chains, dtype=bool)
+        failed = np.zeros(self.n_chains, dtype=bool)
+
+        while np.any(go):
+            running = np.where(go)[0]
+
+            # Propose a candidate in every running chain, and forward model those not rejected on their prior together.
+            candidates = [self.chains[i].propose() for i in running]
+
+            modelled = [candidate for candidate in candidates if not candidate is None]
+            if len(modelled) > 0:
+                datapoints = [candidate[2] for candidate in modelled]
+                type(datapoints[0]).forward_many(datapoints, [candidate[1] for candidate in modelled])
+
+                # Evaluate the misfits and likelihoods of the candidates together.
+                misfit, likelihood = type(datapoints[0]).likelihood_many(datapoints)
+                if likelihood is None:
+                    likelihood = [None] * len(modelled)
+
+            j = 0
+            for i, candidate in zip(running, candidates):
+                chain = self.chains[i]
+
+                if not candidate is None:
+                    chain.accept_candidate(*candidate, data_misfit1=misfit[j], likelihood1=likelihood[j])
+                    j += 1
+
+                chain.update()
+
+                self.n_layers_v[i, chain.iteration - 1] = chain.model.nCells[0]
+                self.cold_v[i, chain.iteration - 1] = chain.temperature == 1.0
+
+                go[i], failed[i] = chain._keep_going()
+
+            if self.tempered and (self.chains[running[0]].iteration % self.swap_every == 0):
+                self.swap_temperatures(np.where(go)[0])
+
+            if master.interactive_plot:
+                master.plot("Fiducial {}".format(master.datapoint.fiducial), increment=self.kwargs['update_plot_every'])
+
+            if np.any(go) and master._checkpoint_due(checkpoint_file):
+                self.checkpoint(checkpoint_file)
+
+        for chain in self.chains:
+            chain.clk.stop()
+
+        self.diagnostics()
+
+        # Take the most probable model over all chains.
+        best = self.chains[np.argmax(self.chain_best_posterior)]
+        master.best_model = best.best_model
+        master.best_datapoint = best.best_datapoint
+        master.best_posterior = best.best_posterior
+
+        if (self.kwargs['save_hdf5']):
+            self.write_inference1d(hdf_file_handle)
+
+        if (self.kwargs['save_png']):
+            master.plot()
+            master.toPNG('.', master.datapoint.fiducial)
+
+        if (not keep_checkpoint) and (not checkpoint_file is None) and isfile(checkpoint_file):
+            remove(checkpoint_file)
+
+        return np.any(failed)
+
+    def swap_temperatures(self, running):
+        """Propose to swap the temperatures of a random pair of running chains that are adjacent in temperature.
+
+        Parameters
+        ----------
+        running : array_like of ints
+            Indices of the chains that are still running.
+
+        """
+        if np.size(running) < 2:
+            return
+
+        running = np.asarray(running)
+        running = running[np.argsort(self.temperatures[running], kind='stable')]
+
+        k = self.prng.randint(running.size - 1)
+        a = self.chains[running[k]]
+        b = self.chains[running[k + 1]]
+
+        self.n_swap_proposals += 1
+
+        log_ratio = ((1.0 / a.temperature) - (1.0 / b.temperature)) * (b.likelihood - a.likelihood)
+        if np.log(self.prng.uniform()) < log_ratio:
+            a.temperature, b.temperature = b.temperature, a.temperature
+            self.n_swaps += 1
+
+    def diagnostics(self):
+        """Compute the per chain diagnostics and the potential scale reduction factors.
+
+        The potential scale reduction factors use the burned in samples drawn at temperature 1 of every chain that burned in,
+        truncated to the length of the shortest chain.
+
+        """
+        traces = [[], []]
+        for i, chain in enumerate(self.chains):
+            self.chain_burned_in_iteration[i] = chain.burned_in_iteration
+            self.chain_best_posterior[i] = chain.best_posterior
+
+            n = np.int64(chain.iteration / chain.update_plot_every)
+            self.chain_acceptance[i] = np.mean(chain.acceptance_rate[:n]) if n > 0 else np.nan
+
+            if chain.burned_in:
+                s = np.s_[chain.burned_in_iteration:chain.iteration]
+                cold = self.cold_v[i, s]
+                traces[0].append(chain.data_misfit_v[s][cold])
+                traces[1].append(self.n_layers_v[i, s][cold])
+
+        for j, trace in enumerate(traces):
+            self.rhat[j] = np.nan
+            if len(trace) > 1:
+                n = np.min([x.size for x in trace])
+                self.rhat[j] = cF.gelman_rubin([x[-n:] for x in trace])
+
+    def createHdf(self, parent, fiducials):
+        """ Create the hdf group metadata in file """
+
+        self.master.createHdf(parent, fiducials)
+
+        nPoints = np.size(fiducials)
+
+        parent.create_dataset('n_chains', data=self.n_chains)
+        self.chain_burned_in_iteration.createHdf(parent, 'chain_iburn', add_axis=nPoints, fillvalue=np.nan)
+        self.chain_acceptance.createHdf(parent, 'chain_rate', add_axis=nPoints, fillvalue=np.nan)
+        self.chain_best_posterior.createHdf(parent, 'chain_best_posterior', add_axis=nPoints, fillvalue=np.nan)
+        self.rhat.createHdf(parent, 'rhat', add_axis=nPoints, fillvalue=np.nan)
+
+    def write_inference1d(self, parent, index=None):
+        """ Write the merged results and per chain diagnostics to a line results file """
+
+        if index is None:
+            fiducials = StatArray.StatArray.fromHdf(parent['data/fiducial'])
+            index = fiducials.searchsorted(self.datapoint.fiducial)
+        index = int(np.squeeze(index))
+
+        self.chain_burned_in_iteration.writeHdf(parent, 'chain_iburn', index=index)
+        self.chain_acceptance.writeHdf(parent, 'chain_rate', index=index)
+        self.chain_best_posterior.writeHdf(parent, 'chain_best_posterior', index=index)
+        self.rhat.writeHdf(parent, 'rhat', index=index)
+
+        # The master chain flags the point as completed, so write it last.
+        self.master.write_inference1d(parent, index=index)
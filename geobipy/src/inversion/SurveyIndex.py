@@ -0,0 +1,197 @@
+""" @SurveyIndex
+Class holding the co-ordinates and fiducials of every data point in a survey, and the line results file and row of each point.
+"""
+from copy import deepcopy
+from os.path import basename
+import h5py
+import numpy as np
+from cached_property import cached_property
+from scipy.spatial import cKDTree
+from ..classes.core.myObject import myObject
+from ..classes.core import StatArray
+from ..classes.pointcloud.PointCloud3D import PointCloud3D
+
+
+class SurveyIndex(myObject):
+    """Survey-wide index of the data points in a set of line results files.
+
+    Reading the co-ordinates or finding a fiducial across a survey otherwise opens every line results file.
+    The index stores them once, in one file written next to the line results, with the line results file and
+    row of each point so that any query resolves straight to a line and an index within it.
+
+    Points are ordered by line, in the sorted order of the files, and by row within each line, so the position
+    of a point in the index is its index in Inference3D.
+
+    SurveyIndex(files, nPoints, line_numbers, x, y, height, elevation, fiducials)
+
+    Parameters
+    ----------
+    files : list of str
+        Line results files, in the order of the lines.
+    nPoints : ints
+        Number of data points in each line.
+    line_numbers : array_like
+        Line number of each line.
+    x, y, height, elevation : geobipy.StatArray
+        Co-ordinates of every data point.
+    fiducials : array_like
+        Fiducial of every data point.
+
+    """
+
+    def __init__(self, files, nPoints, line_numbers, x, y, height, elevation, fiducials):
+
+        self.files = [basename(f) for f in files]
+        self.nPoints = np.asarray(nPoints, dtype=np.int64)
+        self.line_numbers = np.asarray(line_numbers)
+
+        assert np.size(self.nPoints) == len(self.files), ValueError("nPoints must have one entry per file")
+
+        self.x = x
+        self.y = y
+        self.height = height
+        self.elevation = elevation
+        self.fiducials = np.asarray(fiducials)
+
+        assert self.fiducials.size == self.nPoints.sum(), ValueError("fiducials must have one entry per data point")
+
+    def __deepcopy__(self, memo={}):
+        return type(self)(self.files, self.nPoints, self.line_numbers, deepcopy(self.x, memo), deepcopy(self.y, memo),
+                          deepcopy(self.height, memo), deepcopy(self.elevation, memo), np.copy(self.fiducials))
+
+    @classmethod
+    def fromLines(cls, lines):
+        """Read the index from every line of a survey.
+
+        Parameters
+        ----------
+        lines : list of geobipy.Inference2D
+            Open line results.
+
+        """
+        nPoints = [line.nPoints for line in lines]
+
+        def stack(attribute):
+            tmp = [getattr(line, attribute) for line in lines]
+            return StatArray.StatArray(np.hstack(tmp), name=tmp[0].name, units=tmp[0].units)
+
+        out = cls(files = [line.fName for line in lines],
+                  nPoints = nPoints,
+                  line_numbers = [line.line for line in lines],
+                  x = stack('x'),
+                  y = stack('y'),
+                  height = stack('height'),
+                  elevation = stack('elevation'),
+                  fiducials = np.hstack([line.fiducials for line in lines]))
+
+        for line in lines:
+            line.uncache(['x', 'y', 'height', 'elevation'])
+
+        return out
+
+    @property
+    def cumNpoints(self):
+        """Index of the first data point of each line, with the total number of points appended. """
+        return np.r_[0, np.cumsum(self.nPoints)]
+
+    @cached_property
+    def line_index(self):
+        """Index of the line of every data point. """
+        return np.repeat(np.arange(self.nLines), self.nPoints)
+
+    @cached_property
+    def row(self):
+        """Index of every data point within its line. """
+        return np.arange(self.nPoints.sum()) - np.repeat(self.cumNpoints[:-1], self.nPoints)
+
+    @property
+    def nLines(self):
+        return len(self.files)
+
+    @cached_property
+    def fiducial_order(self):
+        """Indices that sort the fiducials. """
+        return np.argsort(self.fiducials, kind='stable')
+
+    @cached_property
+    def kdtree(self):
+        """KD-tree of the x, y co-ordinates, built on first use. """
+        return cKDTree(np.column_stack((self.x, self.y)))
+
+    @property
+    def pointcloud(self):
+        return PointCloud3D(self.x, self.y, self.height, self.elevation)
+
+    def fiducial_index(self, fiducial):
+        """Data points with the given fiducials.
+
+        Parameters
+        ----------
+        fiducial : float or array_like
+            Fiducials to find.
+
+        Returns
+        -------
+        out : ints
+            Index of every data point whose fiducial is in fiducial, in increasing order.
+
+        """
+        fiducial = np.atleast_1d(fiducial)
+        sorted_fiducials = self.fiducials[self.fiducial_order]
+
+        starts = np.searchsorted(sorted_fiducials, fiducial, side='left')
+        ends = np.searchsorted(sorted_fiducials, fiducial, side='right')
+
+        i = np.hstack([self.fiducial_order[i0:i1] for i0, i1 in zip(starts, ends)])
+        return np.sort(i).astype(np.int64)
+
+    def matches(self, files, nPoints):
+        """Whether the index was built from these files, with these numbers of points. """
+        return ([basename(f) for f in files] == self.files) and np.array_equal(nPoints, self.nPoints)
+
+    def nearest(self, x, k=1, eps=0, p=2, radius=np.inf):
+        """Obtain the k nearest data points to x, y locations
+
+        See Also
+        --------
+        See scipy.spatial.cKDTree.query for argument descriptions and return types
+
+        """
+        return self.kdtree.query(x, k, eps, p, distance_upper_bound=radius)
+
+    def within(self, x, radius):
+        """Indices of the data points within radius of x, y locations
+
+        See Also
+        --------
+        See scipy.spatial.cKDTree.query_ball_point for argument descriptions and return types
+
+        """
+        return self.kdtree.query_ball_point(x, radius)
+
+    def toHdf(self, filename):
+        """Write the index to a file. """
+        with h5py.File(filename, 'w') as f:
+            f.attrs['repr'] = self.hdf_name
+            f.attrs['files'] = self.files
+            f.create_dataset('nPoints', data=self.nPoints)
+            f.create_dataset('line_numbers', data=self.line_numbers)
+            f.create_dataset('fiducials', data=self.fiducials)
+            f.create_dataset('fiducial_order', data=self.fiducial_order)
+            for key in ('x', 'y', 'height', 'elevation'):
+                getattr(self, key).toHdf(f, key)
+
+    @classmethod
+    def fromHdf(cls, filename):
+        """Read an index written with toHdf. """
+        with h5py.File(filename, 'r') as f:
+            out = cls(files = [str(x) for x in f.attrs['files']],
+                      nPoints = f['nPoints'][:],
+                      line_numbers = f['line_numbers'][:],
+                      x = StatArray.StatArray.fromHdf(f['x']),
+                      y = StatArray.StatArray.fromHdf(f['y']),
+                      height = StatArray.StatArray.fromHdf(f['height']),
+                      elevation = StatArray.StatArray.fromHdf(f['elevation']),
+                      fiducials = f['fiducials'][:])
+            out.fiducial_order = f['fiducial_order'][:]
+        return out
@@ -0,0 +1,60 @@
+""" Tests of the vectorised block reductions of a point cloud """
+import numpy as np
+from geobipy import PointCloud3D
+
+
+def make_cloud(n=500, seed=0):
+    prng = np.random.RandomState(seed)
+    return PointCloud3D(x=prng.uniform(0.0, 100.0, n), y=prng.uniform(0.0, 50.0, n),
+                        z=prng.randn(n), elevation=prng.uniform(0.0, 10.0, n)), prng
+
+
+def loop_reduction(cloud, dx, dy, values, function):
+    """ Reduce each occupied block in turn, as the blocks were reduced before vectorising """
+    i_cell = cloud.block_indices(dx, dy)
+    cells = np.unique(i_cell)
+    return cells, np.asarray([function(values[i_cell == cell]) for cell in cells])
+
+
+def test_block_statistic_matches_loop():
+    cloud, prng = make_cloud()
+    values = prng.randn(cloud.nPoints, 3)
+
+    for statistic, function in [('mean', lambda v: np.mean(v, axis=0)),
+                                ('median', lambda v: np.median(v, axis=0)),
+                                ('min', lambda v: np.min(v, axis=0)),
+                                ('max', lambda v: np.max(v, axis=0)),
+                                ('count', lambda v: v.shape[0])]:
+        cells, out = cloud.block_statistic(10.0, 10.0, values=values, statistic=statistic)
+        expected_cells, expected = loop_reduction(cloud, 10.0, 10.0, values, function)
+
+        assert np.all(cells == expected_cells)
+        assert np.allclose(out, expected)
+
+    cells, out = cloud.block_statistic(10.0, 10.0, statistic='percentile', percent=20.0)
+    _, expected = loop_reduction(cloud, 10.0, 10.0, cloud.z, lambda v: np.percentile(v, 20.0))
+    assert np.allclose(out, expected)
+
+
+def test_block_mean_keeps_every_point():
+    cloud, prng = make_cloud()
+
+    out, counts = cloud.block_mean(10.0, 10.0, values=np.ones(cloud.nPoints))
+    _, expected_x = loop_reduction(cloud, 10.0, 10.0, cloud.x, np.mean)
+
+    assert np.allclose(out.x, expected_x)
+    assert np.all(counts == 1.0)
+    assert np.sum(cloud.block_statistic(10.0, 10.0, statistic='count')[1]) == cloud.nPoints
+
+
+def test_block_median_indices_match_loop():
+    cloud, prng = make_cloud()
+
+    i_cell = cloud.block_indices(10.0, 10.0)
+    expected = []
+    for cell in np.unique(i_cell):
+        i_cut = np.flatnonzero(i_cell == cell)
+        tmp = cloud.z[i_cut]
+        expected.append(i_cut[np.argpartition(tmp, tmp.size // 2)[tmp.size // 2]])
+
+    assert np.all(cloud.block_median_indices(10.0, 10.0) == expected)
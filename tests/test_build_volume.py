@@ -0,0 +1,99 @@
+""" Tests of streaming a 3D volume from the line results files """
+from os import makedirs
+from os.path import join
+import h5py
+import numpy as np
+from geobipy import Inference3D
+from geobipy import Model
+from geobipy import RectilinearMesh1D
+from geobipy import StatArray
+from geobipy import SurveyIndex
+
+z_edges = StatArray(np.linspace(0.0, 100.0, 6), 'Depth', 'm')
+
+
+class Survey(Inference3D):
+    """ Line results files that only hold the fiducials and a summary, so the depth mesh is given here """
+
+    @property
+    def zGrid(self):
+        return RectilinearMesh1D(edges=z_edges)
+
+
+def linear(x, y):
+    """ A different plane for every depth cell, which Clough-Tocher interpolation reproduces """
+    k = np.arange(1, z_edges.size)
+    return 1.0 + np.outer(x, 0.01 * k) + np.outer(y, 0.02 * k[::-1])
+
+
+def make_survey(directory, nLines=4, nPoints=15):
+    """Line results files holding the fiducials and the mean parameter, with a survey index of the co-ordinates. """
+    makedirs(directory)
+    prng = np.random.RandomState(0)
+
+    files, x, y, fiducials = [], [], [], []
+    for line in range(nLines):
+        filename = join(directory, '{}.h5'.format(line + 1))
+        files.append(filename)
+
+        xl = 100.0 * line + prng.uniform(-5.0, 5.0, nPoints)
+        yl = np.linspace(0.0, 400.0, nPoints)
+        fl = StatArray(1000.0 * line + np.arange(nPoints, dtype=np.float64), 'Fiducial')
+        with h5py.File(filename, 'w') as f:
+            fl.toHdf(f, 'data/fiducial')
+            StatArray(linear(xl, yl), 'Resistivity', '$\\Omega m$').toHdf(f, 'mean_parameter')
+
+        x.append(xl); y.append(yl); fiducials.append(fl)
+
+    n = nLines * nPoints
+    SurveyIndex(files, [nPoints] * nLines, np.arange(1, nLines + 1),
+                StatArray(np.hstack(x), 'Easting', 'm'),
+                StatArray(np.hstack(y), 'Northing', 'm'),
+                StatArray(np.full(n, 30.0), 'Height', 'm'),
+                StatArray(np.zeros(n), 'Elevation', 'm'),
+                np.hstack(fiducials)).toHdf(join(directory, Inference3D.survey_index_name))
+
+
+def read(filename, variable='mean_parameter'):
+    with h5py.File(filename, 'r') as f:
+        return Model.fromHdf(f[variable])
+
+
+def test_volume_interpolates_every_depth_chunk(tmp_path):
+    make_survey(join(tmp_path, 'lines'))
+    survey = Survey(join(tmp_path, 'lines'), system_file_path='')
+
+    filename = survey.build_volume(20.0, 20.0, 'mean', filename=join(tmp_path, 'volume.h5'), depth_chunk=2, block=False)
+    model = read(filename, 'mean')
+
+    mesh = survey.mesh3d(20.0, 20.0)
+    assert model.values.shape == mesh.shape
+    assert model.values.name == 'Resistivity'
+
+    # Inside the hull of the points the planes are reproduced, in every chunk of depth cells,
+    # up to the tolerance of the gradients estimated by the interpolator.
+    X, Y = np.meshgrid(mesh.x.centres, mesh.y.centres, indexing='ij')
+    expected = linear(X.ravel(), Y.ravel()).reshape(model.values.shape)
+    inside = np.all(np.isfinite(model.values), axis=-1)
+    assert np.sum(inside) > 0
+    assert np.allclose(model.values[inside], expected[inside], rtol=1e-4)
+
+    # Cells far from any point are masked.
+    filename = survey.build_volume(20.0, 20.0, 'mean_parameter', filename=join(tmp_path, 'masked.h5'), block=False, mask=30.0)
+    masked = read(filename).values
+    assert np.all(np.isnan(masked[~inside]))
+    assert np.sum(np.isnan(masked[inside])) > 0
+
+
+def test_pool_matches_serial(tmp_path):
+    make_survey(join(tmp_path, 'serial'))
+    make_survey(join(tmp_path, 'pool'))
+    serial = Survey(join(tmp_path, 'serial'), system_file_path='')
+    pool = Survey(join(tmp_path, 'pool'), system_file_path='', n_processes=2)
+
+    a = read(serial.build_volume(40.0, 40.0, 'mean_parameter', filename=join(tmp_path, 'serial.h5'), depth_chunk=1)).values
+    b = read(pool.build_volume(40.0, 40.0, 'mean_parameter', filename=join(tmp_path, 'pool.h5'), depth_chunk=1)).values
+
+    assert np.array_equal(a, b, equal_nan=True)
+    # The line files are reopened afterwards.
+    assert 'mean_parameter' in pool.lines[0].hdfFile
@@ -0,0 +1,88 @@
+""" Tests of checkpointing Markov chains """
+from os.path import dirname, getsize, join
+import numpy as np
+from geobipy import CircularLoop
+from geobipy import FdemData
+from geobipy import HalfSpaceTable
+from geobipy import Inference1D
+from geobipy import TdemDataPoint
+from geobipy import TdemSystem
+from geobipy import Waveform
+from geobipy import user_parameters
+
+examples_folder = join(dirname(__file__), '..', 'documentation_source', 'source', 'examples')
+data_folder = join(examples_folder, 'supplementary', 'Data')
+
+
+class HandleTdemSystem(TdemSystem):
+    """ Time domain system that, like those of GA-AEM, wraps a handle that cannot be pickled """
+
+    def __reduce_ex__(self, protocol):
+        raise TypeError("cannot pickle a ctypes handle")
+
+    @classmethod
+    def read(cls, system_filename):
+        waveform = Waveform(time=np.r_[-1.0e-3, -5.0e-4, 0.0], amplitude=np.r_[0.0, 1.0, 0.0], current=1.0)
+        out = cls(offTimes=np.logspace(-5.0, -3.0, 10), transmitterLoop=CircularLoop(radius=10.0), receiverLoop=CircularLoop(),
+                  loopOffset=np.r_[0.0, 0.0, 0.0], waveform=waveform)
+        out.filename = system_filename
+        return out
+
+
+def test_fdem_checkpoint_round_trip(tmp_path):
+    options = user_parameters.read(join(examples_folder, 'Inference', '1D', 'resolve_options'))
+    options['data_filename'] = join(data_folder, 'Resolve_small.txt')
+    options['system_filename'] = join(data_folder, 'FdemSystem2.stm')
+    options['n_markov_chains'] = 200
+    options['interactive_plot'] = False
+
+    dataset = FdemData(system=options['system_filename'])._initialize_sequential_reading(options['data_filename'], options['system_filename'])
+    datapoint = dataset._read_record(0)
+    table = HalfSpaceTable.build(datapoint)
+
+    inference = Inference1D(datapoint, prng=np.random.RandomState(0), halfspace_table=table, **options)
+    for i in range(20):
+        inference.accept_reject()
+        inference.update()
+
+    checkpoint = join(tmp_path, 'chain.pkl')
+    inference.checkpoint(checkpoint)
+    resumed = Inference1D.resume(checkpoint, halfspace_table=table)
+
+    # The table is referenced, and the system is read again and shared by every data point of the chain.
+    assert resumed.kwargs['halfspace_table'] is table
+    assert getsize(checkpoint) < table.responses.nbytes
+    assert resumed.datapoint.system[0] is resumed.best_datapoint.system[0]
+    assert np.all(resumed.datapoint.system[0].frequencies == datapoint.system[0].frequencies)
+
+    # The resumed chain continues exactly as the original.
+    for i in range(20):
+        inference.accept_reject()
+        inference.update()
+        resumed.accept_reject()
+        resumed.update()
+
+    assert resumed.iteration == inference.iteration
+    assert np.all(resumed.data_misfit_v[:inference.iteration] == inference.data_misfit_v[:inference.iteration])
+
+
+def test_tdem_checkpoint_round_trip(tmp_path):
+    system = HandleTdemSystem.read('handle.stm')
+    datapoint = TdemDataPoint(x=0.0, y=0.0, z=30.0, elevation=0.0, system=[system],
+                              transmitter_loop=CircularLoop(z=30.0, radius=10.0), receiver_loop=CircularLoop(z=30.0))
+
+    # The chain holds the system through several data points.
+    inference = Inference1D(None, system_filename='handle.stm')
+    inference.datapoint = datapoint
+    inference.best_datapoint = TdemDataPoint(x=0.0, y=0.0, z=30.0, elevation=0.0, system=datapoint.system,
+                                             transmitter_loop=CircularLoop(z=30.0, radius=10.0), receiver_loop=CircularLoop(z=30.0))
+
+    checkpoint = join(tmp_path, 'chain.pkl')
+    inference.checkpoint(checkpoint)
+    resumed = Inference1D.resume(checkpoint)
+
+    assert isinstance(resumed.datapoint.system[0], HandleTdemSystem)
+    assert resumed.datapoint.system[0] is resumed.best_datapoint.system[0]
+    assert resumed.datapoint.system[0].filename == 'handle.stm'
+    assert np.all(resumed.datapoint.system[0].off_time == system.off_time)
+    assert resumed.datapoint.z == datapoint.z
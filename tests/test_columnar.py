@@ -0,0 +1,54 @@
+""" Tests of the columnar survey format """
+from os.path import dirname, join
+import numpy as np
+import pytest
+from geobipy import FdemData
+from geobipy.src.base.fileIO import ColumnarReader
+
+data_folder = join(dirname(__file__), '..', 'documentation_source', 'source', 'examples', 'supplementary', 'Data')
+data_filename = join(data_folder, 'Resolve_small.txt')
+system_filename = join(data_folder, 'FdemSystem2.stm')
+
+
+def test_columnar_matches_csv(tmp_path):
+    filename = join(tmp_path, 'survey.h5')
+    # Blocks that do not divide the number of records.
+    FdemData.csv_to_columnar(data_filename, system_filename, filename, block_size=13)
+
+    assert ColumnarReader.is_columnar(filename)
+    assert not ColumnarReader.is_columnar(data_filename)
+
+    csv = FdemData(system=system_filename)._initialize_sequential_reading(data_filename, system_filename)
+    columnar = FdemData(system=system_filename)._initialize_sequential_reading(filename, system_filename)
+
+    assert isinstance(columnar._file, ColumnarReader)
+    assert isinstance(columnar._file.values, np.memmap)
+    assert columnar._nPoints == csv._nPoints
+
+    expected = [csv._read_record() for i in range(csv._nPoints)]
+
+    # Random access, in any order.
+    for i in [50, 3, 98, 0, 3]:
+        datapoint = columnar._read_record(i)
+        assert datapoint.fiducial == expected[i].fiducial
+        assert datapoint.lineNumber == expected[i].lineNumber
+        assert np.all(datapoint.data == expected[i].data)
+        assert np.all(datapoint.std == expected[i].std)
+        assert np.all(datapoint.z == expected[i].z)
+
+    assert columnar._read_record(csv._nPoints) is None
+
+
+def test_fiducial_lookup(tmp_path):
+    filename = join(tmp_path, 'survey.h5')
+    FdemData.csv_to_columnar(data_filename, system_filename, filename)
+
+    reader = ColumnarReader(filename)
+    for i in [0, 17, 98]:
+        assert reader.record(reader.fiducial[i]) == i
+        assert reader.record(reader.fiducial[i], line=reader.line[i]) == i
+
+    with pytest.raises(AssertionError):
+        reader.record(-1.0)
+    reader.close()
+    assert reader.closed
@@ -0,0 +1,84 @@
+""" Tests of reading survey csv files in blocks """
+import gc
+from os.path import dirname, join
+import numpy as np
+import pytest
+from pandas import read_csv
+from geobipy import FdemData
+from geobipy.src.base.fileIO import CsvBlockReader
+from geobipy.src.base.fileIO import RowReader
+
+data_folder = join(dirname(__file__), '..', 'documentation_source', 'source', 'examples', 'supplementary', 'Data')
+data_filename = join(data_folder, 'Resolve_small.txt')
+system_filename = join(data_folder, 'FdemSystem2.stm')
+
+
+def test_rows_match_pandas(tmp_path):
+    expected = read_csv(data_filename, sep=r'\s+')
+    channels = ['fid', 'Easting', 'I_380', 'Q_129550']
+
+    # Blocks that do not divide the number of rows.
+    reader = CsvBlockReader(data_filename, channels, block_size=7)
+    rows = []
+    row = reader.next_row()
+    while not row is None:
+        rows.append(row.copy())
+        row = reader.next_row()
+
+    assert reader.closed
+    assert reader.next_row() is None
+    assert np.allclose(np.vstack(rows), expected[channels].values)
+    assert np.all(reader.index(['I_380', 'fid']) == [2, 0])
+
+    # Comma delimited files, with NaN entries.
+    filename = join(tmp_path, 'data.csv')
+    expected.loc[3, 'I_380'] = np.nan
+    expected.to_csv(filename, index=False, na_rep='NaN')
+
+    reader = CsvBlockReader(filename, channels, block_size=4)
+    rows = [reader.next_row() for i in range(expected.shape[0])]
+    assert reader.next_row() is None
+    assert np.allclose(np.vstack(rows), expected[channels].values, equal_nan=True)
+
+
+def test_sequential_read_matches_full_read():
+    full = FdemData.read_csv(data_filename, system_filename)
+
+    dataset = FdemData(system=system_filename)._initialize_sequential_reading(data_filename, system_filename)
+    # Reopen with blocks that do not divide the number of records.
+    dataset._file.close()
+    dataset._open_csv_files(data_filename, block_size=8)
+
+    for i in range(full.nPoints):
+        datapoint = dataset._read_record()
+        assert datapoint.fiducial == full.fiducial[i]
+        assert np.allclose(datapoint.x, full.x[i])
+        assert np.allclose(datapoint.z, full.z[i])
+        assert np.allclose(datapoint.data, full.data[i, :])
+
+    assert dataset._read_record() is None
+
+
+def test_parsing_thread_is_stopped():
+    channels = ['fid', 'Easting']
+
+    # Closed before the end of the file.
+    reader = CsvBlockReader(data_filename, channels, block_size=7)
+    reader.next_row()
+    threads = list(reader._executor._threads)
+    reader.close()
+    assert reader.closed
+    assert not any(thread.is_alive() for thread in threads)
+
+    # Dropped without being closed.
+    reader = CsvBlockReader(data_filename, channels, block_size=7)
+    reader.next_row()
+    threads = list(reader._executor._threads)
+    del reader
+    gc.collect()
+    assert not any(thread.is_alive() for thread in threads)
+
+
+def test_row_reader_needs_next_row():
+    with pytest.raises(TypeError):
+        RowReader(['fid'])
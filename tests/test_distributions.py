@@ -0,0 +1,122 @@
+""" Tests of the multivariate normal distributions """
+import numpy as np
+from geobipy import Distribution
+
+
+def make_diagonal(ndim=6, seed=0):
+    prng = np.random.RandomState(seed)
+    mean = prng.randn(ndim)
+    variance = prng.uniform(0.5, 2.0, ndim)
+    x = mean + prng.randn(ndim)
+    return mean, variance, x
+
+
+def test_diagonal_normal_matches_dense():
+    mean, variance, x = make_diagonal()
+
+    diagonal = Distribution('MvDiagonalNormal', mean, variance)
+    dense = Distribution('MvNormal', mean, np.diag(variance))
+    # The previous data prior, a log normal whose values are already in log space.
+    lognormal = Distribution('MvLogNormal', mean, np.diag(variance), linearSpace=False)
+
+    assert np.isclose(diagonal.probability(x, log=True), dense.probability(x, log=True))
+    assert np.isclose(diagonal.probability(x, log=False), dense.probability(x, log=False))
+    assert np.isclose(diagonal.mahalanobis(x), dense.mahalanobis(x))
+    assert np.allclose(diagonal.variance_dot(x), dense.variance_dot(x))
+
+    # The derivatives of the negative log probability, with the Hessian as its diagonal.
+    assert np.allclose(diagonal.derivative(x, order=1), lognormal.derivative(x, order=1))
+    assert np.allclose(np.diag(diagonal.derivative(x, order=2)), lognormal.derivative(x, order=2))
+
+    # Each dimension on its own.
+    for i in range(mean.size):
+        assert np.isclose(diagonal.probability(x[i], log=True, axis=i), dense.probability(x[i], log=True, axis=i))
+
+
+def test_diagonal_normal_variance_updates():
+    mean, variance, x = make_diagonal()
+    diagonal = Distribution('MvDiagonalNormal', mean, variance)
+
+    diagonal.variance = 2.0 * variance
+    dense = Distribution('MvNormal', mean, np.diag(2.0 * variance))
+    assert np.isclose(diagonal.probability(x, log=True), dense.probability(x, log=True))
+
+    # Samples have the requested variance.
+    diagonal = Distribution('MvDiagonalNormal', mean, variance, prng=np.random.RandomState(1))
+    samples = diagonal.rng(20000)
+    assert np.allclose(np.var(samples, axis=0), variance, rtol=0.05)
+
+
+def make_dense(ndim=5, seed=0):
+    prng = np.random.RandomState(seed)
+    A = prng.randn(ndim, ndim)
+    return A @ A.T + ndim * np.eye(ndim)
+
+
+def test_factorisation_cache_follows_variance():
+    mean, _, x = make_diagonal(ndim=5)
+    variance = make_dense()
+
+    d = Distribution('MvNormal', mean, variance)
+    p0 = d.probability(x, log=True)
+    precision = np.copy(d.precision)
+
+    # Changing the variance through the setter forgets the cached factorisation.
+    d.variance = 2.0 * variance
+    expected = Distribution('MvNormal', mean, 2.0 * variance)
+    assert np.isclose(d.probability(x, log=True), expected.probability(x, log=True))
+    assert not np.isclose(d.probability(x, log=True), p0)
+    assert np.allclose(d.precision, 0.5 * precision)
+    assert np.isclose(d.mahalanobis(x), expected.mahalanobis(x))
+
+    # The distribution holds its own copy of the variance.
+    assert np.all(variance == make_dense())
+
+    # A diagonal given as a vector.
+    d.variance = np.diag(variance)
+    expected = Distribution('MvNormal', mean, np.diag(np.diag(variance)))
+    assert np.isclose(d.probability(x, log=True), expected.probability(x, log=True))
+
+
+def test_constant_distribution_cache():
+    # Constant distributions have variance vI and skip the factorisation.
+    d = Distribution('MvNormal', 0.0, 2.0, ndim=3)
+    x = np.r_[1.0, -1.0, 0.5]
+    assert np.isclose(d.probability(x, log=True), Distribution('MvNormal', np.zeros(3), 2.0 * np.eye(3)).probability(x, log=True))
+
+    # Until a different variance is assigned.
+    d.variance = np.r_[1.0, 2.0, 3.0]
+    assert np.isclose(d.probability(x, log=True), Distribution('MvNormal', np.zeros(3), np.diag([1.0, 2.0, 3.0])).probability(x, log=True))
+
+    # Changing the dimension gives a new isotropic variance.
+    d = Distribution('MvNormal', 0.0, 2.0, ndim=3)
+    d.probability(x, log=True)
+    d.ndim = 4
+    x = np.r_[x, 2.0]
+    assert np.isclose(d.probability(x, log=True), Distribution('MvNormal', np.zeros(4), 2.0 * np.eye(4)).probability(x, log=True))
+
+
+def test_precision_factor_distribution():
+    mean, _, x = make_diagonal(ndim=5)
+    variance = make_dense()
+    precision_factor = np.linalg.cholesky(np.linalg.inv(variance))
+
+    d = Distribution('MvNormal', mean, precision_factor=precision_factor)
+    expected = Distribution('MvNormal', mean, variance)
+    assert np.isclose(d.probability(x, log=True), expected.probability(x, log=True))
+    assert np.allclose(d.variance_dot(x), variance @ x)
+
+    # Assigning a variance replaces the precision factor.
+    d.variance = 2.0 * variance
+    assert np.isclose(d.probability(x, log=True), Distribution('MvNormal', mean, 2.0 * variance).probability(x, log=True))
+
+
+def test_hessian_is_a_copy():
+    mean, _, x = make_diagonal(ndim=5)
+    d = Distribution('MvLogNormal', mean, make_dense(), linearSpace=False)
+
+    H = d.derivative(x, order=2)
+    precision = np.copy(d.precision)
+    # Callers add the data term in place.
+    H += 1.0
+    assert np.all(d.precision == precision)
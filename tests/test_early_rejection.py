@@ -0,0 +1,52 @@
+""" Tests of rejecting candidates on their prior before forward modelling them """
+from os.path import dirname, join
+import numpy as np
+from geobipy import FdemData
+from geobipy import FdemDataPoint
+from geobipy import Inference1D
+from geobipy import Model
+from geobipy import user_parameters
+
+examples_folder = join(dirname(__file__), '..', 'documentation_source', 'source', 'examples')
+data_folder = join(examples_folder, 'supplementary', 'Data')
+
+
+def test_zero_prior_is_not_forward_modelled(monkeypatch):
+    options = user_parameters.read(join(examples_folder, 'Inference', '1D', 'resolve_options'))
+    options['data_filename'] = join(data_folder, 'Resolve_small.txt')
+    options['system_filename'] = join(data_folder, 'FdemSystem2.stm')
+    options['n_markov_chains'] = 100
+    options['interactive_plot'] = False
+
+    dataset = FdemData(system=options['system_filename'])._initialize_sequential_reading(options['data_filename'], options['system_filename'])
+    inference = Inference1D(dataset._read_record(0), prng=np.random.RandomState(0), **options)
+
+    # Every third candidate model lies outside its prior.
+    prior_probability = Model.prior_probability
+    calls = {'prior' : 0, 'forward' : 0}
+    def outside_every_third(self, *args, **kwargs):
+        calls['prior'] += 1
+        if calls['prior'] % 3 == 0:
+            return -np.inf
+        return prior_probability(self, *args, **kwargs)
+
+    forward = FdemDataPoint.forward
+    def counted_forward(self, *args, **kwargs):
+        calls['forward'] += 1
+        return forward(self, *args, **kwargs)
+
+    monkeypatch.setattr(Model, 'prior_probability', outside_every_third)
+    monkeypatch.setattr(FdemDataPoint, 'forward', counted_forward)
+
+    for i in range(30):
+        model, misfit = inference.model, inference.data_misfit
+        inference.accept_reject()
+
+        if calls['prior'] % 3 == 0:
+            # Rejected, and the chain is unchanged.
+            assert inference.model is model
+            assert inference.data_misfit == misfit
+
+    assert inference.n_early_rejections == 10
+    assert inference.n_forward_models == 20
+    assert calls['forward'] == 20
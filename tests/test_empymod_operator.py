@@ -0,0 +1,33 @@
+""" Tests of the precomputed time domain operator of the empymod forward model """
+import numpy as np
+from geobipy import butterworth
+from geobipy import CircularLoop
+from geobipy import TdemSystem
+from geobipy import Waveform
+from geobipy.src.classes.forwardmodelling.Electromagnetic.TD.empymod_walktem import time_domain_operator, to_time_domain
+
+
+def make_system():
+    waveform = Waveform(time=np.r_[-1.0e-3, -5.0e-4, 0.0], amplitude=np.r_[0.0, 1.0, 0.0], current=1.0)
+    system = TdemSystem(offTimes=np.logspace(-5.0, -3.0, 10), transmitterLoop=CircularLoop(radius=10.0), receiverLoop=CircularLoop(),
+                        loopOffset=np.r_[0.0, 0.0, 0.0], waveform=waveform, offTimeFilters=[butterworth(1, 4.5e5, btype='low')])
+    # The empymod path reads the data times of a system as times.
+    system.times = system.off_time
+    return system
+
+
+def test_operator_matches_direct_conversion():
+    system = make_system()
+    operator = time_domain_operator(system)
+
+    nFrequencies = system.modellingFrequencies.size
+    assert operator.shape == (system.times.size, 2 * nFrequencies)
+
+    prng = np.random.RandomState(0)
+    for i in range(3):
+        EM = prng.randn(nFrequencies) + 1j * prng.randn(nFrequencies)
+        expected = to_time_domain(system, EM)
+        assert np.allclose(operator @ np.r_[EM.real, EM.imag], expected, rtol=1e-8, atol=1e-12 * np.max(np.abs(expected)))
+
+    # The operator is built once per system.
+    assert time_domain_operator(system) is operator
@@ -0,0 +1,140 @@
+""" Regression tests of the frequency domain forward modeller """
+from os.path import dirname, join
+import numpy as np
+from geobipy import FdemData
+from geobipy import FdemSystem
+from geobipy import FdemDataPoint
+from geobipy import Inference1D
+from geobipy import RectilinearMesh1D
+from geobipy import Model
+from geobipy import StatArray
+from geobipy import user_parameters
+
+examples_folder = join(dirname(__file__), '..', 'documentation_source', 'source', 'examples')
+data_folder = join(examples_folder, 'supplementary', 'Data')
+
+
+def make_datapoint(z=30.0):
+    fds = FdemSystem.read(join(data_folder, 'FdemSystem2.stm'))
+    return FdemDataPoint(x=0.0, y=0.0, z=z, elevation=0.0, system=fds)
+
+
+def make_model(nLayers, prng):
+    par = StatArray(10.0**prng.uniform(-3.0, 0.0, nLayers), "Conductivity", "$\\frac{S}{m}$")
+    thk = StatArray(prng.uniform(1.0, 50.0, nLayers))
+    thk[-1] = np.inf
+    return Model(mesh=RectilinearMesh1D(widths=thk), values=par)
+
+
+def test_forward_batch_matches_serial():
+    prng = np.random.RandomState(0)
+    fdp = make_datapoint()
+
+    models = [make_model(n, prng) for n in (1, 2, 3, 7, 15, 30)]
+    n_layers = np.asarray([m.nCells.item() for m in models])
+    heights = prng.uniform(20.0, 60.0, n_layers.size)
+
+    conductivity = np.zeros((n_layers.size, n_layers.max()))
+    thickness = np.full((n_layers.size, n_layers.max()), np.inf)
+    for i, m in enumerate(models):
+        conductivity[i, :n_layers[i]] = m.values
+        thickness[i, :n_layers[i]] = m.mesh.widths
+
+    batch = fdp.forward_batch(conductivity, thickness, n_layers, height=heights)
+
+    for i, m in enumerate(models):
+        fdp.z = heights[i]
+        fdp.forward(m)
+        assert np.allclose(batch[i, :], fdp.predictedData, rtol=1e-10, atol=1e-12), "Batch forward differs for model {}".format(i)
+
+
+def test_halfspace_responses_match_serial():
+    fdp = make_datapoint()
+    conductivity = np.logspace(-4.0, 1.0, 11)
+
+    batch = fdp.halfspace_responses(conductivity)
+
+    for i, c in enumerate(conductivity):
+        fdp.forward(Model(mesh=RectilinearMesh1D(widths=StatArray([np.inf])), values=StatArray([c])))
+        assert np.allclose(batch[i, :], fdp.predictedData, rtol=1e-10, atol=1e-12)
+
+
+def test_forward_many_matches_serial():
+    prng = np.random.RandomState(1)
+
+    models = [make_model(n, prng) for n in (1, 4, 9)]
+    datapoints = [make_datapoint(z) for z in prng.uniform(20.0, 60.0, len(models))]
+
+    FdemDataPoint.forward_many(datapoints, models)
+
+    for fdp, m in zip(datapoints, models):
+        batch = fdp.predictedData.copy()
+        fdp.forward(m)
+        assert np.allclose(batch, fdp.predictedData, rtol=1e-10, atol=1e-12)
+
+
+def test_forward_with_jacobian_matches_sensitivity():
+    prng = np.random.RandomState(2)
+
+    for n in (1, 2, 9):
+        m = make_model(n, prng)
+
+        fdp = make_datapoint()
+        fdp.forward(m)
+        expected = fdp.predictedData.copy()
+        J = fdp.sensitivity(m).copy()
+
+        combined = make_datapoint()
+        combined.forward(m, with_jacobian=True)
+        assert np.allclose(combined.predictedData, expected, rtol=1e-10, atol=1e-12)
+        assert np.allclose(combined.J, J, rtol=1e-10, atol=1e-12)
+
+        # The sensitivity of the same model is reused rather than recomputed.
+        assert combined.sensitivity(m) is combined.J
+
+
+def test_forward_many_with_jacobian_matches_serial():
+    prng = np.random.RandomState(3)
+
+    models = [make_model(n, prng) for n in (1, 4, 9)]
+    datapoints = [make_datapoint(z) for z in prng.uniform(20.0, 60.0, len(models))]
+
+    FdemDataPoint.forward_many(datapoints, models, with_jacobian=True)
+
+    for fdp, m in zip(datapoints, models):
+        batch = fdp.predictedData.copy()
+        J = fdp.J.copy()
+        assert fdp.sensitivity(m) is fdp.J
+
+        serial = make_datapoint(fdp.z.item())
+        serial.forward(m)
+        assert np.allclose(batch, serial.predictedData, rtol=1e-10, atol=1e-12)
+        assert np.allclose(J, serial.sensitivity(m), rtol=1e-10, atol=1e-12)
+
+
+def test_candidates_are_forward_modelled_without_sensitivity(monkeypatch):
+    options = user_parameters.read(join(examples_folder, 'Inference', '1D', 'resolve_options'))
+    options['data_filename'] = join(data_folder, 'Resolve_small.txt')
+    options['system_filename'] = join(data_folder, 'FdemSystem2.stm')
+    options['n_markov_chains'] = 100
+    options['interactive_plot'] = False
+
+    dataset = FdemData(system=options['system_filename'])._initialize_sequential_reading(options['data_filename'], options['system_filename'])
+    inference = Inference1D(dataset._read_record(0), prng=np.random.RandomState(0), **options)
+
+    # The initial local Hessian uses the sensitivity from the pass that forward modelled the initial model.
+    assert inference.datapoint._J_key == inference.datapoint._sensitivity_key(inference.model)
+
+    flags = []
+    forward = FdemDataPoint.forward
+    def recorded_forward(self, mod, with_jacobian=False):
+        flags.append(with_jacobian)
+        return forward(self, mod, with_jacobian)
+    monkeypatch.setattr(FdemDataPoint, 'forward', recorded_forward)
+
+    for i in range(30):
+        inference.accept_reject()
+
+    # Candidates keep the cached sensitivity of the point they were copied from.
+    assert len(flags) > 0
+    assert not any(flags)
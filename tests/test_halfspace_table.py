@@ -0,0 +1,92 @@
+""" Regression tests of the half space lookup table """
+from os.path import dirname, isfile, join
+import numpy as np
+from geobipy import FdemData
+from geobipy import FdemDataPoint
+from geobipy import FdemSystem
+from geobipy import HalfSpaceTable
+from geobipy import Inference3D
+
+data_folder = join(dirname(__file__), '..', 'documentation_source', 'source', 'examples', 'supplementary', 'Data')
+system_filename = join(data_folder, 'FdemSystem2.stm')
+data_filename = join(data_folder, 'Resolve_small.txt')
+
+
+class TiltedFdemDataPoint(FdemDataPoint):
+    """ Data point with a loop geometry other than its height """
+    tilt = 0.0
+
+    @property
+    def loop_geometry(self):
+        return np.r_[self.tilt]
+
+
+def make_datapoint(z=30.0, conductivity=0.0173, cls=FdemDataPoint):
+    fdp = cls(x=0.0, y=0.0, z=z, elevation=0.0, system=FdemSystem.read(system_filename))
+    data = fdp.halfspace_responses(np.r_[conductivity])[0, :]
+    fdp.data = data
+    fdp.std = 0.05 * np.abs(data) + 1.0
+    return fdp
+
+
+def misfit(fdp, model):
+    fdp.forward(model)
+    return np.sum(((fdp.predictedData - fdp.data) / fdp.std)**2.0)
+
+
+def test_lookup_matches_exact_search():
+    table = HalfSpaceTable.build(make_datapoint(), height=np.linspace(0.0, 100.0, 101))
+
+    for z in (5.0, 30.0, 47.3, 99.5):
+        for conductivity in (1e-3, 0.0173, 0.4):
+            fdp = make_datapoint(z, conductivity)
+            assert table.covers(fdp)
+
+            exact = fdp.find_best_halfspace()
+            fast = fdp.find_best_halfspace(table=table)
+
+            # The refined lookup can only be closer than the coarse exact grid
+            assert misfit(fdp, fast) <= misfit(fdp, exact) * (1.0 + 1e-8)
+            assert np.abs(np.log10(fast.values[0] / conductivity)) < 0.1
+
+
+def test_outside_table_uses_exact_search():
+    table = HalfSpaceTable.build(make_datapoint(cls=TiltedFdemDataPoint), height=np.linspace(0.0, 50.0, 51), tolerance=0.5)
+
+    fdp = make_datapoint(80.0, 0.0173)
+    assert not table.covers(fdp)
+    assert fdp.find_best_halfspace(table=table).values[0] == fdp.find_best_halfspace().values[0]
+
+    tilted = make_datapoint(30.0, 0.0173, cls=TiltedFdemDataPoint)
+    assert table.covers(tilted)
+    tilted.tilt = 2.0
+    assert not table.covers(tilted)
+    assert tilted.find_best_halfspace(table=table).values[0] == tilted.find_best_halfspace().values[0]
+
+    # A data point without the loop geometry of the table
+    assert not table.covers(make_datapoint(30.0))
+
+
+def test_write_read(tmp_path):
+    table = HalfSpaceTable.build(make_datapoint(cls=TiltedFdemDataPoint), height=np.linspace(0.0, 50.0, 11), nSamples=20, tolerance=0.25)
+    table.write(str(tmp_path / 'table.h5'))
+    other = HalfSpaceTable.read(str(tmp_path / 'table.h5'))
+
+    for key in ('conductivity', 'height', 'responses', 'geometry'):
+        assert np.array_equal(getattr(table, key), getattr(other, key))
+    assert other.tolerance == 0.25
+
+
+def test_missing_table_is_built_from_the_data(tmp_path):
+    filename = str(tmp_path / 'table.h5')
+    inference3d = Inference3D(str(tmp_path), system_filename)
+
+    table = inference3d._halfspace_table(dataset=FdemData, halfspace_table=filename,
+                                         data_filename=data_filename, system_filename=system_filename)
+
+    assert isfile(filename)
+    assert isinstance(table, HalfSpaceTable)
+
+    datapoint = FdemData._initialize_sequential_reading(data_filename, system_filename)._read_record(record=0)
+    expected = HalfSpaceTable.build(datapoint)
+    assert np.array_equal(table.responses, expected.responses)
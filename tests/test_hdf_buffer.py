@@ -0,0 +1,75 @@
+""" Tests of the buffered writer of line results files """
+from os.path import isfile, join
+import h5py
+import numpy as np
+from geobipy.src.base.HDF.hdfBuffer import WriteBuffer
+
+
+def make_file(filename, nPoints=6):
+    f = h5py.File(filename, 'w')
+    f.create_dataset('x', shape=(nPoints, 3), dtype=np.float64, fillvalue=np.nan)
+    f.create_dataset('completed', shape=(nPoints,), dtype=bool, fillvalue=False)
+    return f
+
+
+def test_completed_only_written_on_flush(tmp_path):
+    checkpoint = join(tmp_path, 'point.pkl')
+    open(checkpoint, 'w').close()
+
+    with make_file(join(tmp_path, 'line.h5')) as f:
+        buffer = WriteBuffer()
+        group = buffer.group(f)
+
+        # The index of a point found with searchsorted is a size one array.
+        index = np.asarray([2])
+        group['x'][index] = np.r_[1.0, 2.0, 3.0]
+        group['completed'][index] = True
+        buffer.end_point(checkpoint)
+
+        assert not np.any(f['completed'][:])
+        assert np.all(np.isnan(f['x'][:]))
+        assert isfile(checkpoint)
+
+        buffer.flush()
+
+        assert np.all(f['completed'][:] == [False, False, True, False, False, False])
+        assert np.all(f['x'][2, :] == [1.0, 2.0, 3.0])
+        assert not isfile(checkpoint)
+
+
+def test_flush_only_writes_buffered_rows(tmp_path):
+    with make_file(join(tmp_path, 'line.h5')) as f:
+        f['x'][:] = 5.0
+
+        buffer = WriteBuffer()
+        group = buffer.group(f)
+        group['x'][1] = np.r_[1.0, 1.0, 1.0]
+        group['x'][2, 1] = 2.0
+        group['x'][4, :2] = 3.0
+        buffer.flush()
+
+        expected = np.full((6, 3), 5.0)
+        expected[1, :] = 1.0
+        expected[2, 1] = 2.0
+        expected[4, :2] = 3.0
+        assert np.all(f['x'][:] == expected)
+
+
+def test_budget_is_shared_between_files(tmp_path):
+    with make_file(join(tmp_path, 'a.h5')) as a, make_file(join(tmp_path, 'b.h5')) as b:
+        # Two rows of x in total fit in the buffer.
+        buffer = WriteBuffer(max_bytes=2 * 3 * 8)
+
+        buffer.group(a)['x'][0] = np.r_[1.0, 1.0, 1.0]
+        buffer.end_point()
+        buffer.group(b)['x'][0] = np.r_[2.0, 2.0, 2.0]
+        buffer.end_point()
+        assert np.all(np.isnan(a['x'][0, :])) and np.all(np.isnan(b['x'][0, :]))
+
+        buffer.group(b)['x'][1] = np.r_[3.0, 3.0, 3.0]
+        buffer.end_point()
+
+        assert buffer.nbytes == 0
+        assert np.all(a['x'][0, :] == 1.0)
+        assert np.all(b['x'][0, :] == 2.0)
+        assert np.all(b['x'][1, :] == 3.0)
@@ -0,0 +1,60 @@
+""" Tests of the chunking and compression of line results files """
+from os.path import join
+import h5py
+import numpy as np
+from geobipy import HdfLayout
+
+
+def test_chunks():
+    write = HdfLayout('write', chunk_bytes=2**16)
+    analysis = HdfLayout('analysis', chunk_bytes=2**16)
+
+    # A hitmap stacked over 100 points, 8 bytes per entry, 160KB per point.
+    shape = (100, 100, 200)
+    assert write.chunks(shape, np.float64, 100) == (1, 25, 200)
+    assert analysis.chunks(shape, np.float64, 100) == (100, 1, 50)
+    for layout in (write, analysis):
+        assert np.prod(layout.chunks(shape, np.float64, 100)) * 8 <= 2**16
+
+    # Only datasets stacked over the points are chunked.
+    assert write.chunks((3, 100), np.float64, 100) is None
+    assert write.chunks((), np.float64, 100) is None
+    assert write.chunks((100,), np.float64, 100) == (100,)
+
+
+def test_filters():
+    assert HdfLayout(compression=None).filters((100, 10), np.int32) == {}
+    gzip = HdfLayout(compression='gzip')
+    assert gzip.filters((100, 10), np.int32) == {'compression': 'gzip', 'shuffle': True, 'compression_opts': 4}
+    # Only integer counts with two or more dimensions are compressed.
+    assert gzip.filters((100, 10), np.float64) == {}
+    assert gzip.filters((100,), np.int32) == {}
+
+
+def test_group_and_copy(tmp_path):
+    prng = np.random.RandomState(0)
+    counts = prng.randint(0, 10, size=(20, 30, 40)).astype(np.int32)
+
+    source = join(tmp_path, 'line.h5')
+    with h5py.File(source, 'w') as f:
+        grp = HdfLayout('write', compression='gzip', chunk_bytes=2**12).group(f, 20)
+        grp.create_dataset('data/fiducial/data', shape=(20,), dtype=np.float64)[:] = np.arange(20.0)
+        hitmap = grp.create_group('model').create_dataset('hitmap', shape=counts.shape, dtype=np.int32)
+        hitmap[:] = counts
+        grp.create_dataset('nsystems', data=2)
+
+        assert hitmap.chunks[0] == 1
+        assert hitmap.compression == 'gzip'
+        assert hitmap.attrs['layout'] == 'write'
+        assert f['nsystems'].chunks is None
+
+    destination = join(tmp_path, 'analysis.h5')
+    HdfLayout('analysis', chunk_bytes=2**12).copy(source, destination)
+
+    with h5py.File(destination, 'r') as f:
+        assert f.attrs['layout'] == 'analysis'
+        assert f['model/hitmap'].chunks[0] == 20
+        assert f['model/hitmap'].compression is None
+        assert np.all(f['model/hitmap'][:] == counts)
+        assert np.all(f['data/fiducial/data'][:] == np.arange(20.0))
+        assert f['nsystems'][()] == 2
@@ -0,0 +1,84 @@
+""" Tests of the minimum curvature gridder """
+import numpy as np
+import pytest
+from geobipy import PointCloud3D
+from geobipy import RectilinearMesh1D
+from geobipy import RectilinearMesh2D
+from geobipy.src.base import interpolation
+
+
+def make_points(n=2000, seed=0):
+    prng = np.random.RandomState(seed)
+    x = prng.uniform(0.0, 1000.0, n)
+    y = prng.uniform(0.0, 800.0, n)
+    return x, y
+
+
+def test_coarsening_keeps_end_nodes():
+    for n in [6, 7, 100, 101]:
+        nodes = np.linspace(-10.0, 30.0, n)
+        coarse = interpolation._coarsen(nodes)
+        assert coarse[0] == nodes[0] and coarse[-1] == nodes[-1]
+        assert coarse.size == n // 2 + 1
+        assert np.allclose(np.diff(coarse), np.diff(coarse)[0])
+
+    # Odd numbers of nodes take every other node.
+    nodes = np.linspace(0.0, 1.0, 101)
+    assert np.allclose(interpolation._coarsen(nodes), nodes[::2])
+
+
+def test_plane_is_reproduced():
+    # A plane has no curvature, so it is fitted exactly on every grid of the multigrid.
+    x, y = make_points()
+    values = 2.0 + 0.01 * x - 0.02 * y
+
+    # Even numbers of nodes, with several levels.
+    x_nodes = np.linspace(0.0, 1000.0, 100)
+    y_nodes = np.linspace(0.0, 800.0, 80)
+    out = interpolation.minimum_curvature(x, y, values, x_nodes, y_nodes, tension=0.0, accuracy=1e-8, iterations=2000, coarsest=16)
+
+    expected = 2.0 + 0.01 * x_nodes[:, None] - 0.02 * y_nodes[None, :]
+    assert out.shape == (100, 80)
+    assert np.allclose(out, expected, atol=1e-4)
+
+
+def test_warns_without_convergence():
+    x, y = make_points()
+    values = np.sin(x / 100.0) * np.cos(y / 100.0)
+
+    x_nodes = np.linspace(0.0, 1000.0, 100)
+    y_nodes = np.linspace(0.0, 800.0, 80)
+    with pytest.warns(RuntimeWarning, match='did not converge'):
+        interpolation.minimum_curvature(x, y, values, x_nodes, y_nodes, iterations=1, coarsest=16)
+
+
+def make_cloud_and_mesh():
+    x, y = make_points()
+    cloud = PointCloud3D(x=x, y=y, z=np.zeros(x.size))
+    mesh = RectilinearMesh2D(x=RectilinearMesh1D(centres=np.linspace(0.0, 1000.0, 51)),
+                             y=RectilinearMesh1D(centres=np.linspace(0.0, 800.0, 41)))
+    values = np.sin(x / 200.0) * np.cos(y / 200.0)
+    return cloud, mesh, values
+
+
+def test_values_are_not_modified():
+    cloud, mesh, values = make_cloud_and_mesh()
+    original = values.copy()
+
+    cloud.interpMinimumCurvature(mesh, values)
+    assert np.all(values == original)
+
+    cloud.interpMinimumCurvature(mesh, values, i=np.s_[:1000])
+    assert np.all(values == original)
+
+
+def test_matches_gmt_surface():
+    pytest.importorskip('pygmt')
+
+    cloud, mesh, values = make_cloud_and_mesh()
+
+    ours, _ = cloud.interpMinimumCurvature(mesh, values, accuracy=1e-6, iterations=2000)
+    gmt, _ = cloud.interpMinimumCurvature(mesh, values, gmt=True)
+
+    # Both are tension splines through densely sampled, smooth values.
+    assert np.sqrt(np.nanmean((ours.values - gmt.values)**2.0)) < 0.02
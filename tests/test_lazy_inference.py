@@ -0,0 +1,77 @@
+""" Tests of reading the results of a data point on demand """
+from os.path import dirname, join
+import h5py
+import numpy as np
+from geobipy import FdemData
+from geobipy import Inference1D
+from geobipy import Inference2D
+from geobipy import LazyInference1D
+from geobipy import user_parameters
+
+examples_folder = join(dirname(__file__), '..', 'documentation_source', 'source', 'examples')
+data_folder = join(examples_folder, 'supplementary', 'Data')
+
+
+def make_line(tmp_path, nPoints=2):
+    """Line results file with short chains for the first data points of the Resolve example. """
+    options = user_parameters.read(join(examples_folder, 'Inference', '1D', 'resolve_options'))
+    options['data_filename'] = join(data_folder, 'Resolve_small.txt')
+    options['system_filename'] = join(data_folder, 'FdemSystem2.stm')
+    options['n_markov_chains'] = 20
+    options['interactive_plot'] = False
+    options['save_hdf5'] = True
+    options['save_png'] = False
+
+    dataset = FdemData(system=options['system_filename'])._initialize_sequential_reading(options['data_filename'], options['system_filename'])
+
+    filename = join(tmp_path, '30010.h5')
+    with h5py.File(filename, 'w') as f:
+        for i in range(nPoints):
+            inference = Inference1D(dataset._read_record(), prng=np.random.RandomState(i), **options)
+            if i == 0:
+                inference.createHdf(f, np.asarray([30000.0, 30000.1]))
+            inference.infer(f)
+
+    return filename, options['system_filename']
+
+
+def test_lazy_matches_full_read(tmp_path):
+    filename, system_filename = make_line(tmp_path)
+
+    with h5py.File(filename, 'r') as f:
+        full = Inference1D.fromHdf(f, index=1, system_file_path=system_filename)
+        lazy = LazyInference1D(f, system_filename, 1)
+
+        # Nothing is read until it is used, and then only what is used.
+        assert lazy.loaded == []
+        assert np.all(lazy.data_misfit_v == full.data_misfit_v)
+        assert lazy.loaded == ['data_misfit_v']
+
+        assert np.all(lazy.hitmap.values == full.hitmap.values)
+        assert not 'model' in lazy.loaded
+
+        assert lazy.iteration == full.iteration
+        assert lazy.burned_in == full.burned_in
+        assert np.all(lazy.model.values == full.model.values)
+        assert np.all(lazy.datapoint.data == full.datapoint.data)
+
+        lazy.load()
+    # Everything has been read, so the proxy outlives the file.
+    assert np.all(lazy.acceptance_rate == full.acceptance_rate)
+
+
+def test_line_caches_lazy_points(tmp_path):
+    filename, system_filename = make_line(tmp_path)
+
+    line = Inference2D(filename, system_file_path=system_filename, mode='r')
+    line.inference_1d_cache_size = 1
+
+    a = line.inference_1d(index=0, lazy=True)
+    assert line.inference_1d(index=0, lazy=True) is a
+    b = line.inference_1d(index=1, lazy=True)
+    assert not b is a
+    # The oldest point has been dropped.
+    assert not line.inference_1d(index=0, lazy=True) is a
+
+    line.close()
+    assert len(line._inference_1d_cache) == 0
@@ -0,0 +1,73 @@
+""" Tests of post-processing the lines of a survey with a pool of local processes """
+from os import makedirs
+from os.path import dirname, join
+import subprocess
+import sys
+import h5py
+import numpy as np
+from geobipy import Histogram
+from geobipy import Inference3D
+from geobipy import RectilinearMesh2D
+from geobipy import StatArray
+
+data_folder = join(dirname(__file__), '..', 'documentation_source', 'source', 'examples', 'supplementary', 'Data')
+
+
+def make_survey(directory, nLines=3, nPoints=4):
+    """Line results files holding only a random parameter posterior for each data point. """
+    makedirs(directory)
+    prng = np.random.RandomState(0)
+
+    mesh = RectilinearMesh2D(x_edges=StatArray(np.logspace(-3.0, 0.0, 21), 'Conductivity', '$\\frac{S}{m}$'), x_log=10,
+                             y_edges=StatArray(np.linspace(0.0, 100.0, 11), 'Depth', 'm'))
+    posterior = Histogram(mesh=mesh)
+
+    for line in range(nLines):
+        with h5py.File(join(directory, '{}.h5'.format(line + 1)), 'w') as f:
+            posterior.createHdf(f, 'model/values/posterior', add_axis=nPoints)
+            for i in range(nPoints):
+                posterior.values[:] = prng.randint(0, 50, size=posterior.values.shape)
+                posterior.writeHdf(f, 'model/values/posterior', index=i)
+
+
+def test_pool_matches_serial(tmp_path):
+    serial_directory = join(tmp_path, 'serial')
+    pool_directory = join(tmp_path, 'pool')
+    make_survey(serial_directory)
+    make_survey(pool_directory)
+
+    serial = Inference3D(serial_directory, system_file_path='')
+    pool = Inference3D(pool_directory, system_file_path='', n_processes=2)
+
+    for inference in (serial, pool):
+        inference.compute_mean_parameter()
+        inference.compute_credible_interval(percent=90.0)
+
+    # The summaries written by the workers are read back through the handles reopened in this process.
+    for a, b in zip(serial.lines, pool.lines):
+        for key in ('mean_parameter', 'percentile_5.0', 'percentile_95.0'):
+            assert key in b.hdfFile.keys()
+            assert np.all(a.hdfFile[key + '/data'][:] == b.hdfFile[key + '/data'][:])
+
+    # Return values come back in the order of the lines.
+    expected = serial._map_lines('percentile', 5.0, mode='r')
+    out = pool._map_lines('percentile', 5.0, mode='r')
+    assert len(out) == serial.nLines
+    for a, b in zip(expected, out):
+        assert np.all(a == b)
+
+
+def test_pool_after_parallel_kernels(tmp_path):
+    """The parallel forward kernels run before the pool is used, and the process must still exit. """
+    directory = join(tmp_path, 'lines')
+    make_survey(directory)
+
+    script = """
+from geobipy import FdemData, Inference3D
+data = FdemData(system={system!r})._initialize_sequential_reading({data!r}, {system!r})
+data._read_record(0).find_best_halfspace()
+Inference3D({directory!r}, system_file_path='', n_processes=2).compute_mean_parameter()
+""".format(system=join(data_folder, 'FdemSystem2.stm'), data=join(data_folder, 'Resolve_small.txt'), directory=directory)
+
+    out = subprocess.run([sys.executable, '-c', script], cwd=join(dirname(__file__), '..'), capture_output=True, timeout=300)
+    assert out.returncode == 0, out.stderr.decode()
@@ -0,0 +1,63 @@
+""" Tests of fitting mixtures to many curves at once """
+import numpy as np
+from scipy.special import beta
+from geobipy import Mixture
+
+x = np.linspace(0.0, 10.0, 401)
+
+
+def gaussian(amplitude, mean, sigma):
+    return amplitude * np.exp(-0.5 * ((x - mean) / sigma)**2.0) / (sigma * np.sqrt(2.0 * np.pi))
+
+
+def pearson(amplitude, mean, sigma, exponent):
+    return amplitude * (1.0 + ((x - mean) / sigma)**2.0)**-exponent / (sigma * beta(exponent - 0.5, 0.5))
+
+
+def components(params, nParameters=3):
+    """Active components of each fit, shape (n_components, nParameters). """
+    out = params.reshape(-1, nParameters)
+    return out[out[:, 0] > 0.0]
+
+
+def test_gaussian_components_are_recovered():
+    truth = [[(1.0, 3.0, 0.4), (0.5, 7.0, 0.6)],
+             [(2.0, 5.0, 0.5)],
+             [(0.3, 2.0, 0.3), (0.6, 4.5, 0.5), (0.4, 8.0, 0.4)]]
+    y = np.vstack([np.sum([gaussian(*c) for c in curve], axis=0) for curve in truth])
+
+    params = Mixture.fit_to_curves(x, y, max_distributions=3)
+    assert params.shape == (3, 9)
+
+    for p, curve in zip(params, truth):
+        fit = components(p)
+        # The number of components is chosen from the misfit, and unused components are zeros.
+        assert fit.shape[0] == len(curve)
+        assert np.allclose(fit, curve, rtol=0.02, atol=0.02)
+
+    # Curves with no area are left empty.
+    params = Mixture.fit_to_curves(x, np.vstack([y[0], np.zeros(x.size)]))
+    assert np.all(params[1] == 0.0)
+    assert np.allclose(components(params[0]), truth[0], rtol=0.02, atol=0.02)
+
+
+def test_fixed_number_of_components():
+    y = gaussian(2.0, 5.0, 0.5)[None, :]
+    params = Mixture.fit_to_curves(x, y, n_components=2)
+    fit = components(params[0])
+
+    assert fit.shape[0] == 2
+    # The curve is still reproduced by the two components together.
+    assert np.isclose(np.sum(fit[:, 0]), 2.0, rtol=0.01)
+    assert np.allclose(np.sum([gaussian(*c) for c in fit], axis=0), y[0], atol=0.02)
+
+
+def test_pearson_components_are_recovered():
+    truth = [(1.0, 3.0, 0.5, 4.0), (0.8, 7.0, 0.5, 4.0)]
+    y = np.sum([pearson(*c) for c in truth], axis=0)[None, :]
+
+    params = Mixture.fit_to_curves(x, y, max_distributions=2, exponent=4.0)
+    fit = components(params[0], nParameters=4)
+
+    assert fit.shape[0] == 2
+    assert np.allclose(fit, truth, rtol=0.02, atol=0.02)
@@ -0,0 +1,58 @@
+""" Regression tests of the parameter hitmap of a 1D model """
+import numpy as np
+from geobipy import StatArray
+from geobipy import RectilinearMesh1D
+from geobipy import Model
+
+
+def make_model(nLayers, prng):
+    par = StatArray(10.0**prng.uniform(-3.0, -1.0, nLayers), "Conductivity", "$\\frac{S}{m}$")
+    # Interfaces within the prior limits on depth
+    thk = StatArray(np.diff(np.r_[0.0, np.sort(prng.uniform(1.0, 150.0, nLayers))]))
+    thk[-1] = np.inf
+    mod = Model(mesh=RectilinearMesh1D(widths=thk), values=par)
+    mod.set_priors(mean_value=0.01, min_edge=1.0, max_edge=150.0, max_cells=30, parameterPrior=True, gradientPrior=True, prng=prng)
+    mod.set_posteriors()
+    return mod
+
+
+def numpy_hitmap(model, counts, axis=0):
+    """ Hitmap update before the compiled kernel """
+    histogram = model.values.posterior
+    values = model.mesh.piecewise_constant_interpolate(model.values, histogram, axis=1-axis)
+    i0 = histogram.cellIndex(values, axis=axis, clip=True)
+
+    ax = histogram.axis(1-axis)
+    if model.mesh.open_right:
+        mx = ax.nCells.item()
+    else:
+        mx = ax.cellIndex(model.mesh.edges[-1], clip=True)
+    i1 = np.arange(mx)
+
+    counts[i0, i1] += 1
+
+
+def test_parameter_posterior_matches_numpy():
+    prng = np.random.RandomState(0)
+
+    for nLayers in (1, 2, 5, 12):
+        for i in range(20):
+            mod = make_model(nLayers, prng)
+            expected = np.zeros(mod.values.posterior.shape, dtype=np.int64)
+
+            for j in range(3):
+                numpy_hitmap(mod, expected)
+                mod.update_parameter_posterior()
+
+            assert np.array_equal(np.asarray(mod.values.posterior.counts), expected), "nLayers {}".format(nLayers)
+
+
+def test_one_layer_model():
+    mod = make_model(1, np.random.RandomState(1))
+    expected = np.zeros(mod.values.posterior.shape, dtype=np.int64)
+
+    numpy_hitmap(mod, expected)
+    mod.update_parameter_posterior()
+
+    assert mod.nCells.item() == 1
+    assert np.array_equal(np.asarray(mod.values.posterior.counts), expected)
@@ -0,0 +1,80 @@
+""" Tests of inverting a data set with buffered writes, serially and under MPI
+
+Under plain pytest the serial inversion is tested. Run the MPI inversion with, e.g.
+    mpirun -n 3 python -m pytest -q tests/test_mpi_infer.py
+which needs h5py built with MPI.
+"""
+from os.path import dirname, join
+import tempfile
+import h5py
+import numpy as np
+import pytest
+from geobipy import FdemData
+from geobipy import Inference3D
+from geobipy import user_parameters
+
+examples_folder = join(dirname(__file__), '..', 'documentation_source', 'source', 'examples')
+data_folder = join(examples_folder, 'supplementary', 'Data')
+
+
+def get_world():
+    from mpi4py import MPI
+    return MPI.COMM_WORLD
+
+
+def read_options():
+    options = user_parameters.read(join(examples_folder, 'Inference', '1D', 'resolve_options'))
+    options['data_filename'] = join(data_folder, 'Resolve_small.txt')
+    options['system_filename'] = join(data_folder, 'FdemSystem2.stm')
+    options['n_markov_chains'] = 20
+    options['interactive_plot'] = False
+    options['save_png'] = False
+    # A budget of a few points, so that every rank flushes several times, each at its own time.
+    options['write_buffer_mb'] = 0.1
+    return options
+
+
+def check_completed(directory):
+    """Every data point is flagged as completed and has its results written. """
+    inference = Inference3D(directory, join(data_folder, 'FdemSystem2.stm'), mode='r')
+    assert inference.nPoints == 99
+    for line in inference.lines:
+        assert np.all(line.completed)
+        assert np.all(line.hdfFile['i'][:] > 0)
+    inference.close()
+
+
+def test_buffered_serial_inference(tmp_path):
+    options = read_options()
+    dataset = FdemData(system=options['system_filename'])
+
+    inference = Inference3D(str(tmp_path), options['system_filename'])
+    inference.create_hdf5(dataset, **options)
+    inference.infer(dataset, seed=0, **options)
+    inference.close()
+
+    check_completed(str(tmp_path))
+
+
+@pytest.mark.skipif(not h5py.get_config().mpi, reason="h5py is not built with MPI")
+def test_buffered_mpi_inference():
+    world = get_world()
+    if world.size < 2:
+        pytest.skip("run with mpirun -n 2 or more")
+
+    directory = world.bcast(tempfile.mkdtemp() if world.rank == 0 else None, root=0)
+
+    options = read_options()
+    # Small batches, so that every rank writes points of every line.
+    options['max_batch_size'] = 2
+    dataset = FdemData(system=options['system_filename'])
+
+    inference = Inference3D(directory, options['system_filename'], mpi_enabled=True, world=world)
+    inference.create_hdf5(dataset, **options)
+    # Each rank flushes its buffer independently, and this returns on every rank.
+    inference.infer(dataset, **options)
+    inference.close()
+    world.barrier()
+
+    if world.rank == 0:
+        check_completed(directory)
@@ -0,0 +1,100 @@
+""" Tests of running several Markov chains for one data point """
+from os.path import dirname, join
+import h5py
+import numpy as np
+from geobipy import FdemData
+from geobipy import MultiChainInference1D
+from geobipy import user_parameters
+from geobipy.src.base import utilities as cF
+
+examples_folder = join(dirname(__file__), '..', 'documentation_source', 'source', 'examples')
+data_folder = join(examples_folder, 'supplementary', 'Data')
+
+
+def make_options(**kwargs):
+    options = user_parameters.read(join(examples_folder, 'Inference', '1D', 'resolve_options'))
+    options['data_filename'] = join(data_folder, 'Resolve_small.txt')
+    options['system_filename'] = join(data_folder, 'FdemSystem2.stm')
+    options['n_markov_chains'] = 100
+    options['interactive_plot'] = False
+    options['save_hdf5'] = True
+    options['save_png'] = False
+    options.update(kwargs)
+    return options
+
+
+def make_datapoint(options):
+    dataset = FdemData(system=options['system_filename'])._initialize_sequential_reading(options['data_filename'], options['system_filename'])
+    return dataset._read_record(0)
+
+
+def burn_in(inference):
+    """Start every chain burned in, a small data point takes thousands of iterations to burn in. """
+    for chain in inference.chains:
+        chain.burned_in = True
+        chain.burned_in_iteration = np.int64(1)
+
+
+def run(inference, filename):
+    with h5py.File(filename, 'w') as f:
+        inference.createHdf(f, np.atleast_1d(inference.datapoint.fiducial))
+        inference.infer(f)
+
+
+def test_gelman_rubin_known_values():
+    # W = 1, B = 1.5, so R-hat = sqrt((2/3) + 0.5)
+    assert np.isclose(cF.gelman_rubin([[1.0, 2.0, 3.0], [2.0, 3.0, 4.0]]), np.sqrt(7.0 / 6.0))
+    # Identical chains have converged.
+    assert np.isclose(cF.gelman_rubin([[1.0, 2.0, 3.0], [1.0, 2.0, 3.0]]), np.sqrt(2.0 / 3.0))
+    assert np.isnan(cF.gelman_rubin([[1.0, 2.0, 3.0]]))
+    assert np.isnan(cF.gelman_rubin([[1.0, 1.0], [2.0, 2.0]]))
+
+
+def test_likelihood_many_matches_serial():
+    options = make_options(n_chains=3)
+    inference = MultiChainInference1D(make_datapoint(options), prng=np.random.RandomState(0), **options)
+    datapoints = [chain.datapoint for chain in inference.chains]
+
+    misfit, likelihood = type(datapoints[0]).likelihood_many(datapoints)
+
+    assert np.allclose(misfit, [datapoint.dataMisfit() for datapoint in datapoints])
+    assert np.allclose(likelihood, [datapoint.likelihood(log=True) for datapoint in datapoints])
+
+
+def n_posterior_samples(inference, i):
+    """Number of samples chain i added to the posteriors, those at temperature 1 from its burn in iteration on. """
+    chain = inference.chains[i]
+    return np.sum(inference.cold_v[i, chain.burned_in_iteration - 1:chain.iteration])
+
+
+def test_merged_posterior(tmp_path):
+    options = make_options(n_chains=3)
+    inference = MultiChainInference1D(make_datapoint(options), prng=np.random.RandomState(0), **options)
+
+    for chain in inference.chains[1:]:
+        assert chain.model.nCells.posterior is inference.master.model.nCells.posterior
+
+    burn_in(inference)
+    run(inference, join(tmp_path, 'line.h5'))
+
+    # Every sample of every burned in chain is in the posteriors of the first chain.
+    assert np.all(inference.cold_v[:, :inference.master.iteration])
+    n_samples = np.sum([n_posterior_samples(inference, i) for i in range(inference.n_chains)])
+    assert n_samples == np.sum([chain.iteration for chain in inference.chains])
+    assert np.sum(inference.master.model.nCells.posterior.counts) == n_samples
+
+
+def test_tempered_chains_only_merge_cold_samples(tmp_path):
+    options = make_options(n_chains=3, temperatures=[1.0, 2.0, 4.0], swap_every=5)
+    inference = MultiChainInference1D(make_datapoint(options), prng=np.random.RandomState(0), **options)
+
+    burn_in(inference)
+    run(inference, join(tmp_path, 'line.h5'))
+
+    assert np.all(np.sort(inference.temperatures) == [1.0, 2.0, 4.0])
+    assert inference.n_swap_proposals > 0
+
+    # One chain is at temperature 1 at every iteration, and only its samples are merged.
+    assert np.all(np.sum(inference.cold_v[:, :inference.master.iteration], axis=0) == 1)
+    n_samples = np.sum([n_posterior_samples(inference, i) for i in range(inference.n_chains)])
+    assert np.sum(inference.master.model.nCells.posterior.counts) == n_samples
@@ -0,0 +1,77 @@
+""" Tests of the posterior summaries of a line of data points """
+from os.path import join
+import h5py
+import numpy as np
+from geobipy import Histogram
+from geobipy import Inference2D
+from geobipy import RectilinearMesh2D
+from geobipy import StatArray
+
+
+def make_line(tmp_path, nPoints=5, log=10):
+    """Line results file holding only a random parameter posterior for each data point. """
+    prng = np.random.RandomState(0)
+
+    edges = np.logspace(-3.0, 0.0, 21) if log == 10 else np.linspace(1e-3, 1.0, 21)
+    mesh = RectilinearMesh2D(x_edges=StatArray(edges, 'Conductivity', '$\\frac{S}{m}$'), x_log=log,
+                             y_edges=StatArray(np.linspace(0.0, 100.0, 11), 'Depth', 'm'))
+    posterior = Histogram(mesh=mesh)
+
+    filename = join(tmp_path, '1.h5')
+    with h5py.File(filename, 'w') as f:
+        posterior.createHdf(f, 'model/values/posterior', add_axis=nPoints)
+        for i in range(nPoints):
+            posterior.values[:] = prng.randint(0, 50, size=posterior.values.shape)
+            # Odd totals, so no cumulative probability lands exactly on a percentile and rounding cannot pick another bin.
+            posterior.values[0, :] += 1 - np.sum(posterior.values, axis=0) % 2
+            # An empty column, whose summaries must still be finite.
+            posterior.values[:, i % 10] = 0
+            posterior.writeHdf(f, 'model/values/posterior', index=i)
+
+    return Inference2D(filename, system_file_path='', mode='r+')
+
+
+def test_summary_matches_histogram(tmp_path):
+    inference = make_line(tmp_path)
+    posterior = inference.parameter_posterior()
+
+    # Blocks that do not divide the number of data points.
+    out = inference.compute_posterior_summary(statistics=('mean', 'median', 'entropy'), percentiles=[5.0, 95.0], chunk_size=2, track=False)
+
+    assert np.allclose(out['mean_parameter'], posterior.mean(axis=1).values)
+    assert np.all(out['percentile_50.0'] == posterior.percentile(50.0, axis=1).values)
+    assert np.all(out['percentile_5.0'] == posterior.percentile(5.0, axis=1).values)
+    assert np.all(out['percentile_95.0'] == posterior.percentile(95.0, axis=1).values)
+    assert np.allclose(out['entropy'], posterior.entropy(axis=1).values)
+
+    # The summaries are written back, and read rather than recomputed.
+    for key in ['mean_parameter', 'percentile_5.0', 'entropy']:
+        assert key in inference.hdfFile.keys()
+    assert np.all(inference.percentile(5.0) == out['percentile_5.0'])
+
+
+def test_percentile_reads_older_key(tmp_path):
+    inference = make_line(tmp_path)
+
+    older = StatArray(np.full((5, 10), 3.0), 'Conductivity')
+    older.toHdf(inference.hdfFile, 'percentile_5')
+
+    assert np.all(inference.percentile(5) == 3.0)
+    assert not 'percentile_5.0' in inference.hdfFile.keys()
+
+
+def normalized_opacity(low, high):
+    width = np.abs(high - low)
+    return 1.0 - (width - width.min()) / (width.max() - width.min())
+
+
+def test_opacity_log(tmp_path):
+    inference = make_line(tmp_path, log=None)
+    posterior = inference.parameter_posterior()
+    low = posterior.percentile(5.0, axis=1).values
+    high = posterior.percentile(95.0, axis=1).values
+
+    # The width of the credible interval is taken along the parameter axis, linear here, unless a log is given.
+    assert np.allclose(inference.compute_opacity(), normalized_opacity(low, high))
+    assert np.allclose(inference.compute_opacity(log=10), normalized_opacity(np.log10(low), np.log10(high)))
+    assert not np.allclose(inference.compute_opacity(), inference.compute_opacity(log=10))
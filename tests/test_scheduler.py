@@ -0,0 +1,137 @@
+""" Tests of the batched master-worker scheduler of Inference3D.infer_mpi """
+import threading
+import numpy as np
+import pytest
+from geobipy import Inference3D
+
+MPI = pytest.importorskip('mpi4py.MPI')
+
+
+class StubRequest(MPI.Request):
+    """ Null request, so MPI.Request.Waitall accepts it, whose receive completes on Wait """
+
+    def __new__(cls, receive=None):
+        out = super().__new__(cls)
+        out.receive = receive
+        return out
+
+    def Test(self):
+        return True
+
+    def Wait(self):
+        if not self.receive is None:
+            self.receive()
+
+
+class StubWorld(object):
+    """ In-process stand-in for an MPI communicator, for ranks running on threads """
+
+    def __init__(self, rank, size, hub):
+        self.rank = rank
+        self.size = size
+        self.hub = hub
+
+    def _find(self, source, tag):
+        for i, (s, t, data) in enumerate(self.hub['queues'][self.rank]):
+            if (source in (MPI.ANY_SOURCE, s)) and (t == tag):
+                return i
+        return None
+
+    def _wait_for(self, source, tag):
+        with self.hub['condition']:
+            self.hub['condition'].wait_for(lambda: self._find(source, tag) is not None, timeout=30.0)
+            i = self._find(source, tag)
+            assert not i is None, TimeoutError("Rank {} never received a message with tag {}".format(self.rank, tag))
+            return i
+
+    def Send(self, buf, dest, tag):
+        with self.hub['condition']:
+            self.hub['queues'][dest].append((self.rank, tag, np.copy(buf)))
+            self.hub['log'].append((self.rank, dest, tag, np.copy(buf)))
+            self.hub['condition'].notify_all()
+
+    def Isend(self, buf, dest, tag):
+        self.Send(buf, dest, tag)
+        return StubRequest()
+
+    def Recv(self, buf, source, tag):
+        i = self._wait_for(source, tag)
+        with self.hub['condition']:
+            s, t, data = self.hub['queues'][self.rank].pop(i)
+        buf[:] = data
+
+    def Irecv(self, buf, source, tag):
+        return StubRequest(lambda: self.Recv(buf, source, tag))
+
+    def Probe(self, source, tag, status):
+        i = self._wait_for(source, tag)
+        status.Set_source(self.hub['queues'][self.rank][i][0])
+
+    def Iprobe(self, source, tag, status):
+        with self.hub['condition']:
+            i = self._find(source, tag)
+            if i is None:
+                return False
+            status.Set_source(self.hub['queues'][self.rank][i][0])
+            return True
+
+
+def run_scheduler(tmp_path, size, records, **options):
+    hub = {'condition' : threading.Condition(), 'queues' : [[] for i in range(size)], 'log' : []}
+    inverted = []
+
+    ranks = []
+    for rank in range(size):
+        inference = Inference3D(str(tmp_path), system_file_path='', world=StubWorld(rank, size, hub))
+        # Record which rank inverted each record instead of running a chain.
+        inference._infer_record = lambda dataset, record, prng, rank=rank, **kwargs: inverted.append((rank, record))
+        ranks.append(inference)
+
+    workers = [threading.Thread(target=ranks[i]._infer_mpi_worker_task, args=(None, records, None), kwargs=options) for i in range(1, size)]
+    for worker in workers:
+        worker.start()
+    ranks[0]._infer_mpi_master_task(None, records, None, **options)
+    for worker in workers:
+        worker.join(timeout=30.0)
+        assert not worker.is_alive()
+
+    return hub['log'], inverted
+
+
+@pytest.mark.parametrize('master_inference', [True, False])
+def test_every_record_inverted_once(tmp_path, master_inference):
+    records = np.arange(100, 137)
+    log, inverted = run_scheduler(tmp_path, 4, records, max_batch_size=4, master_inference=master_inference)
+
+    assert sorted(record for rank, record in inverted) == list(records)
+    if not master_inference:
+        assert all(rank > 0 for rank, record in inverted)
+
+    for worker in range(1, 4):
+        requests = [message for message in log if message[0] == worker]
+        replies = [message[3] for message in log if message[1] == worker]
+
+        # Every request is to the master, and is answered by a [start, size] batch.
+        assert all((dest == 0) and (tag == 0) for source, dest, tag, buf in requests)
+        assert all(buf.size == 2 for buf in replies)
+        assert len(requests) == len(replies)
+
+        # The first request has no timing, and the last reply shuts the worker down.
+        assert np.isnan(requests[0][3][0])
+        assert replies[-1][1] == 0
+        assert all((1 <= buf[1] <= 4) for buf in replies[:-1])
+
+        # A worker inverts exactly the records of its batches.
+        expected = [records[i] for buf in replies for i in range(buf[0], buf[0] + buf[1])]
+        assert [record for rank, record in inverted if rank == worker] == expected
+
+
+def test_batch_size():
+    # Two points until a worker has timed one.
+    assert Inference3D._batch_size(np.nan, 1000, 4) == 2
+    # Sized to the targeted run time, capped by max_batch_size.
+    assert Inference3D._batch_size(10.0, 1000, 4, batch_seconds=120.0, max_batch_size=64) == 12
+    assert Inference3D._batch_size(0.1, 1000, 4, batch_seconds=120.0, max_batch_size=64) == 64
+    # The final batches are shared between the ranks.
+    assert Inference3D._batch_size(0.1, 16, 4, batch_seconds=120.0, max_batch_size=64) == 2
+    assert Inference3D._batch_size(0.1, 1, 4) == 1
@@ -0,0 +1,102 @@
+""" Tests of the survey index of co-ordinates and fiducials """
+from os import makedirs
+from os.path import isfile, join
+import h5py
+import numpy as np
+from geobipy import Inference3D
+from geobipy import StatArray
+from geobipy import SurveyIndex
+
+
+def make_line(directory, line, nPoints, fiducials):
+    """Line results file holding only the co-ordinates and fiducials of its data points. """
+    with h5py.File(join(directory, '{}.h5'.format(line)), 'w') as f:
+        StatArray(np.asarray(fiducials, dtype=np.float64), 'Fiducial').toHdf(f, 'data/fiducial')
+        StatArray(100.0 * line + np.arange(nPoints, dtype=np.float64), 'Easting', 'm').toHdf(f, 'data/x')
+        StatArray(np.arange(nPoints, dtype=np.float64), 'Northing', 'm').toHdf(f, 'data/y')
+        StatArray(np.full(nPoints, 30.0), 'Height', 'm').toHdf(f, 'data/z')
+        StatArray(np.full(nPoints, float(line)), 'Elevation', 'm').toHdf(f, 'data/elevation')
+
+
+def make_survey(directory):
+    makedirs(directory)
+    # Fiducial 3.0 is in both lines.
+    make_line(directory, 1, 4, [1.0, 2.0, 3.0, 4.0])
+    make_line(directory, 2, 3, [7.0, 3.0, 5.0])
+
+
+def test_index_is_read_from_the_lines_and_written(tmp_path):
+    directory = join(tmp_path, 'lines')
+    make_survey(directory)
+
+    survey = Inference3D(directory, system_file_path='', mode='r')
+    assert not isfile(survey.survey_index_file)
+
+    assert np.all(survey.x == np.r_[100.0, 101.0, 102.0, 103.0, 200.0, 201.0, 202.0])
+    assert np.all(survey.elevation == np.r_[1.0, 1.0, 1.0, 1.0, 2.0, 2.0, 2.0])
+    assert survey.x.name == 'Easting'
+    assert isfile(survey.survey_index_file)
+
+    # Fiducials resolve to the line and the row within it.
+    line, index = survey.fiducialIndex(5.0)
+    assert (line, index) == (1, 2)
+    line, index = survey.fiducialIndex(3.0)
+    assert np.all(line == [0, 1]) and np.all(index == [2, 1])
+    assert np.all(survey.fiducial([0, 5]) == [1.0, 3.0])
+
+    # The nearest point comes from the stored co-ordinates.
+    r, i = survey.survey_index.nearest([201.2, 1.1])
+    assert i == 5
+    survey.close()
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    directory = join(tmp_path, 'lines')
+    make_survey(directory)
+
+    survey = Inference3D(directory, system_file_path='', mode='r')
+    survey.survey_index
+    survey.close()
+
+    # The index is read from its file, not from the lines.
+    with h5py.File(join(directory, '2.h5'), 'r+') as f:
+        f['data/x/data'][:] = -1.0
+    survey = Inference3D(directory, system_file_path='', mode='r')
+    assert np.all(survey.x[4:] == [200.0, 201.0, 202.0])
+    survey.close()
+
+    # A new line no longer matches the index, which is read from the lines again.
+    make_line(directory, 3, 2, [8.0, 9.0])
+    survey = Inference3D(directory, system_file_path='', mode='r')
+    assert survey.nPoints == 9
+    assert np.all(survey.x[4:] == [-1.0, -1.0, -1.0, 300.0, 301.0])
+    assert np.all(survey.fiducialIndex(9.0) == (2, 1))
+    survey.close()
+
+    assert SurveyIndex.fromHdf(survey.survey_index_file).matches(survey.h5files, [4, 3, 2])
+
+    survey.remove_survey_index()
+    assert not isfile(survey.survey_index_file)
+
+
+def test_hdf_round_trip(tmp_path):
+    index = SurveyIndex(['a.h5', 'b.h5'], [2, 3], [10, 20],
+                        StatArray(np.arange(5.0), 'Easting', 'm'),
+                        StatArray(np.arange(5.0) + 1.0, 'Northing', 'm'),
+                        StatArray(np.full(5, 30.0), 'Height', 'm'),
+                        StatArray(np.zeros(5), 'Elevation', 'm'),
+                        [5.0, 1.0, 4.0, 1.0, 2.0])
+
+    filename = join(tmp_path, 'index.h5')
+    index.toHdf(filename)
+    out = SurveyIndex.fromHdf(filename)
+
+    assert out.files == ['a.h5', 'b.h5']
+    assert np.all(out.line_numbers == [10, 20])
+    assert np.all(out.y == index.y) and out.y.name == 'Northing'
+    assert np.all(out.line_index == [0, 0, 1, 1, 1])
+    assert np.all(out.row == [0, 1, 0, 1, 2])
+    assert np.all(out.fiducial_index([1.0, 4.0]) == [1, 2, 3])
+    assert out.fiducial_index(3.0).size == 0
+    assert out.matches(['/somewhere/a.h5', 'b.h5'], [2, 3])
+    assert not out.matches(['a.h5', 'b.h5'], [2, 4])